@@ -0,0 +1,340 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+from camoufox.sync_api import Camoufox
+
+import crawler_ig
+from bench_mock_server import MockConfig, MockInstagramServer
+from crawler_ig import DESKTOP_UA, DESKTOP_VIEWPORT, CrawlOptions, visit_and_extract
+from ig_parsers import DEFAULT_PARSER, PARSERS
+from ig_metrics import MetricsRecorder
+from ig_pool import ContextPool
+from ig_routing import DEFAULT_BLOCKED_HOSTS, DEFAULT_BLOCKED_TYPES, RoutePolicy, parse_csv_list
+from ig_sessions import SessionPool
+from ig_scroll import DEFAULT_SCROLL_POLICY, POLICIES, ContaminatedListError
+from ig_storage import DuckDBWriter
+from session_init import DUMMY_STORAGE_STATE
+
+try:
+    import psutil
+except ImportError:  # Peak RSS falls back to getrusage high-water marks
+    psutil = None
+
+DEFAULT_BASELINES = "bench_baselines.json"
+# Reported metrics and whether a higher value is better.
+METRICS = {
+    'profiles_per_min': True,
+    'scroll_rounds_per_profile': False,
+    'scroll_seconds_per_profile': False,
+    'extract_ms_per_profile': False,
+    'db_write_ms_per_profile': False,
+    'kb_per_profile': False,
+    'requests_per_profile': False,
+    'peak_rss_mb': False,
+}
+SIZE_KEYS = ('requestHeadersSize', 'requestBodySize', 'responseHeadersSize', 'responseBodySize')
+
+
+class RssSampler:
+    """Samples the RSS of this process plus the browser processes it spawned and keeps the peak."""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _sample(self) -> float:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.peak_mb = max(self.peak_mb, self._sample())
+            except psutil.Error:
+                continue
+
+    def __enter__(self):
+        if psutil is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if psutil is not None:
+            self._stop.set()
+            self._thread.join()
+        else:
+            # ru_maxrss is in KB on Linux; the children figure only covers processes already reaped.
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            self.peak_mb = usage / 1024
+        return False
+
+
+class TransferMeter:
+    """Bytes moved by the requests that finished on metered contexts, read with request.sizes()."""
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self._pending: list = []
+
+    def _on_finished(self, request) -> None:
+        self._pending.append(request)
+
+    def attach(self, context) -> None:
+        context.on("requestfinished", self._on_finished)
+
+    def collect(self) -> None:
+        pending, self._pending = self._pending, []
+        for request in pending:
+            try:
+                sizes = request.sizes()
+            except Exception:
+                continue
+            self.requests += 1
+            self.bytes += sum(max(0, sizes.get(key, 0)) for key in SIZE_KEYS)
+
+
+def run_benchmark(
+    config: MockConfig,
+    profiles: int,
+    options: CrawlOptions,
+    route_policy: RoutePolicy | None = None,
+    sessions: int = 1,
+    headless: bool = True,
+) -> dict:
+    """Crawl `profiles` synthetic profiles through visit_and_extract and return the measured metrics.
+
+    Experimental: the mock site only imitates the markup and pagination the crawler relies on, so
+    compare runs with each other rather than with real crawls. Phase timings come from the same
+    MetricsRecorder the crawler reports to; nothing in crawler_ig is patched besides BASE_URL,
+    which points the crawl at the mock server as --base-url does.
+    """
+    recorder = MetricsRecorder()
+    base_url = crawler_ig.BASE_URL
+    visited = contaminated = failed = rows = 0
+    meter = TransferMeter()
+    metering = 0.0
+    try:
+        with MockInstagramServer(config) as server, tempfile.TemporaryDirectory() as workdir:
+            crawler_ig.BASE_URL = server.base_url
+            session_files = []
+            for index in range(max(1, sessions)):
+                session_files.append(os.path.join(workdir, f"bench{index}.json"))
+                with open(session_files[-1], "w") as handle:
+                    json.dump(DUMMY_STORAGE_STATE, handle)
+            pool_sessions = SessionPool(session_files)
+            db_name = os.path.join(workdir, "bench.duckdb")
+            with RssSampler() as rss:
+                with DuckDBWriter(metrics=recorder) as writer, Camoufox(window=(850, 5000), headless=headless) as browser:
+                    new_context = browser.new_context
+
+                    def metered_context(**kwargs):
+                        context = new_context(**kwargs)
+                        meter.attach(context)
+                        return context
+
+                    browser.new_context = metered_context
+                    pool = ContextPool(
+                        browser,
+                        context_options={"user_agent": DESKTOP_UA, "viewport": DESKTOP_VIEWPORT},
+                        route_policy=route_policy,
+                    )
+                    started = time.perf_counter()
+                    try:
+                        for index in range(profiles):
+                            profile_url = f"{server.base_url}/bench{index:05d}/"
+                            session = pool_sessions.acquire()
+                            error = None
+                            try:
+                                rows += len(
+                                    visit_and_extract(profile_url, pool, writer, db_name, session, options, metrics=recorder)
+                                )
+                                visited += 1
+                            except ContaminatedListError as exc:
+                                error = exc
+                                contaminated += 1
+                            except Exception as exc:
+                                error = exc
+                                failed += 1
+                            finally:
+                                pool_sessions.release(session, error)
+                            # Reading sizes costs a round trip per request; keep it out of the timings.
+                            collect_started = time.perf_counter()
+                            meter.collect()
+                            metering += time.perf_counter() - collect_started
+                        writer.flush()
+                        elapsed = time.perf_counter() - started - metering
+                        blocked = pool.router.blocked if pool.router is not None else 0
+                    finally:
+                        pool.close()
+            requests = server.requests
+    finally:
+        crawler_ig.BASE_URL = base_url
+
+    phase_seconds = {phase: histogram.sum for phase, histogram in recorder.phase_seconds.items()}
+    per_profile = max(1, profiles)
+    return {
+        'metrics': {
+            'profiles_per_min': profiles / elapsed * 60 if elapsed else 0.0,
+            'scroll_rounds_per_profile': recorder.scroll_rounds.sum / per_profile,
+            'scroll_seconds_per_profile': (phase_seconds['scroll'] + phase_seconds['modal_dismiss']) / per_profile,
+            'extract_ms_per_profile': (phase_seconds['count'] + phase_seconds['extract']) * 1000 / per_profile,
+            'db_write_ms_per_profile': recorder.db_write_seconds.sum * 1000 / per_profile,
+            'kb_per_profile': meter.bytes / 1024 / per_profile,
+            'requests_per_profile': meter.requests / per_profile,
+            'peak_rss_mb': rss.peak_mb,
+        },
+        'counts': {
+            'profiles': profiles,
+            'visited': visited,
+            'contaminated': contaminated,
+            'failed': failed,
+            'rows': rows,
+            'modal_dismissals': recorder.modal_dismissals,
+            'http_requests': requests,
+            'blocked_requests': blocked,
+            'sessions': pool_sessions.summary(),
+        },
+        'seconds': elapsed,
+    }
+
+
+def load_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print current vs baseline metrics and return the names of the ones that regressed."""
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        value = current.get(name, 0.0)
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"   {name:>27}: {value:10.2f}")
+            continue
+        change = (value - reference) / reference if reference else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  ⚠️ regresión"
+            regressions.append(name)
+        print(f"   {name:>27}: {value:10.2f}  (base {reference:.2f}, {change:+.1%}){flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the crawl path against a local mock Instagram (experimental: needs a "
+        "Camoufox browser, see `python -m camoufox fetch`)"
+    )
+    parser.add_argument("--scenario", default="default", help="Name the results are stored and compared under")
+    parser.add_argument("--profiles", type=int, default=20, help="Profiles visited in the run")
+    parser.add_argument("--list-size", dest="list_size", type=int, default=MockConfig.list_size)
+    parser.add_argument("--page-size", dest="page_size", type=int, default=MockConfig.page_size)
+    parser.add_argument("--latency-ms", dest="latency_ms", type=int, default=MockConfig.latency_ms)
+    parser.add_argument(
+        "--feedback-rate",
+        dest="feedback_rate",
+        type=float,
+        default=MockConfig.feedback_rate,
+        help="Probability that a batch load shows the feedback/throttle modal",
+    )
+    parser.add_argument(
+        "--contaminate-rate",
+        dest="contaminate_rate",
+        type=float,
+        default=MockConfig.contaminate_rate,
+        help="Probability that a profile's list turns into suggestions after the modal",
+    )
+    parser.add_argument("--seed", type=int, default=MockConfig.seed)
+    extraction = parser.add_mutually_exclusive_group()
+    extraction.add_argument("--intercept", action="store_true")
+    extraction.add_argument("--harvest", action="store_true")
+    parser.add_argument("--parser", choices=sorted(PARSERS), default=DEFAULT_PARSER)
+    parser.add_argument("--scroll-policy", dest="scroll_policy", choices=sorted(POLICIES), default=DEFAULT_SCROLL_POLICY)
+    parser.add_argument(
+        "--block-types",
+        dest="block_types",
+        type=parse_csv_list,
+        default=DEFAULT_BLOCKED_TYPES,
+        help="Resource types aborted, as in the crawler ('' loads everything, for a before/after run)",
+    )
+    parser.add_argument("--block-hosts", dest="block_hosts", type=parse_csv_list, default=DEFAULT_BLOCKED_HOSTS)
+    parser.add_argument("--minimal-rendering", dest="minimal_rendering", action="store_true")
+    parser.add_argument("--sessions", type=int, default=1, help="Dummy storage states the visits are spread over")
+    parser.add_argument("--headful", action="store_true", help="Show the browser window")
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES, help="JSON file with the stored baselines")
+    parser.add_argument("--save-baseline", dest="save_baseline", action="store_true", help="Store this run as the scenario baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change flagged as a regression")
+    parser.add_argument(
+        "--fail-on-regression",
+        dest="fail_on_regression",
+        action="store_true",
+        help="Exit with status 1 when a metric regressed against the baseline",
+    )
+    args = parser.parse_args()
+
+    config = MockConfig(
+        list_size=args.list_size,
+        page_size=args.page_size,
+        latency_ms=args.latency_ms,
+        feedback_rate=args.feedback_rate,
+        contaminate_rate=args.contaminate_rate,
+        seed=args.seed,
+    )
+    options = CrawlOptions(
+        intercept=args.intercept,
+        harvest=args.harvest,
+        parser=args.parser,
+        scroll_policy=args.scroll_policy,
+    )
+    print("⚠️ Benchmark experimental: el sitio simulado solo imita el marcado y la paginación de Instagram")
+    print(f"🧪 Escenario {args.scenario}: {args.profiles} perfiles de ~{config.list_size} seguidos")
+    route_policy = RoutePolicy(args.block_types, args.block_hosts, args.minimal_rendering)
+    result = run_benchmark(config, args.profiles, options, route_policy, args.sessions, headless=not args.headful)
+    counts = result['counts']
+    print(
+        f"📊 {counts['visited']} visitados, {counts['contaminated']} contaminados, {counts['failed']} fallidos, "
+        f"{counts['rows']} filas en {result['seconds']:.1f}s ({counts['blocked_requests']} peticiones bloqueadas)"
+    )
+
+    baselines = load_baselines(args.baselines)
+    regressions = compare(result['metrics'], baselines.get(args.scenario, {}).get('metrics', {}), args.tolerance)
+
+    if args.save_baseline:
+        baselines[args.scenario] = {
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'config': asdict(config),
+            'options': asdict(options),
+            'routing': asdict(route_policy),
+            **result,
+        }
+        with open(args.baselines, "w") as handle:
+            json.dump(baselines, handle, indent=2, sort_keys=True)
+        print(f"💾 Línea base '{args.scenario}' guardada en {args.baselines}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class MockConfig:
+    """Shape of the synthetic site. Every random choice is seeded by `seed` and the username."""
+
+    list_size: int = 200
+    list_jitter: float = 0.5
+    page_size: int = 12
+    latency_ms: int = 150
+    feedback_rate: float = 0.0
+    contaminate_rate: float = 0.0
+    suggestions: int = 42
+    posts: int = 12
+    media_kb: int = 32
+    seed: int = 0
+
+
+def user_id(username: str) -> int:
+    return zlib.crc32(username.encode('utf-8'))
+
+
+def following_size(config: MockConfig, username: str) -> int:
+    rng = random.Random(f"{config.seed}:{username}:size")
+    spread = config.list_size * config.list_jitter
+    return max(0, int(round(config.list_size + rng.uniform(-spread, spread))))
+
+
+def following_users(config: MockConfig, username: str) -> list[tuple[str, str]]:
+    rng = random.Random(f"{config.seed}:{username}:following")
+    users = {}
+    size = following_size(config, username)
+    while len(users) < size:
+        handle = f"user{rng.randrange(10 ** 7):07d}"
+        users.setdefault(handle, f"Nombre {handle[4:]}")
+    return list(users.items())
+
+
+def suggested_users(config: MockConfig, username: str) -> list[tuple[str, str]]:
+    rng = random.Random(f"{config.seed}:{username}:suggested")
+    return [(f"sugerido{rng.randrange(10 ** 7):07d}", "Sugerencia") for _ in range(config.suggestions)]
+
+
+def shows_feedback(config: MockConfig, username: str, batch: int) -> bool:
+    return random.Random(f"{config.seed}:{username}:{batch}:feedback").random() < config.feedback_rate
+
+
+def contaminates(config: MockConfig, username: str) -> bool:
+    return random.Random(f"{config.seed}:{username}:contaminated").random() < config.contaminate_rate
+
+
+# Client side of the following dialog: rows are fetched in batches from the JSON API as the list is
+# scrolled, and a feedback_required answer shows the throttle modal, which resumes loading on "Aceptar".
+# After the modal a contaminated profile swaps its rows for suggestions, as described in tareas.md.
+DIALOG_JS = """
+(() => {
+    const userId = document.body.dataset.userId;
+    let nextMaxId = 0;
+    let loading = false;
+    let finished = false;
+    let acknowledged = false;
+    let replaced = false;
+    let list = null;
+
+    const row = (user) => {
+        const item = document.createElement('div');
+        item.className = 'row';
+        const avatar = document.createElement('img');
+        avatar.setAttribute('src', '/static/avatar/' + user.username + '.jpg');
+        avatar.setAttribute('alt', '');
+        item.appendChild(avatar);
+        const link = document.createElement('a');
+        link.setAttribute('role', 'link');
+        link.setAttribute('href', '/' + user.username + '/');
+        for (const text of [user.username, user.full_name]) {
+            const span = document.createElement('span');
+            span.setAttribute('dir', 'auto');
+            span.textContent = text;
+            link.appendChild(span);
+        }
+        item.appendChild(link);
+        return item;
+    };
+
+    const showFeedback = () => {
+        const modal = document.createElement('div');
+        modal.setAttribute('role', 'dialog');
+        modal.className = 'feedback';
+        modal.innerHTML = '<h3>Inténtalo de nuevo más tarde</h3>' +
+            '<button type="button">Informar de un problema</button>' +
+            '<button type="button" class="confirm">Aceptar</button>';
+        modal.querySelector('.confirm').addEventListener('click', () => {
+            modal.remove();
+            acknowledged = true;
+            load();
+        });
+        document.body.appendChild(modal);
+    };
+
+    const load = async () => {
+        if (loading || finished) return;
+        loading = true;
+        try {
+            const url = '/api/v1/friendships/' + userId + '/following/?max_id=' + nextMaxId +
+                (acknowledged ? '&ack=1' : '');
+            const response = await fetch(url);
+            const payload = await response.json();
+            if (payload.feedback_required) {
+                showFeedback();
+                return;
+            }
+            if (payload.replace && !replaced) {
+                replaced = true;
+                list.replaceChildren();
+            }
+            for (const user of payload.users) list.appendChild(row(user));
+            if (payload.next_max_id === null) finished = true;
+            else nextMaxId = payload.next_max_id;
+        } finally {
+            loading = false;
+        }
+        if (!finished && list.scrollHeight <= list.clientHeight) load();
+    };
+
+    document.querySelector('a.following').addEventListener('click', (event) => {
+        event.preventDefault();
+        if (document.querySelector('div.following-dialog')) return;
+        const dialog = document.createElement('div');
+        dialog.setAttribute('role', 'dialog');
+        dialog.className = 'following-dialog';
+        dialog.innerHTML = '<h2>Seguidos</h2>';
+        list = document.createElement('div');
+        list.className = 'list';
+        list.addEventListener('scroll', () => {
+            if (list.scrollTop + list.clientHeight >= list.scrollHeight - 200) load();
+        });
+        dialog.appendChild(list);
+        document.body.appendChild(dialog);
+        load();
+    });
+})();
+"""
+
+PROFILE_HTML = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{username} • Instagram (mock)</title>
+<style>
+@font-face {{ font-family: MockSans; src: url('/static/font/mock-sans.woff2') format('woff2'); }}
+body {{ font-family: MockSans, sans-serif; margin: 0; }}
+.posts img {{ width: 120px; height: 120px; }}
+.row img {{ width: 32px; height: 32px; margin-right: 8px; }}
+header {{ padding: 16px; }}
+.following-dialog {{ position: fixed; top: 40px; left: 50%; width: 400px; margin-left: -200px; background: #fff;
+    border: 1px solid #ccc; }}
+.following-dialog .list {{ height: 400px; overflow-y: auto; }}
+.row {{ height: 52px; display: flex; align-items: center; padding: 0 12px; }}
+.row a {{ display: flex; flex-direction: column; }}
+.feedback {{ position: fixed; top: 120px; left: 50%; width: 300px; margin-left: -150px; background: #fff;
+    border: 1px solid #999; padding: 12px; }}
+</style>
+</head>
+<body data-username="{username}" data-user-id="{user_id}">
+<header>
+<h1>{username}</h1>
+<ul>
+<li><span>{posts}</span> publicaciones</li>
+<li><a href="/{username}/followers/"><span>{followers}</span> seguidores</a></li>
+<li><a class="following" href="/{username}/following/"><span>{following}</span> seguidos</a></li>
+</ul>
+</header>
+<section class="posts">{thumbnails}</section>
+<video src="/static/clip/{username}.mp4" preload="auto" muted></video>
+<script>{script}</script>
+</body>
+</html>
+"""
+
+
+STATIC_TYPES = {'jpg': "image/jpeg", 'mp4': "video/mp4", 'woff2': "font/woff2"}
+
+
+class MockInstagramServer:
+    """Threaded HTTP server for the synthetic site; `start` serves it in the background."""
+
+    def __init__(self, config: MockConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self.usernames: dict[int, str] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockInstagramServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-instagram", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def profile_page(self, username: str) -> str:
+        identifier = user_id(username)
+        with self._lock:
+            self.usernames[identifier] = username
+        rng = random.Random(f"{self.config.seed}:{username}:profile")
+        return PROFILE_HTML.format(
+            username=escape(username),
+            user_id=identifier,
+            posts=rng.randrange(1, 500),
+            followers=rng.randrange(10, 5000),
+            following=following_size(self.config, username),
+            thumbnails=''.join(
+                f'<img src="/static/p/{escape(username)}/{index}.jpg" alt="">' for index in range(self.config.posts)
+            ),
+            script=DIALOG_JS,
+        )
+
+    def following_batch(self, identifier: int, max_id: int, acknowledged: bool) -> dict:
+        with self._lock:
+            username = self.usernames.get(identifier, '')
+        batch = max_id // max(1, self.config.page_size)
+        if not acknowledged and max_id and shows_feedback(self.config, username, batch):
+            return {'feedback_required': True, 'message': 'Please wait a few minutes before you try again.'}
+        if acknowledged and contaminates(self.config, username):
+            # The real site swaps the whole list for a block of suggestions and stops paginating.
+            return {
+                'users': [{'username': handle, 'full_name': name} for handle, name in suggested_users(self.config, username)],
+                'next_max_id': None,
+                'replace': True,
+                'status': 'ok',
+            }
+        users = following_users(self.config, username)
+        chunk = users[max_id:max_id + self.config.page_size]
+        next_max_id = max_id + len(chunk)
+        return {
+            'users': [{'username': handle, 'full_name': name} for handle, name in chunk],
+            'next_max_id': next_max_id if next_max_id < len(users) else None,
+            'replace': False,
+            'status': 'ok',
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: str | bytes, content_type: str) -> None:
+                if isinstance(body, str):
+                    payload = body.encode('utf-8')
+                    content_type = f"{content_type}; charset=utf-8"
+                else:
+                    payload = body
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                parsed = urlparse(self.path)
+                segments = [segment for segment in parsed.path.split('/') if segment]
+                if segments[:3] == ['api', 'v1', 'friendships'] and len(segments) >= 5 and segments[4] == 'following':
+                    time.sleep(server.config.latency_ms / 1000)
+                    query = parse_qs(parsed.query)
+                    try:
+                        identifier = int(segments[3])
+                        max_id = int(query.get('max_id', ['0'])[0])
+                    except ValueError:
+                        self._send(400, json.dumps({'status': 'fail'}), "application/json")
+                        return
+                    batch = server.following_batch(identifier, max_id, 'ack' in query)
+                    self._send(200, json.dumps(batch), "application/json")
+                    return
+                if segments[:1] == ['static'] and len(segments) >= 3:
+                    # Opaque filler bytes: only the transfer size matters to the benchmark.
+                    extension = segments[-1].rsplit('.', 1)[-1]
+                    content_type = STATIC_TYPES.get(extension, "application/octet-stream")
+                    self._send(200, b'\0' * (server.config.media_kb * 1024), content_type)
+                    return
+                if len(segments) == 1:
+                    self._send(200, server.profile_page(segments[0]), "text/html")
+                    return
+                if not segments:
+                    self._send(200, "<!DOCTYPE html><html><body>mock</body></html>", "text/html")
+                    return
+                self._send(404, "not found", "text/plain")
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a synthetic Instagram for offline crawler runs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--list-size", dest="list_size", type=int, default=MockConfig.list_size)
+    parser.add_argument("--page-size", dest="page_size", type=int, default=MockConfig.page_size)
+    parser.add_argument("--latency-ms", dest="latency_ms", type=int, default=MockConfig.latency_ms)
+    parser.add_argument("--feedback-rate", dest="feedback_rate", type=float, default=MockConfig.feedback_rate)
+    parser.add_argument(
+        "--contaminate-rate", dest="contaminate_rate", type=float, default=MockConfig.contaminate_rate
+    )
+    parser.add_argument("--media-kb", dest="media_kb", type=int, default=MockConfig.media_kb)
+    parser.add_argument("--seed", type=int, default=MockConfig.seed)
+    args = parser.parse_args()
+    config = MockConfig(
+        list_size=args.list_size,
+        page_size=args.page_size,
+        latency_ms=args.latency_ms,
+        feedback_rate=args.feedback_rate,
+        contaminate_rate=args.contaminate_rate,
+        media_kb=args.media_kb,
+        seed=args.seed,
+    )
+    server = MockInstagramServer(config, args.host, args.port)
+    print(f"🧪 Instagram simulado en {server.base_url} (Ctrl+C para parar)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
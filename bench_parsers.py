@@ -0,0 +1,113 @@
+import argparse
+import glob
+import os
+import time
+
+import duckdb
+
+from crawler_ig import extract_username, parse_following_count, parse_following_html
+from ig_parsers import DEFAULT_PARSER, PARSERS, get_parser
+from ig_storage import is_current_schema, iter_doms
+
+
+def load_saved_doms(paths: list[str], limit: int) -> list[tuple[str, str]]:
+    """Collect (profile, html) samples from .duckdb outputs and/or .html files/directories.
+
+    Databases are opened read-only and skipped unless they are at the current schema version.
+    """
+    samples: list[tuple[str, str]] = []
+    files: list[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*.duckdb"), recursive=True)))
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*.html"), recursive=True)))
+        else:
+            files.append(path)
+    for file_path in files:
+        if len(samples) >= limit:
+            break
+        if file_path.endswith(".duckdb"):
+            try:
+                conn = duckdb.connect(file_path, read_only=True)
+            except duckdb.Error:
+                continue
+            try:
+                if not is_current_schema(file_path, conn):
+                    continue
+                samples.extend(iter_doms(conn, limit - len(samples)))
+            except duckdb.Error:
+                pass
+            finally:
+                conn.close()
+        else:
+            with open(file_path, encoding="utf-8") as handle:
+                samples.append((os.path.splitext(os.path.basename(file_path))[0], handle.read()))
+    return samples[:limit]
+
+
+def time_backend(name: str, samples: list[tuple[str, str]], repeat: int) -> tuple[float, float]:
+    parse_seconds = 0.0
+    count_seconds = 0.0
+    for _ in range(repeat):
+        for profile, html in samples:
+            username = extract_username(profile)
+            started = time.perf_counter()
+            parse_following_html(html, name)
+            parse_seconds += time.perf_counter() - started
+            started = time.perf_counter()
+            parse_following_count(html, username, name)
+            count_seconds += time.perf_counter() - started
+    return parse_seconds, count_seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark the HTML parser backends over saved modal DOMs")
+    parser.add_argument("paths", nargs="+", help=".duckdb files, .html files or directories holding them")
+    parser.add_argument("--limit", type=int, default=200, help="Maximum number of DOM samples to load")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the samples per backend")
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=sorted(PARSERS),
+        default=sorted(PARSERS),
+        help="Backends to benchmark",
+    )
+    args = parser.parse_args()
+
+    samples = load_saved_doms(args.paths, args.limit)
+    if not samples:
+        print("No saved DOMs found.")
+        return
+    total_bytes = sum(len(html) for _, html in samples)
+    print(f"📄 {len(samples)} DOMs, {total_bytes / 1_000_000:.1f} MB, {args.repeat} pasadas")
+
+    reference = {
+        profile: (parse_following_html(html, DEFAULT_PARSER), parse_following_count(html, extract_username(profile), DEFAULT_PARSER))
+        for profile, html in samples
+    }
+    baseline = None
+    for name in args.backends:
+        try:
+            get_parser(name)
+        except RuntimeError as exc:
+            print(f"{name:>11}: {exc}")
+            continue
+        mismatches = sum(
+            1
+            for profile, html in samples
+            if (parse_following_html(html, name), parse_following_count(html, extract_username(profile), name))
+            != reference[profile]
+        )
+        parse_seconds, count_seconds = time_backend(name, samples, args.repeat)
+        per_dom_ms = (parse_seconds + count_seconds) * 1000 / (len(samples) * args.repeat)
+        if baseline is None and name == DEFAULT_PARSER:
+            baseline = per_dom_ms
+        speedup = f" x{baseline / per_dom_ms:.1f}" if baseline and per_dom_ms else ""
+        print(
+            f"{name:>11}: list {parse_seconds:.3f}s, count {count_seconds:.3f}s, "
+            f"{per_dom_ms:.2f} ms/DOM{speedup}, diferencias {mismatches}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,67 @@ import re
 import sys
 import time
 import traceback
+from dataclasses import dataclass
 from urllib.parse import urlparse
 
-import duckdb
-import pandas as pd
-from bs4 import BeautifulSoup
 from camoufox.sync_api import Camoufox
 from tqdm import tqdm
 
+from ig_governor import ErrorResponseWatcher, GovernorConfig, ThrottleGovernor, is_suspicious_count
+from ig_intercept import FollowingInterceptor
+from ig_parsers import DEFAULT_PARSER, PARSERS, get_parser
+from ig_scroll import (
+    DEFAULT_SCROLL_POLICY,
+    DEFAULT_THROTTLED_SCROLL_POLICY,
+    POLICIES,
+    RENDERED_HREFS_JS,
+    ROW_STATE_JS,
+    ROWS_ADDED_JS,
+    ContaminatedListError,
+    ContaminationDetector,
+    EmptyListError,
+    RequestTracker,
+    ScrollPolicy,
+    ScrollScheduler,
+    ScrollStats,
+)
+from ig_routing import DEFAULT_BLOCKED_HOSTS, DEFAULT_BLOCKED_TYPES, RoutePolicy, parse_csv_list
+from ig_sessions import (
+    DEFAULT_FAILURES_TO_QUARANTINE,
+    DEFAULT_QUARANTINE,
+    SessionPool,
+    check_session,
+    resolve_session_files,
+    session_name,
+)
+from ig_shard import Shard, parse_shard
+from ig_pool import DEFAULT_MAX_MEMORY_MB, DEFAULT_MAX_USES, ContextPool
+from ig_cache import DEFAULT_CACHE_DB, DEFAULT_CACHE_TTL_HOURS, CachedProfile, ProfileCache
+from ig_visibility import DEFAULT_VISIBILITY_DB, DEFAULT_VISIBILITY_TTL_HOURS, VisibilityCache
+from ig_frontier import (
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_MAX_DEPTH,
+    DEFAULT_PRIORITY,
+    PRIORITIES,
+    Frontier,
+    FrontierConfig,
+    FrontierEntry,
+    Priority,
+    make_priority,
+    parse_top_k,
+)
+from ig_metrics import METRICS_JSONL, METRICS_PROM, MetricsRecorder, VisitRecord, finish_visit
+from ig_storage import DuckDBWriter, new_run_id
+
 BASE_URL = "https://www.instagram.com"
 COMPACT_NUMBER_RE = re.compile(r'^([\d.,\s]+)([KMB]?)$', re.IGNORECASE)
+DESKTOP_UA = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/114.0.0.0 Safari/537.36"
+)
+DESKTOP_VIEWPORT = {"width": 1200, "height": 900}
+BROWSER_RESTART_DELAYS = (10, 60, 300)
 FEEDBACK_CONFIRM_TEXTS = (
     "Aceptar",
     "Accept",
@@ -28,51 +79,157 @@ FEEDBACK_CONFIRM_TEXTS = (
     "Allow",
 )
 
-def dismiss_feedback_required_modal(page, max_wait_ms: int = 6000) -> bool:
-    """Click the confirmation button shown when Instagram throttles the followers list."""
-    deadline = time.time() + max_wait_ms / 1000
-    selectors = [
-        'div[role="dialog"]',
-        'div[role="alertdialog"]',
-    ]
-    xpath_selector = "xpath=/html/body/div[5]/div[1]/div/div[2]/div/div/div/div/div[2]/div/div/div[2]/button[2]"
-    while time.time() < deadline:
-        try:
-            xpath_button = page.locator(xpath_selector)
-            if xpath_button.count() > 0:
-                print("   ⚠️ Feedback modal detectado, aceptando para continuar…")
-                xpath_button.first.click()
-                page.wait_for_timeout(1500)
-                return True
-        except Exception:
-            pass
-        for container_selector in selectors:
-            try:
-                container = page.locator(container_selector)
-            except Exception:
-                continue
-            try:
-                if container.count() == 0:
-                    continue
-            except Exception:
-                continue
-            for text_value in FEEDBACK_CONFIRM_TEXTS:
-                button_selector = f'{container_selector} button:has-text("{text_value}")'
-                role_button_selector = f'{container_selector} [role="button"]:has-text("{text_value}")'
-                for target_selector in (button_selector, role_button_selector):
-                    try:
-                        target = page.locator(target_selector)
-                        if target.count() > 0:
-                            print("  2 ⚠️ Feedback modal detectado, aceptando para continuar…")
-                            target.first.click()
-                            page.wait_for_timeout(1500)
-                            return True
-                    except Exception:
-                        continue
-        page.wait_for_timeout(5)
-    return False
+FEEDBACK_XPATH = "/html/body/div[5]/div[1]/div/div[2]/div/div/div/div/div[2]/div/div/div[2]/button[2]"
+FEEDBACK_CONFIRM_SELECTOR = '[data-ig-feedback-confirm]'
+# Finds the throttle modal's confirm button in one pass: the known XPath first, then any button or
+# [role="button"] inside a dialog/alertdialog whose text contains one of the confirm texts (the same
+# case-insensitive substring match as Playwright's :has-text). The button found is tagged with
+# data-ig-feedback-confirm so Python can click it with a real input event.
+FEEDBACK_PROBE_JS = """
+({texts, xpath}) => {
+    for (const marked of document.querySelectorAll('[data-ig-feedback-confirm]')) {
+        marked.removeAttribute('data-ig-feedback-confirm');
+    }
+    const mark = (element) => {
+        element.setAttribute('data-ig-feedback-confirm', '1');
+        return true;
+    };
+    const byXpath = document.evaluate(
+        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+    if (byXpath) return mark(byXpath);
+    const needles = texts.map((text) => text.toLowerCase());
+    for (const containerSelector of ['div[role="dialog"]', 'div[role="alertdialog"]']) {
+        const containers = document.querySelectorAll(containerSelector);
+        if (!containers.length) continue;
+        const candidates = {};
+        for (const kind of ['button', '[role="button"]']) {
+            candidates[kind] = [];
+            for (const container of containers) {
+                for (const element of container.querySelectorAll(kind)) {
+                    const label = (element.textContent || '').replace(/\\s+/g, ' ').trim().toLowerCase();
+                    if (label) candidates[kind].push([element, label]);
+                }
+            }
+        }
+        for (const needle of needles) {
+            for (const kind of ['button', '[role="button"]']) {
+                const hit = candidates[kind].find(([, label]) => label.includes(needle));
+                if (hit) return mark(hit[0]);
+            }
+        }
+    }
+    return false;
+}
+"""
+# Profile readiness: the link to /{username}/following/ shows a number, or the header rendered
+# without such a link (private or restricted profiles), so there is nothing left to wait for.
+PROFILE_READY_JS = """
+(username) => {
+    const target = '/' + username.toLowerCase() + '/following';
+    for (const link of document.querySelectorAll('a[href]')) {
+        if ((link.getAttribute('href') || '').toLowerCase().includes(target)) {
+            return /\\d/.test(link.textContent || '');
+        }
+    }
+    return document.readyState === 'complete' && !!document.querySelector('header');
+}
+"""
+FIRST_ROWS_JS = "() => !!document.querySelector('div[role=\"dialog\"] a[role=\"link\"]')"
+READY_POLL_MS = 100
+HARVEST_KEEP_ANCHORS = 12
+# Marks every unharvested row link in the dialog, returns its href and span texts, and then empties
+# the rows harvested earlier except the last `keep` links. The row elements themselves stay in place
+# so the list's own scroll/loading logic keeps working; only their subtrees are dropped.
+HARVEST_ROWS_JS = """
+(keep) => {
+    const dialog = document.querySelector('div[role="dialog"]');
+    if (!dialog) return [];
+    const anchors = Array.from(dialog.querySelectorAll('a[role="link"]'));
+    const rows = [];
+    for (const anchor of anchors) {
+        if (anchor.dataset.igHarvested) continue;
+        anchor.dataset.igHarvested = '1';
+        const texts = Array.from(anchor.querySelectorAll('span[dir="auto"]'))
+            .slice(0, 2)
+            .map((span) => (span.textContent || '').trim());
+        rows.push({href: anchor.getAttribute('href') || '', texts});
+    }
+    const rowOf = (anchor) => {
+        const href = anchor.getAttribute('href');
+        let element = anchor;
+        while (element.parentElement && element.parentElement !== dialog) {
+            const links = element.parentElement.querySelectorAll('a[role="link"]');
+            if (Array.from(links).some((link) => link.getAttribute('href') !== href)) break;
+            element = element.parentElement;
+        }
+        return element;
+    };
+    const prunable = anchors.slice(0, Math.max(0, anchors.length - keep));
+    for (const anchor of prunable) {
+        const row = rowOf(anchor);
+        if (row.dataset.igPruned) continue;
+        row.dataset.igPruned = '1';
+        row.replaceChildren();
+    }
+    return rows;
+}
+"""
+
 
+@dataclass(frozen=True)
+class ReadinessBudget:
+    """Milliseconds each readiness condition may take before the visit carries on without it."""
 
+    profile_ms: int = 10000
+    dialog_ms: int = 10000
+    rows_ms: int = 5000
+
+
+@dataclass
+class CrawlOptions:
+    intercept: bool = False
+    harvest: bool = False
+    parser: str = DEFAULT_PARSER
+    scroll_policy: str = DEFAULT_SCROLL_POLICY
+    throttled_scroll_policy: str = DEFAULT_THROTTLED_SCROLL_POLICY
+    readiness: ReadinessBudget = ReadinessBudget()
+
+
+def feedback_probe_arg() -> dict:
+    return {'texts': list(FEEDBACK_CONFIRM_TEXTS), 'xpath': FEEDBACK_XPATH}
+
+
+def dismiss_feedback_required_modal(page, max_wait_ms: int = 0, on_detected=None) -> bool:
+    """Click the confirmation button shown when Instagram throttles the followers list.
+
+    Detection is a single in-page probe (FEEDBACK_PROBE_JS), so the usual no-modal case costs one
+    evaluate. With `max_wait_ms` the probe is polled in the page until the modal shows up or time runs out.
+    `on_detected(page)` runs after detection and before the click, while the list under the modal is intact.
+    """
+    probe_arg = feedback_probe_arg()
+    try:
+        if max_wait_ms > 0:
+            try:
+                page.wait_for_function(FEEDBACK_PROBE_JS, arg=probe_arg, timeout=max_wait_ms)
+                found = True
+            except Exception:
+                found = False
+        else:
+            found = page.evaluate(FEEDBACK_PROBE_JS, probe_arg)
+    except Exception:
+        return False
+    if not found:
+        return False
+    print("   ⚠️ Feedback modal detectado, aceptando para continuar…")
+    if on_detected is not None:
+        on_detected(page)
+    try:
+        page.click(FEEDBACK_CONFIRM_SELECTOR, timeout=5000)
+    except Exception:
+        return False
+    page.wait_for_timeout(1500)
+    return True
 
 
 def parse_compact_number(value: str) -> int:
@@ -132,57 +289,171 @@ def extract_username(profile_url: str) -> str:
     return path.split('/')[0] if path else ''
 
 
-def load_profiles_from_csv(csv_path: str) -> list[str]:
-    profile_urls = []
+def load_profiles_from_csv(csv_path: str, shard: Shard | None = None, max_depth: int = 0) -> list[str]:
+    """Seed URLs from the first CSV column, keeping only those `shard` crawls (see Shard)."""
+    profile_urls = set()
     with open(csv_path, newline='') as csvfile:
         reader = csv.reader(csvfile)
         for row in reader:
             if not row:
                 continue
             normalized = normalize_profile_url(row[0])
-            if normalized:
-                profile_urls.append(normalized)
-    return sorted(set(profile_urls))
+            if normalized and (shard is None or shard.crawls(normalized, 0, max_depth)):
+                profile_urls.add(normalized)
+    return sorted(profile_urls)
+
+
+def following_record(href: str | None, span_texts: list[str]) -> dict | None:
+    if not href or href.startswith('#') or href.startswith('javascript'):
+        return None
+    normalized = normalize_profile_url(href)
+    if not normalized:
+        return None
+    parsed = urlparse(normalized)
+    segments = [segment for segment in parsed.path.strip('/').split('/') if segment]
+    if len(segments) != 1:
+        return None
+    handle = span_texts[0] if span_texts else ''
+    name = span_texts[1] if len(span_texts) > 1 else ''
+    if not name:
+        name = handle
+    return {'url': normalized, 'name': name}
+
+
+def parse_following_html(modal_html: str, parser: str | None = None) -> list[dict]:
+    following = []
+    seen = set()
+    for href, span_texts in get_parser(parser).following_rows(modal_html):
+        record = following_record(href, span_texts)
+        if not record or record['url'] in seen:
+            continue
+        following.append(record)
+        seen.add(record['url'])
+    return following
+
+
+class FollowingHarvester:
+    """Accumulates following rows pulled from the dialog round by round, deduplicated in Python.
+
+    New records are passed to `sink` as soon as they are harvested so partial results survive a crash.
+    """
+
+    def __init__(self, sink=None):
+        self.following: list[dict] = []
+        self.sink = sink
+        self.seen: set[str] = set()
+
+    def ingest(self, rows: list[dict]) -> int:
+        new_records = []
+        for row in rows or []:
+            record = following_record(row.get('href'), row.get('texts') or [])
+            if not record or record['url'] in self.seen:
+                continue
+            self.seen.add(record['url'])
+            new_records.append(record)
+        if new_records:
+            self.following.extend(new_records)
+            if self.sink is not None:
+                self.sink(new_records)
+        return len(new_records)
+
+
+def harvest_rows(page, harvester: FollowingHarvester, keep: int = HARVEST_KEEP_ANCHORS) -> int:
+    try:
+        rows = page.evaluate(HARVEST_ROWS_JS, keep)
+    except Exception:
+        return 0
+    return harvester.ingest(rows)
+
+
+def rendered_following_urls(page) -> set[str]:
+    try:
+        hrefs = page.evaluate(RENDERED_HREFS_JS)
+    except Exception:
+        return set()
+    return {normalize_profile_url(href) for href in hrefs if href}
+
 
+def finish_round(
+    scheduler: ScrollScheduler,
+    detector: ContaminationDetector,
+    tracker: RequestTracker,
+    harvester: FollowingHarvester | None,
+    previous: dict,
+    state: dict,
+    rendered: set[str] | None,
+) -> int:
+    """Bookkeeping after one scroll round; returns the rows collected so far.
 
-def scroll_until_end(page, delay: float = 2.5, max_idle: int = 6, max_rounds: int = 250, expected_total: int | None = None) -> None:
+    Raises ContaminatedListError when the list now looks polluted by suggestions.
+    """
+    count_after = len(harvester.following) if harvester is not None else state['unique']
+    reason = detector.check(count_after, rendered)
+    if reason:
+        raise ContaminatedListError(reason)
+    progressed = state['added'] > previous['added'] or state['height'] != previous['height']
+    scheduler.record(progressed, busy=tracker.inflight > 0)
+    return count_after
+
+
+def scroll_until_end(
+    page,
+    policy: ScrollPolicy | None = None,
+    expected_total: int | None = None,
+    harvester: FollowingHarvester | None = None,
+    throttled_policy: ScrollPolicy | None = None,
+) -> ScrollStats:
+    """Scroll the following dialog to its end and return the scroll stats.
+
+    Raises ContaminatedListError as soon as the list looks polluted by suggestions, so the caller
+    can skip the write and retry the profile later.
+    """
     page.wait_for_selector('div[role="dialog"]', timeout=10000)
-    dismiss_feedback_required_modal(page)
+    scheduler = ScrollScheduler(policy or POLICIES[DEFAULT_SCROLL_POLICY])
+    throttled_policy = throttled_policy or POLICIES[DEFAULT_THROTTLED_SCROLL_POLICY]
+    detector = ContaminationDetector(expected_total)
+
+    def snapshot_before_modal(modal_page) -> None:
+        seen = set(harvester.seen) if harvester is not None else set()
+        detector.record_modal(seen | rendered_following_urls(modal_page))
+
+    def dismiss_modal() -> bool:
+        started = scheduler.clock()
+        if not dismiss_feedback_required_modal(page, on_detected=snapshot_before_modal):
+            return False
+        scheduler.record_dismissal(started, throttled_policy)
+        return True
+
+    tracker = RequestTracker()
+    tracker.attach(page)
+    dismiss_modal()
     bar = None
     if expected_total and expected_total > 0:
         bar = tqdm(total=expected_total, desc='Followed', unit='profiles', leave=False)
     seen_count = 0
-    idle_rounds = 0
-    prev_height = 0
-    prev_count = 0
-    rounds = 0
+    state = page.evaluate(ROW_STATE_JS)
+    count_after = state['unique']
     try:
-        while idle_rounds < max_idle and rounds < max_rounds:
-            rounds += 1
-            dismiss_feedback_required_modal(page, max_wait_ms=2500)
-            anchors = page.locator('div[role="dialog"] a[role="link"]')
-            try:
-                count_before = anchors.count()
-            except Exception:
-                count_before = 0
-            if count_before == 0:
+        while not scheduler.done():
+            scheduler.start_round()
+            if dismiss_modal():
+                state = page.evaluate(ROW_STATE_JS)
+            if state['count'] == 0:
                 break
             try:
-                anchors.last.scroll_into_view_if_needed()
+                page.locator('div[role="dialog"] a[role="link"]').last.scroll_into_view_if_needed()
             except Exception:
                 pass
-            page.wait_for_timeout(int(delay * 1000))
-            current_height = page.evaluate(
-                """() => {
-                    const modal = document.querySelector('div[role=\"dialog\"]');
-                    if (!modal) return 0;
-                    return modal.scrollHeight || modal.offsetHeight || 0;
-                }"""
-            )
             try:
-                count_after = anchors.count()
+                page.wait_for_function(ROWS_ADDED_JS, arg=state['added'], timeout=scheduler.wait_ms())
             except Exception:
-                count_after = count_before
+                pass
+            previous = state
+            state = page.evaluate(ROW_STATE_JS)
+            rendered = rendered_following_urls(page) if detector.awaiting_post_modal else None
+            if harvester is not None:
+                harvest_rows(page, harvester)
+            count_after = finish_round(scheduler, detector, tracker, harvester, previous, state, rendered)
             if bar:
                 new_seen = max(seen_count, count_after)
                 increment = new_seen - seen_count
@@ -194,281 +465,747 @@ def scroll_until_end(page, delay: float = 2.5, max_idle: int = 6, max_rounds: in
                     if increment > 0:
                         bar.update(increment)
                 seen_count = new_seen
-            if current_height == prev_height and count_after == prev_count:
-                idle_rounds += 1
-            else:
-                idle_rounds = 0
-                prev_height = current_height
-                prev_count = count_after
-            if rounds % 10 == 0:
-                page.wait_for_timeout(int(delay * 1000))
+            pause = scheduler.pause_ms()
+            if pause:
+                page.wait_for_timeout(pause)
     finally:
+        tracker.detach(page)
         if bar:
             bar.close()
+    return scheduler.finish(rows=count_after)
 
 
-
-def extract_following(page) -> tuple[list[dict], str]:
-    try:
-        modal_html = page.inner_html('div[role="dialog"]')
-    except Exception:
-        modal_html = page.content()
-    soup = BeautifulSoup(modal_html, "html.parser")
+def records_from_users(users: list[tuple[str, str]]) -> list[dict]:
     following = []
     seen = set()
-    for anchor in soup.select('a[role="link"]'):
-        href = anchor.get('href')
-        if not href or href.startswith('#') or href.startswith('javascript'):
-            continue
-        normalized = normalize_profile_url(href)
+    for username, full_name in users:
+        normalized = normalize_profile_url(username)
         if not normalized or normalized in seen:
             continue
-        parsed = urlparse(normalized)
-        segments = [segment for segment in parsed.path.strip('/').split('/') if segment]
-        if len(segments) != 1:
-            continue
-        spans = anchor.select('span[dir="auto"]')
-        handle = spans[0].get_text(strip=True) if spans else ''
-        name = spans[1].get_text(strip=True) if len(spans) > 1 else ''
-        if not name:
-            name = handle
-        following.append({'url': normalized, 'name': name})
+        following.append({'url': normalized, 'name': full_name or username})
         seen.add(normalized)
-    return following, modal_html
+    return following
+
+
+def get_modal_html(page) -> str:
+    try:
+        return page.inner_html('div[role="dialog"]')
+    except Exception:
+        return page.content()
+
 
+def extract_following(
+    page,
+    interceptor: FollowingInterceptor | None = None,
+    parser: str | None = None,
+) -> tuple[list[dict], str]:
+    modal_html = get_modal_html(page)
+    if interceptor is not None and interceptor.responses:
+        return records_from_users(interceptor.users), modal_html
+    return parse_following_html(modal_html, parser), modal_html
 
-def get_following_count(page, username: str) -> int:
-    soup = BeautifulSoup(page.content(), "html.parser")
+
+def parse_following_count(html: str, username: str, parser: str | None = None) -> int:
     if not username:
         return 0
-    href_pattern = re.compile(rf'/{re.escape(username)}/following/?', re.IGNORECASE)
-    link = soup.find('a', href=href_pattern)
-    if not link:
-        return 0
-    candidates = []
-    text = link.get_text(strip=True)
-    if text:
-        candidates.append(text)
-    for span in link.find_all('span'):
-        span_text = span.get_text(strip=True)
-        if span_text:
-            candidates.append(span_text)
-    for candidate in candidates:
+    for candidate in get_parser(parser).following_link_texts(html, username):
         if re.search(r'\d', candidate):
             return parse_compact_number(candidate)
     return 0
 
 
-def open_following_modal(page, username: str) -> bool:
+def get_following_count(page, username: str, parser: str | None = None) -> int:
+    return parse_following_count(page.content(), username, parser)
+
+
+def wait_until_ready(page, condition_js: str, arg=None, budget_ms: int = 0) -> bool:
+    """Poll `condition_js` in the page for up to `budget_ms`; False when the budget ran out."""
+    try:
+        page.wait_for_function(condition_js, arg=arg, timeout=budget_ms, polling=READY_POLL_MS)
+        return True
+    except Exception:
+        return False
+
+
+def open_following_modal(
+    page,
+    username: str,
+    budget: ReadinessBudget | None = None,
+    expect_rows: bool = True,
+) -> bool:
+    """Open the following dialog and wait for its first rows (unless the profile follows nobody).
+
+    Raises EmptyListError when rows are expected but none render within the budget, so the visit
+    is retried instead of being saved as an empty list.
+    """
     if not username:
         return False
+    budget = budget or ReadinessBudget()
     selector = f'a[href="/{username}/following/"]'
     try:
-        page.wait_for_selector(selector, timeout=10000)
+        page.wait_for_selector(selector, timeout=budget.dialog_ms)
         page.click(selector)
-        page.wait_for_selector('div[role="dialog"]', timeout=10000)
-        time.sleep(2)
-        return True
+        page.wait_for_selector('div[role="dialog"]', timeout=budget.dialog_ms)
     except Exception:
         print("⚠️ Following not visible")
         return False
+    if expect_rows and not wait_until_ready(page, FIRST_ROWS_JS, budget_ms=budget.rows_ms):
+        raise EmptyListError(f"el diálogo de {username} no mostró filas en {budget.rows_ms} ms")
+    return True
 
 
-def save_to_duckdb(db_name: str, profile_url: str, following: list[dict], n_following: int, dom_html: str) -> None:
-    conn = duckdb.connect(db_name)
-    try:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS friendships (
-                profile TEXT,
-                friend TEXT,
-                name TEXT
-            )
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS profile_doms (
-                profile TEXT,
-                n_friends INT,
-                dom TEXT
-            )
-            """
-        )
-        for entry in following:
-            conn.execute(
-                "INSERT INTO friendships VALUES (?, ?, ?)",
-                (profile_url, entry['url'], entry['name'])
-            )
-        conn.execute(
-            "INSERT INTO profile_doms VALUES (?, ?, ?)",
-            (profile_url, n_following, dom_html)
-        )
-    finally:
-        conn.close()
+def reuse_known_visit(
+    profile_url: str,
+    db_name: str,
+    cache: ProfileCache | None,
+    cached: CachedProfile | None,
+    visibility: VisibilityCache | None,
+    metrics: MetricsRecorder | None,
+) -> list[dict] | None:
+    """Settle a visit without the browser, or return None when the profile has to be visited.
 
+    A fresh list found in `cache` (`cached`) is copied to `db_name`; a profile whose following list
+    prueba.py found hidden is skipped. No session is involved, so callers check this before leasing one.
+    """
+    visit = VisitRecord(profile_url, db_name=db_name)
+    if cached is not None:
+        print(f"♻️ Perfil en caché ({cached.crawled_at:%Y-%m-%d %H:%M}): {profile_url}")
+        cache.copy_to(db_name, cached)
+        visit.n_following, visit.n_declared = len(cached.following), cached.n_following
+        finish_visit(metrics, visit, 'cached')
+        return cached.following
+    if visibility is not None:
+        hidden = visibility.hidden(extract_username(profile_url))
+        if hidden is not None:
+            print(f"🙈 Seguidos ocultos según prueba.py ({hidden.checked_at:%Y-%m-%d %H:%M}): {profile_url}")
+            finish_visit(metrics, visit, 'hidden')
+            return []
+    return None
 
-def load_not_visited_profiles(db_name: str, profile_url: str, auxiliary_df: pd.DataFrame | None) -> list[str]:
-    conn = duckdb.connect(db_name)
-    try:
-        friends = conn.execute(
-            """
-            SELECT DISTINCT name, friend
-            FROM friendships
-            WHERE profile = ?
-            """,
-            (profile_url,)
-        ).fetchall()
-    finally:
-        conn.close()
 
-    name_to_friend = dict(friends)
-    if not name_to_friend:
-        return []
+def new_harvester(
+    options: CrawlOptions, writer: DuckDBWriter, db_name: str, profile_url: str
+) -> FollowingHarvester | None:
+    """Harvester whose rows are streamed to `db_name` until the visit's own write supersedes them."""
+    if not options.harvest:
+        return None
+    return FollowingHarvester(sink=lambda records: writer.submit_partial(db_name, profile_url, records))
 
-    if (
-        auxiliary_df is None
-        or 'alter' not in auxiliary_df.columns
-        or 'n_interactions' not in auxiliary_df.columns
-    ):
-        return sorted({friend for friend in name_to_friend.values()})
 
-    filtered_aux = auxiliary_df[auxiliary_df['alter'].isin(name_to_friend.keys())].copy()
-    filtered_aux['n_interactions'] = pd.to_numeric(filtered_aux['n_interactions'], errors='coerce').fillna(0)
-    top_50 = filtered_aux.sort_values(by='n_interactions', ascending=False).head(50)
-    top_friends = [name_to_friend[name] for name in top_50['alter'] if name in name_to_friend]
+def settle_scroll(
+    username: str,
+    following: list[dict],
+    following_count: int,
+    scroll_stats: ScrollStats,
+    governor: ThrottleGovernor | None,
+    session_storage_file: str,
+) -> bool:
+    """Report a scrolled list to the governor; True when it is complete enough to cache."""
+    print(f"   Seguimientos guardados ({username}): {len(following)} / declarados {following_count}")
+    suspicious = is_suspicious_count(len(following), following_count)
+    if governor is not None:
+        if scroll_stats.throttled:
+            governor.record_throttle(session_storage_file)
+        elif suspicious:
+            governor.record_mismatch(session_storage_file)
+        else:
+            governor.record_success(session_storage_file)
+    return not scroll_stats.throttled and not suspicious
 
-    conn = duckdb.connect(db_name)
-    try:
-        visited = conn.execute(
-            """
-            SELECT DISTINCT profile
-            FROM profile_doms
-            """
-        ).fetchall()
-    finally:
-        conn.close()
 
-    visited_set = {row[0] for row in visited}
-    return [friend for friend in top_friends if friend not in visited_set]
+def record_visit_error(
+    exc: Exception,
+    username: str,
+    visit: VisitRecord,
+    governor: ThrottleGovernor | None,
+    session_storage_file: str,
+    metrics: MetricsRecorder | None,
+) -> None:
+    """Tell the governor and the metrics about a failed visit before the error propagates."""
+    if isinstance(exc, ContaminatedListError):
+        print(f"   🚫 Lista de seguidos de {username} contaminada con sugerencias ({exc}); se reintentará más tarde")
+        if governor is not None:
+            governor.record_throttle(session_storage_file)
+        outcome = 'contaminated'
+    elif isinstance(exc, EmptyListError):
+        print(f"   ⏱️ {exc}; se reintentará más tarde")
+        if governor is not None:
+            governor.record_error(session_storage_file)
+        outcome = 'empty'
+    else:
+        traceback.print_exc()
+        if governor is not None:
+            governor.record_error(session_storage_file)
+        outcome = 'error'
+    finish_visit(metrics, visit, outcome, exc)
 
 
-def visit_and_extract(profile_url: str, browser, db_name: str, session_storage_file: str) -> list[dict]:
-    desktop_ua = (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/114.0.0.0 Safari/537.36"
-    )
+def save_visit(
+    writer: DuckDBWriter,
+    db_name: str,
+    profile_url: str,
+    following: list[dict],
+    following_count: int,
+    dom_html: str,
+    cache: ProfileCache | None,
+    complete: bool,
+    visit: VisitRecord,
+    metrics: MetricsRecorder | None,
+    outcome: str,
+) -> list[dict]:
+    with visit.phase('save'):
+        if cache is not None and complete:
+            cache.store(profile_url, following, following_count)
+        writer.submit(db_name, profile_url, following, following_count, dom_html)
+    visit.n_following = len(following)
+    finish_visit(metrics, visit, outcome)
+    return following
+
+
+def visit_and_extract(
+    profile_url: str,
+    pool: ContextPool,
+    writer: DuckDBWriter,
+    db_name: str,
+    session_storage_file: str,
+    options: CrawlOptions | None = None,
+    governor: ThrottleGovernor | None = None,
+    cache: ProfileCache | None = None,
+    metrics: MetricsRecorder | None = None,
+) -> list[dict]:
+    """Visit one profile and queue its following list for writing.
+
+    Nothing is written when the visit fails: ContaminatedListError (the list came back polluted by
+    suggestions) and any other error propagate, after the governor has been told, so the caller can
+    retry the profile later. A complete list is also stored in `cache`; cached and hidden profiles
+    are settled by reuse_known_visit before a session is leased for this.
+    """
+    options = options or CrawlOptions()
     username = extract_username(profile_url)
+    visit = VisitRecord(profile_url, session_storage_file, db_name)
     print(f"👤 Visitando perfil: {profile_url}")
 
-    context = browser.new_context(
-        user_agent=desktop_ua,
-        viewport={"width": 1200, "height": 900},
-        storage_state=session_storage_file,
-    )
-    page = context.new_page()
-
     following: list[dict] = []
     dom_html = ''
     following_count = 0
+    complete = False
+    outcome = 'no_modal'
+    harvester = new_harvester(options, writer, db_name, profile_url)
 
-    try:
-        page.goto(profile_url, wait_until="load")
-        time.sleep(5)
-        following_count = get_following_count(page, username)
-        modal_open = open_following_modal(page, username)
-        if modal_open:
-            dismiss_feedback_required_modal(page)
-            scroll_until_end(page, expected_total=following_count)
-            following, dom_html = extract_following(page)
-            print(f"   Seguimientos guardados: {len(following)} / declarados {following_count}")
-        else:
-            following = []
-            dom_html = ''
-    except Exception:
-        traceback.print_exc()
+    if governor is not None:
+        with visit.phase('governor'):
+            governor.acquire(session_storage_file)
+
+    with pool.page(session_storage_file) as page:
+        interceptor = FollowingInterceptor() if options.intercept else None
+        watcher = ErrorResponseWatcher(governor, session_storage_file) if governor is not None else None
+        if watcher is not None:
+            watcher.attach(page)
         try:
-            dom_html = page.content()
-        except Exception:
-            dom_html = ''
-    finally:
-        page.close()
-        context.close()
+            with visit.phase('goto'):
+                page.goto(profile_url, wait_until="domcontentloaded")
+                check_session(page.url)
+                profile_ready = wait_until_ready(page, PROFILE_READY_JS, username, options.readiness.profile_ms)
+                if not profile_ready:
+                    print(f"   ⏱️ {username} no mostró el contador de seguidos en {options.readiness.profile_ms} ms")
+            with visit.phase('count'):
+                following_count = get_following_count(page, username, options.parser)
+            visit.n_declared = following_count
+            if interceptor is not None:
+                interceptor.attach(page)
+            with visit.phase('modal_open'):
+                # A zero read before the profile was ready is an unknown count, not an empty list.
+                modal_open = open_following_modal(
+                    page, username, options.readiness, expect_rows=following_count != 0 or not profile_ready
+                )
+            if modal_open:
+                if not profile_ready and following_count == 0:
+                    with visit.phase('count'):
+                        following_count = get_following_count(page, username, options.parser)
+                    visit.n_declared = following_count
+                scroll_stats = scroll_until_end(
+                    page,
+                    POLICIES[options.scroll_policy],
+                    expected_total=following_count,
+                    harvester=harvester,
+                    throttled_policy=POLICIES[options.throttled_scroll_policy],
+                )
+                visit.add_scroll(scroll_stats)
+                print(
+                    f"   Scroll ({username}): {scroll_stats.rounds} rondas en {scroll_stats.seconds:.1f}s "
+                    f"(política {scroll_stats.policy})"
+                )
+                with visit.phase('extract'):
+                    if harvester is not None:
+                        harvest_rows(page, harvester)
+                        following, dom_html = harvester.following, get_modal_html(page)
+                    else:
+                        following, dom_html = extract_following(page, interceptor, options.parser)
+                complete = settle_scroll(
+                    username, following, following_count, scroll_stats, governor, session_storage_file
+                )
+                outcome = 'ok' if complete else 'incomplete'
+        except Exception as exc:
+            record_visit_error(exc, username, visit, governor, session_storage_file, metrics)
+            raise
+        finally:
+            if interceptor is not None:
+                interceptor.detach(page)
+            if watcher is not None:
+                watcher.detach(page)
 
-    save_to_duckdb(db_name, profile_url, following, following_count, dom_html)
-    return following
+    return save_visit(
+        writer, db_name, profile_url, following, following_count, dom_html, cache, complete, visit, metrics, outcome,
+    )
+
+
+def schedule_retry(frontier: Frontier, entry: FrontierEntry, exc: Exception, throttled: bool = False) -> None:
+    delay = frontier.retry(entry, str(exc) or type(exc).__name__, throttled)
+    if delay is None:
+        print(f"❌ {entry.profile} descartado tras {entry.attempts} intentos: {exc}")
+    else:
+        print(f"🔁 Reintento de {entry.profile} en {delay:.0f}s (intento {entry.attempts}/{frontier.config.max_attempts})")
+
+
+def write_failed(db_name: str) -> Exception:
+    """Retry reason for a visit the writer could not save (the traceback was already printed)."""
+    return RuntimeError(f"no se pudo guardar la visita en {db_name}")
+
+
+def seed_database(output_dir: str, profile_url: str, shard: Shard | None = None) -> tuple[str, str]:
+    profile_name = extract_profile_name(profile_url)
+    db_name = os.path.join(output_dir, f"{profile_name}.duckdb")
+    return profile_name, shard.path(db_name) if shard is not None else db_name
 
 
 def process_profiles(
     profile_urls: list[str],
-    df_interactions: pd.DataFrame | None,
-    browser,
-    session_storage_file: str,
+    priority: Priority | None,
+    pool: ContextPool,
+    writer: DuckDBWriter,
+    sessions: SessionPool,
     output_dir: str,
+    options: CrawlOptions | None = None,
+    governor: ThrottleGovernor | None = None,
+    cache: ProfileCache | None = None,
+    frontier_config: FrontierConfig | None = None,
+    metrics: MetricsRecorder | None = None,
+    visibility: VisibilityCache | None = None,
 ) -> None:
-    for profile_url in profile_urls:
-        profile_name = extract_profile_name(profile_url)
-        db_name = os.path.join(output_dir, f"{profile_name}.duckdb")
-        try:
-            not_visited = load_not_visited_profiles(db_name, profile_url, df_interactions)
-            partial_visits = True
-        except Exception:
-            not_visited = []
-            partial_visits = False
+    """Crawl each seed's frontier, retrying failed profiles on their own backoff schedule.
 
-        print(f"👤 Empezando perfil: {profile_name} — {len(not_visited)} por visitar")
+    A failed visit only reschedules that profile, and so does one whose rows the writer could not
+    save; seeds with retries still waiting are revisited after the other seeds. Each visit runs
+    under the session `sessions` picks, and its outcome feeds that session's health. Errors escape
+    only when the browser itself is gone.
+    """
+    frontier_config = frontier_config or FrontierConfig()
 
-        if not partial_visits:
-            visit_and_extract(profile_url, browser, db_name, session_storage_file)
-            try:
-                not_visited = load_not_visited_profiles(db_name, profile_url, df_interactions)
-            except Exception:
-                not_visited = []
+    def visit(frontier: Frontier, entry: FrontierEntry, db_name: str) -> list[dict] | None:
+        session = sessions.acquire()
+        error = None
+        try:
+            return visit_and_extract(entry.profile, pool, writer, db_name, session, options, governor, cache, metrics)
+        except ContaminatedListError as exc:
+            error = exc
+            schedule_retry(frontier, entry, exc, throttled=True)
+        except Exception as exc:
+            if not pool.connected():
+                raise
+            error = exc
+            schedule_retry(frontier, entry, exc)
+        finally:
+            sessions.release(session, error)
+        return None
 
-        for friend_url in not_visited:
-            if friend_url == profile_url:
-                continue
-            visit_and_extract(friend_url, browser, db_name, session_storage_file)
+    def crawl_seed(profile_url: str) -> float | None:
+        profile_name, db_name = seed_database(output_dir, profile_url, frontier_config.shard)
+        frontier = Frontier(db_name, profile_url, frontier_config, priority)
+        try:
+            pending = frontier.counts().get('pending', 0)
+            print(f"👤 Empezando perfil: {profile_name} — {pending} por visitar")
+            while (entry := frontier.pop()) is not None:
+                # Cached and hidden profiles are settled before leasing, so they never wait for a session.
+                cached = cache.lookup(entry.profile) if cache is not None else None
+                following = reuse_known_visit(entry.profile, db_name, cache, cached, visibility, metrics)
+                if following is None:
+                    following = visit(frontier, entry, db_name)
+                    if following is None:
+                        continue
+                if (db_name, entry.profile) in writer.flush():
+                    schedule_retry(frontier, entry, write_failed(db_name))
+                else:
+                    frontier.complete(entry, following)
+            return frontier.next_ready_in()
+        finally:
+            frontier.close()
 
+    waiting = list(profile_urls)
+    while waiting:
+        ready_in = {profile_url: crawl_seed(profile_url) for profile_url in waiting}
+        waiting = [profile_url for profile_url, delay in ready_in.items() if delay is not None]
+        if waiting:
+            delay = min(ready_in[profile_url] for profile_url in waiting)
+            if delay > 0:
+                print(f"⏳ Esperando {delay:.0f}s a los reintentos pendientes de {len(waiting)} semillas")
+                time.sleep(delay)
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Instagram following crawler")
+
+def build_arg_parser(description: str) -> argparse.ArgumentParser:
+    """Command line shared by crawler_ig.py and crawler_ig_async.py (which adds --concurrency)."""
+    parser = argparse.ArgumentParser(description=description)
     parser.add_argument("csv_path", help="Path to the CSV file with profile URLs")
-    parser.add_argument("session_json", help="Path to the Camoufox storage state for Instagram")
+    parser.add_argument(
+        "session_json",
+        nargs="+",
+        help="Camoufox storage state(s) for Instagram, or directories of them; visits are spread over all",
+    )
     parser.add_argument(
         "--interactions-csv",
         dest="interactions_csv",
-        help="Optional CSV with columns alter,n_interactions to prioritise alters",
+        help="Optional CSV or Parquet file with columns alter,n_interactions to prioritise alters",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--base-url",
+        dest="base_url",
+        default=BASE_URL,
+        help="Site root used to resolve relative profile links (e.g. a local fixture server)",
+    )
+    parser.add_argument(
+        "--recycle-after",
+        dest="recycle_after",
+        type=int,
+        default=DEFAULT_MAX_USES,
+        help="Number of profiles visited with a browser context before it is recycled",
+    )
+    parser.add_argument(
+        "--max-context-mb",
+        dest="max_context_mb",
+        type=float,
+        default=DEFAULT_MAX_MEMORY_MB,
+        help="Retire the most-used browser context (at most one a minute) while the whole browser's memory "
+        "exceeds this many MB; needs psutil (0 disables)",
+    )
+    parser.add_argument(
+        "--block-types",
+        dest="block_types",
+        type=parse_csv_list,
+        default=DEFAULT_BLOCKED_TYPES,
+        help="Resource types aborted on crawl pages, comma-separated ('' loads everything)",
+    )
+    parser.add_argument(
+        "--block-hosts",
+        dest="block_hosts",
+        type=parse_csv_list,
+        default=DEFAULT_BLOCKED_HOSTS,
+        help="Hosts (and their subdomains) whose requests are aborted, comma-separated ('' disables)",
+    )
+    parser.add_argument(
+        "--minimal-rendering",
+        dest="minimal_rendering",
+        action="store_true",
+        help="Disable CSS animations and transitions and ask for reduced motion",
+    )
+    extraction = parser.add_mutually_exclusive_group()
+    extraction.add_argument(
+        "--intercept",
+        action="store_true",
+        help="Read the following list from the JSON responses the dialog fetches (DOM parsing as fallback)",
+    )
+    extraction.add_argument(
+        "--harvest",
+        action="store_true",
+        help="Harvest rows while scrolling, stream them to DuckDB and prune them from the dialog",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=sorted(PARSERS),
+        default=DEFAULT_PARSER,
+        help="HTML parser backend used for the following count and list",
+    )
+    parser.add_argument(
+        "--scroll-policy",
+        dest="scroll_policy",
+        choices=sorted(POLICIES),
+        default=DEFAULT_SCROLL_POLICY,
+        help="Scroll scheduling policy for the following dialog",
+    )
+    parser.add_argument(
+        "--throttled-scroll-policy",
+        dest="throttled_scroll_policy",
+        choices=sorted(POLICIES),
+        default=DEFAULT_THROTTLED_SCROLL_POLICY,
+        help="Policy the scheduler switches to once the feedback/throttle modal shows up",
+    )
+    parser.add_argument(
+        "--profile-ready-ms",
+        dest="profile_ready_ms",
+        type=int,
+        default=ReadinessBudget.profile_ms,
+        help="Longest wait for the profile's following count after navigation",
+    )
+    parser.add_argument(
+        "--dialog-ready-ms",
+        dest="dialog_ready_ms",
+        type=int,
+        default=ReadinessBudget.dialog_ms,
+        help="Longest wait for the following link and its dialog",
+    )
+    parser.add_argument(
+        "--rows-ready-ms",
+        dest="rows_ready_ms",
+        type=int,
+        default=ReadinessBudget.rows_ms,
+        help="Longest wait for the first rows of the following dialog",
+    )
+    parser.add_argument(
+        "--session-failures",
+        dest="session_failures",
+        type=int,
+        default=DEFAULT_FAILURES_TO_QUARANTINE,
+        help="Consecutive failed visits after which a session is quarantined",
+    )
+    parser.add_argument(
+        "--quarantine",
+        type=float,
+        default=DEFAULT_QUARANTINE,
+        help="Seconds a failing session is benched (doubles on each new quarantine)",
+    )
+    parser.add_argument(
+        "--rate-per-hour",
+        dest="rate_per_hour",
+        type=float,
+        default=GovernorConfig.rate_per_hour,
+        help="Initial profile visits per hour per session; adapted from throttle signals",
+    )
+    parser.add_argument(
+        "--throttle-cooldown",
+        dest="throttle_cooldown",
+        type=float,
+        default=GovernorConfig.cooldown,
+        help="Seconds a session pauses after the feedback/throttle modal (grows if it repeats)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=Shard(),
+        help="Crawl only slice i of N (0 <= i < N, by URL hash): seeds are expanded on every shard, alters "
+        "are visited by their own shard only. Seed databases, the cache and metrics files get a per-shard "
+        "name. Merge the results with ig_merge.py",
+    )
+    parser.add_argument(
+        "--cache-db",
+        dest="cache_db",
+        default=DEFAULT_CACHE_DB,
+        help="DuckDB file with following lists shared across seeds",
+    )
+    parser.add_argument(
+        "--cache-ttl-hours",
+        dest="cache_ttl_hours",
+        type=float,
+        default=DEFAULT_CACHE_TTL_HOURS,
+        help="Reuse a cached following list younger than this instead of visiting the profile again (0 disables)",
+    )
+    parser.add_argument(
+        "--visibility-db",
+        dest="visibility_db",
+        default=DEFAULT_VISIBILITY_DB,
+        help="DuckDB file written by prueba.py; profiles whose following list it found hidden are skipped",
+    )
+    parser.add_argument(
+        "--visibility-ttl-hours",
+        dest="visibility_ttl_hours",
+        type=float,
+        default=DEFAULT_VISIBILITY_TTL_HOURS,
+        help="Trust visibility checks younger than this (0 disables the pre-check)",
+    )
+    parser.add_argument(
+        "--priority",
+        choices=PRIORITIES,
+        default=DEFAULT_PRIORITY,
+        help="How alters are ranked in the frontier: interactions CSV, followers seen by the crawl, "
+        "or overlap with the ego networks already crawled for the seed",
+    )
+    parser.add_argument(
+        "--top-k",
+        dest="top_k",
+        type=parse_top_k,
+        default=FrontierConfig.top_k,
+        help="Alters enqueued per crawled profile, per hop (e.g. 50 or 50,10; 0 keeps all)",
+    )
+    parser.add_argument(
+        "--max-depth",
+        dest="max_depth",
+        type=int,
+        default=DEFAULT_MAX_DEPTH,
+        help="Hops away from the seed to crawl (1 = alters, 2 = alters of alters, …)",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        dest="max_attempts",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        help="Visits tried per profile (retried with exponential backoff) before it is marked failed",
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        dest="metrics_jsonl",
+        help=f"JSONL file with one timing record per visit and DB write (default: <output dir>/{METRICS_JSONL}; '' disables)",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        dest="metrics_prom",
+        help=f"Prometheus text file with aggregate counters and histograms (default: <output dir>/{METRICS_PROM}; '' disables)",
+    )
+    return parser
+
+
+def options_from_args(args: argparse.Namespace) -> CrawlOptions:
+    return CrawlOptions(
+        intercept=args.intercept,
+        harvest=args.harvest,
+        parser=args.parser,
+        scroll_policy=args.scroll_policy,
+        throttled_scroll_policy=args.throttled_scroll_policy,
+        readiness=ReadinessBudget(args.profile_ready_ms, args.dialog_ready_ms, args.rows_ready_ms),
+    )
+
+
+@dataclass
+class CrawlRun:
+    """Everything main() builds from the command line before the browser starts."""
+
+    options: CrawlOptions
+    governor: ThrottleGovernor
+    route_policy: RoutePolicy
+    frontier_config: FrontierConfig
+    sessions: SessionPool
+    output_dir: str
+    profile_urls: list[str]
+    visibility: VisibilityCache
+    run_id: str
+    metrics: MetricsRecorder
 
-    csv_path = args.csv_path
-    session = args.session_json
-    df_interactions = None
-    if args.interactions_csv:
-        df_interactions = pd.read_csv(args.interactions_csv)
 
-    csv_basename = os.path.splitext(os.path.basename(csv_path))[0]
+def prepare_run(parser: argparse.ArgumentParser, args: argparse.Namespace, max_leases: int = 1) -> CrawlRun:
+    global BASE_URL
+    BASE_URL = args.base_url.rstrip('/')
+    governor = ThrottleGovernor(GovernorConfig(rate_per_hour=args.rate_per_hour, cooldown=args.throttle_cooldown))
+    frontier_config = FrontierConfig(
+        priority=args.priority,
+        top_k=args.top_k,
+        max_depth=args.max_depth,
+        max_attempts=args.max_attempts,
+        shard=args.shard,
+    )
+
+    session_files = resolve_session_files(args.session_json)
+    if not session_files:
+        parser.error("no storage-state files found in " + ", ".join(args.session_json))
+    sessions = SessionPool(
+        session_files,
+        governor,
+        max_leases=max_leases,
+        failures_to_quarantine=args.session_failures,
+        quarantine=args.quarantine,
+    )
+    print(f"🔑 {len(sessions)} sesiones: " + ", ".join(session_name(path) for path in session_files))
+
+    csv_basename = os.path.splitext(os.path.basename(args.csv_path))[0]
     output_dir = os.path.join("outputs", csv_basename)
     os.makedirs(output_dir, exist_ok=True)
 
-    profile_urls = load_profiles_from_csv(csv_path)
+    profile_urls = load_profiles_from_csv(args.csv_path, args.shard, args.max_depth)
+    if args.shard.count > 1:
+        print(f"🧩 Shard {args.shard}: {len(profile_urls)} semillas")
+
+    metrics_jsonl, metrics_prom = args.metrics_jsonl, args.metrics_prom
+    if metrics_jsonl is None:
+        metrics_jsonl = args.shard.path(os.path.join(output_dir, METRICS_JSONL))
+    if metrics_prom is None:
+        metrics_prom = args.shard.path(os.path.join(output_dir, METRICS_PROM))
+    visibility = VisibilityCache(args.visibility_db, args.visibility_ttl_hours)
+    if loaded := visibility.load():
+        print(f"🙈 {loaded} comprobaciones de visibilidad recientes en {visibility.db_name}")
+    run_id = new_run_id()
+    return CrawlRun(
+        options=options_from_args(args),
+        governor=governor,
+        route_policy=RoutePolicy(args.block_types, args.block_hosts, args.minimal_rendering),
+        frontier_config=frontier_config,
+        sessions=sessions,
+        output_dir=output_dir,
+        profile_urls=profile_urls,
+        visibility=visibility,
+        run_id=run_id,
+        metrics=MetricsRecorder(metrics_jsonl or None, metrics_prom or None, run_id),
+    )
+
+
+def pool_options(args: argparse.Namespace, run: CrawlRun) -> dict:
+    return {
+        "context_options": {"user_agent": DESKTOP_UA, "viewport": DESKTOP_VIEWPORT},
+        "max_uses": args.recycle_after,
+        "max_memory_mb": args.max_context_mb,
+        "route_policy": run.route_policy,
+    }
+
+
+def report_run(run: CrawlRun, cache: ProfileCache) -> None:
+    if cache.hits:
+        print(f"♻️ {cache.hits} perfiles reutilizados desde la caché compartida")
+    if run.visibility.hits:
+        print(f"🙈 {run.visibility.hits} perfiles omitidos por tener los seguidos ocultos")
+    if len(run.sessions) > 1:
+        for line in run.sessions.summary():
+            print(f"🔑 {line}")
+    print("✅ Crawling completado.")
+
+
+def main() -> None:
+    parser = build_arg_parser("Instagram following crawler")
+    args = parser.parse_args()
+    run = prepare_run(parser, args)
 
     success = False
-    retry_delays = [0, 100, 400, 800]
-    for idx, delay in enumerate(retry_delays):
-        with Camoufox(window=(850, 5000), headless=True) as browser:
-            try:
-                process_profiles(profile_urls, df_interactions, browser, session, output_dir)
-                success = True
-                break
-            except Exception:
-                traceback.print_exc()
-                if idx < len(retry_delays) - 1 and delay:
-                    time.sleep(delay)
+    with run.metrics, DuckDBWriter(run_id=run.run_id, metrics=run.metrics) as writer:
+        cache = ProfileCache(writer, args.shard.path(args.cache_db), args.cache_ttl_hours)
+        priority = make_priority(run.frontier_config.priority, args.interactions_csv, cache.db_name)
+        # Failed profiles are retried from the frontier journal; the browser is only relaunched when
+        # it dies, and the crawl then resumes from the journal.
+        for delay in (0,) + BROWSER_RESTART_DELAYS:
+            if delay:
+                print(f"🔄 Relanzando el navegador en {delay}s…")
+                time.sleep(delay)
+            with Camoufox(window=(850, 5000), headless=True) as browser:
+                pool = ContextPool(browser, **pool_options(args, run))
+                try:
+                    process_profiles(
+                        run.profile_urls,
+                        priority,
+                        pool,
+                        writer,
+                        run.sessions,
+                        run.output_dir,
+                        run.options,
+                        run.governor,
+                        cache,
+                        run.frontier_config,
+                        run.metrics,
+                        run.visibility,
+                    )
+                    success = True
+                    break
+                except Exception:
+                    traceback.print_exc()
+                    writer.flush()
+                finally:
+                    pool.close()
 
     if not success:
         sys.exit(1)
+    report_run(run, cache)
 
-    print("✅ Crawling completado.")
+
+if __name__ == "__main__":
+    main()
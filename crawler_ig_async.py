@@ -0,0 +1,477 @@
+import asyncio
+import sys
+import traceback
+
+from camoufox.async_api import AsyncCamoufox
+
+from crawler_ig import (
+    BROWSER_RESTART_DELAYS,
+    FIRST_ROWS_JS,
+    PROFILE_READY_JS,
+    READY_POLL_MS,
+    CrawlOptions,
+    ReadinessBudget,
+    FEEDBACK_CONFIRM_SELECTOR,
+    FEEDBACK_PROBE_JS,
+    HARVEST_KEEP_ANCHORS,
+    HARVEST_ROWS_JS,
+    FollowingHarvester,
+    build_arg_parser,
+    extract_username,
+    feedback_probe_arg,
+    finish_round,
+    new_harvester,
+    normalize_profile_url,
+    parse_following_count,
+    parse_following_html,
+    pool_options,
+    prepare_run,
+    record_visit_error,
+    records_from_users,
+    report_run,
+    reuse_known_visit,
+    save_visit,
+    schedule_retry,
+    seed_database,
+    settle_scroll,
+    write_failed,
+)
+from ig_governor import ErrorResponseWatcher, ThrottleGovernor
+from ig_intercept import AsyncFollowingInterceptor
+from ig_scroll import (
+    DEFAULT_SCROLL_POLICY,
+    DEFAULT_THROTTLED_SCROLL_POLICY,
+    POLICIES,
+    RENDERED_HREFS_JS,
+    ROW_STATE_JS,
+    ROWS_ADDED_JS,
+    ContaminatedListError,
+    ContaminationDetector,
+    EmptyListError,
+    RequestTracker,
+    ScrollPolicy,
+    ScrollScheduler,
+    ScrollStats,
+)
+from ig_sessions import SessionPool, check_session
+from ig_pool import AsyncContextPool
+from ig_cache import ProfileCache
+from ig_visibility import VisibilityCache
+from ig_frontier import Frontier, FrontierConfig, FrontierEntry, Priority, make_priority
+from ig_metrics import MetricsRecorder, VisitRecord
+from ig_storage import DuckDBWriter
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_SEEDS_IN_FLIGHT = 2
+
+
+async def dismiss_feedback_required_modal(page, max_wait_ms: int = 0, on_detected=None) -> bool:
+    """Async counterpart of crawler_ig.dismiss_feedback_required_modal."""
+    probe_arg = feedback_probe_arg()
+    try:
+        if max_wait_ms > 0:
+            try:
+                await page.wait_for_function(FEEDBACK_PROBE_JS, arg=probe_arg, timeout=max_wait_ms)
+                found = True
+            except Exception:
+                found = False
+        else:
+            found = await page.evaluate(FEEDBACK_PROBE_JS, probe_arg)
+    except Exception:
+        return False
+    if not found:
+        return False
+    print("   ⚠️ Feedback modal detectado, aceptando para continuar…")
+    if on_detected is not None:
+        await on_detected(page)
+    try:
+        await page.click(FEEDBACK_CONFIRM_SELECTOR, timeout=5000)
+    except Exception:
+        return False
+    await page.wait_for_timeout(1500)
+    return True
+
+
+async def harvest_rows(page, harvester: FollowingHarvester, keep: int = HARVEST_KEEP_ANCHORS) -> int:
+    try:
+        rows = await page.evaluate(HARVEST_ROWS_JS, keep)
+    except Exception:
+        return 0
+    return harvester.ingest(rows)
+
+
+async def rendered_following_urls(page) -> set[str]:
+    try:
+        hrefs = await page.evaluate(RENDERED_HREFS_JS)
+    except Exception:
+        return set()
+    return {normalize_profile_url(href) for href in hrefs if href}
+
+
+async def scroll_until_end(
+    page,
+    policy: ScrollPolicy | None = None,
+    expected_total: int | None = None,
+    harvester: FollowingHarvester | None = None,
+    throttled_policy: ScrollPolicy | None = None,
+) -> ScrollStats:
+    await page.wait_for_selector('div[role="dialog"]', timeout=10000)
+    scheduler = ScrollScheduler(policy or POLICIES[DEFAULT_SCROLL_POLICY])
+    throttled_policy = throttled_policy or POLICIES[DEFAULT_THROTTLED_SCROLL_POLICY]
+    detector = ContaminationDetector(expected_total)
+
+    async def snapshot_before_modal(modal_page) -> None:
+        seen = set(harvester.seen) if harvester is not None else set()
+        detector.record_modal(seen | await rendered_following_urls(modal_page))
+
+    async def dismiss_modal() -> bool:
+        started = scheduler.clock()
+        if not await dismiss_feedback_required_modal(page, on_detected=snapshot_before_modal):
+            return False
+        scheduler.record_dismissal(started, throttled_policy)
+        return True
+
+    tracker = RequestTracker()
+    tracker.attach(page)
+    await dismiss_modal()
+    state = await page.evaluate(ROW_STATE_JS)
+    count_after = state['unique']
+    try:
+        while not scheduler.done():
+            scheduler.start_round()
+            if await dismiss_modal():
+                state = await page.evaluate(ROW_STATE_JS)
+            if state['count'] == 0:
+                break
+            try:
+                await page.locator('div[role="dialog"] a[role="link"]').last.scroll_into_view_if_needed()
+            except Exception:
+                pass
+            try:
+                await page.wait_for_function(ROWS_ADDED_JS, arg=state['added'], timeout=scheduler.wait_ms())
+            except Exception:
+                pass
+            previous = state
+            state = await page.evaluate(ROW_STATE_JS)
+            rendered = await rendered_following_urls(page) if detector.awaiting_post_modal else None
+            if harvester is not None:
+                await harvest_rows(page, harvester)
+            count_after = finish_round(scheduler, detector, tracker, harvester, previous, state, rendered)
+            pause = scheduler.pause_ms()
+            if pause:
+                await page.wait_for_timeout(pause)
+    finally:
+        tracker.detach(page)
+    return scheduler.finish(rows=count_after)
+
+
+async def get_modal_html(page) -> str:
+    try:
+        return await page.inner_html('div[role="dialog"]')
+    except Exception:
+        return await page.content()
+
+
+async def extract_following(
+    page,
+    interceptor: AsyncFollowingInterceptor | None = None,
+    parser: str | None = None,
+) -> tuple[list[dict], str]:
+    modal_html = await get_modal_html(page)
+    if interceptor is not None:
+        await interceptor.drain()
+        if interceptor.responses:
+            return records_from_users(interceptor.users), modal_html
+    return parse_following_html(modal_html, parser), modal_html
+
+
+async def get_following_count(page, username: str, parser: str | None = None) -> int:
+    return parse_following_count(await page.content(), username, parser)
+
+
+async def wait_until_ready(page, condition_js: str, arg=None, budget_ms: int = 0) -> bool:
+    try:
+        await page.wait_for_function(condition_js, arg=arg, timeout=budget_ms, polling=READY_POLL_MS)
+        return True
+    except Exception:
+        return False
+
+
+async def open_following_modal(
+    page,
+    username: str,
+    budget: ReadinessBudget | None = None,
+    expect_rows: bool = True,
+) -> bool:
+    if not username:
+        return False
+    budget = budget or ReadinessBudget()
+    selector = f'a[href="/{username}/following/"]'
+    try:
+        await page.wait_for_selector(selector, timeout=budget.dialog_ms)
+        await page.click(selector)
+        await page.wait_for_selector('div[role="dialog"]', timeout=budget.dialog_ms)
+    except Exception:
+        print("⚠️ Following not visible")
+        return False
+    if expect_rows and not await wait_until_ready(page, FIRST_ROWS_JS, budget_ms=budget.rows_ms):
+        raise EmptyListError(f"el diálogo de {username} no mostró filas en {budget.rows_ms} ms")
+    return True
+
+
+async def visit_and_extract(
+    profile_url: str,
+    pool: AsyncContextPool,
+    writer: DuckDBWriter,
+    db_name: str,
+    session_storage_file: str,
+    options: CrawlOptions | None = None,
+    governor: ThrottleGovernor | None = None,
+    cache: ProfileCache | None = None,
+    metrics: MetricsRecorder | None = None,
+) -> list[dict]:
+    """Async counterpart of crawler_ig.visit_and_extract."""
+    options = options or CrawlOptions()
+    username = extract_username(profile_url)
+    visit = VisitRecord(profile_url, session_storage_file, db_name)
+    print(f"👤 Visitando perfil: {profile_url}")
+
+    following: list[dict] = []
+    dom_html = ''
+    following_count = 0
+    complete = False
+    outcome = 'no_modal'
+    harvester = new_harvester(options, writer, db_name, profile_url)
+
+    if governor is not None:
+        with visit.phase('governor'):
+            await governor.acquire_async(session_storage_file)
+
+    async with pool.page(session_storage_file) as page:
+        interceptor = AsyncFollowingInterceptor() if options.intercept else None
+        watcher = ErrorResponseWatcher(governor, session_storage_file) if governor is not None else None
+        if watcher is not None:
+            watcher.attach(page)
+        try:
+            with visit.phase('goto'):
+                await page.goto(profile_url, wait_until="domcontentloaded")
+                check_session(page.url)
+                profile_ready = await wait_until_ready(page, PROFILE_READY_JS, username, options.readiness.profile_ms)
+                if not profile_ready:
+                    print(f"   ⏱️ {username} no mostró el contador de seguidos en {options.readiness.profile_ms} ms")
+            with visit.phase('count'):
+                following_count = await get_following_count(page, username, options.parser)
+            visit.n_declared = following_count
+            if interceptor is not None:
+                interceptor.attach(page)
+            with visit.phase('modal_open'):
+                modal_open = await open_following_modal(
+                    page, username, options.readiness, expect_rows=following_count != 0 or not profile_ready
+                )
+            if modal_open:
+                if not profile_ready and following_count == 0:
+                    with visit.phase('count'):
+                        following_count = await get_following_count(page, username, options.parser)
+                    visit.n_declared = following_count
+                scroll_stats = await scroll_until_end(
+                    page,
+                    POLICIES[options.scroll_policy],
+                    expected_total=following_count,
+                    harvester=harvester,
+                    throttled_policy=POLICIES[options.throttled_scroll_policy],
+                )
+                visit.add_scroll(scroll_stats)
+                print(
+                    f"   Scroll ({username}): {scroll_stats.rounds} rondas en {scroll_stats.seconds:.1f}s "
+                    f"(política {scroll_stats.policy})"
+                )
+                with visit.phase('extract'):
+                    if harvester is not None:
+                        await harvest_rows(page, harvester)
+                        following, dom_html = harvester.following, await get_modal_html(page)
+                    else:
+                        following, dom_html = await extract_following(page, interceptor, options.parser)
+                complete = settle_scroll(
+                    username, following, following_count, scroll_stats, governor, session_storage_file
+                )
+                outcome = 'ok' if complete else 'incomplete'
+        except Exception as exc:
+            record_visit_error(exc, username, visit, governor, session_storage_file, metrics)
+            raise
+        finally:
+            if interceptor is not None:
+                interceptor.detach(page)
+            if watcher is not None:
+                watcher.detach(page)
+
+    return save_visit(
+        writer, db_name, profile_url, following, following_count, dom_html, cache, complete, visit, metrics, outcome,
+    )
+
+
+async def process_profiles(
+    profile_urls: list[str],
+    priority: Priority | None,
+    pool: AsyncContextPool,
+    writer: DuckDBWriter,
+    sessions: SessionPool,
+    output_dir: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    seeds_in_flight: int = DEFAULT_SEEDS_IN_FLIGHT,
+    options: CrawlOptions | None = None,
+    governor: ThrottleGovernor | None = None,
+    cache: ProfileCache | None = None,
+    frontier_config: FrontierConfig | None = None,
+    metrics: MetricsRecorder | None = None,
+    visibility: VisibilityCache | None = None,
+) -> None:
+    """Crawl seeds and their frontiers with up to `concurrency` visits in flight per session.
+
+    `sessions` leases a session to each visit (its `max_leases` is the per-session concurrency).
+    At most `seeds_in_flight` seeds are crawled at once. Failed profiles are rescheduled on their own
+    backoff; a seed left with only delayed retries gives up its slot and is revisited after the
+    others, as in crawler_ig.process_profiles. Errors escape only when the browser is gone, and
+    then cancel the other seeds.
+    """
+    concurrency = max(1, concurrency) * len(sessions)
+    frontier_config = frontier_config or FrontierConfig()
+    seed_slots = asyncio.Semaphore(max(1, seeds_in_flight))
+    # Visits written but not yet marked done. A flush returns the failed writes of every visit
+    # flushed with it, so each failure is settled by whichever visit receives it.
+    awaiting: dict[tuple[str, str], tuple[Frontier, FrontierEntry, list[dict]]] = {}
+
+    async def visit(frontier: Frontier, entry: FrontierEntry, db_name: str) -> None:
+        # Cached and hidden profiles are settled before leasing, so they never wait for a session.
+        cached = await asyncio.to_thread(cache.lookup, entry.profile) if cache is not None else None
+        following = reuse_known_visit(entry.profile, db_name, cache, cached, visibility, metrics)
+        if following is None:
+            session = await sessions.acquire_async()
+            error = None
+            try:
+                following = await visit_and_extract(
+                    entry.profile, pool, writer, db_name, session, options, governor, cache, metrics
+                )
+            except ContaminatedListError as exc:
+                error = exc
+                schedule_retry(frontier, entry, exc, throttled=True)
+                return
+            except Exception as exc:
+                if not pool.connected():
+                    raise
+                error = exc
+                schedule_retry(frontier, entry, exc)
+                return
+            finally:
+                sessions.release(session, error)
+        # The rows were queued without awaiting afterwards, so the visit is registered before any
+        # flush can report on it.
+        key = (db_name, entry.profile)
+        awaiting[key] = (frontier, entry, following)
+        failed = await asyncio.to_thread(writer.flush)
+        for failed_key in failed:
+            if failed_key in awaiting:
+                failed_frontier, failed_entry, _ = awaiting.pop(failed_key)
+                schedule_retry(failed_frontier, failed_entry, write_failed(failed_key[0]))
+        if awaiting.pop(key, None) is not None:
+            frontier.complete(entry, following)
+
+    async def crawl_seed(profile_url: str) -> float | None:
+        async with seed_slots:
+            profile_name, db_name = seed_database(output_dir, profile_url, frontier_config.shard)
+            frontier = Frontier(db_name, profile_url, frontier_config, priority)
+            inflight: set[asyncio.Task] = set()
+            try:
+                pending = frontier.counts().get('pending', 0)
+                print(f"👤 Empezando perfil: {profile_name} — {pending} por visitar")
+                # Entries are popped as slots free up; completed visits may enqueue more and failed
+                # ones come back after their backoff, which is waited for here while visits are in flight.
+                while True:
+                    while len(inflight) < concurrency and (entry := frontier.pop()) is not None:
+                        inflight.add(asyncio.ensure_future(visit(frontier, entry, db_name)))
+                    ready_in = frontier.next_ready_in()
+                    if not inflight:
+                        return ready_in
+                    done, inflight = await asyncio.wait(
+                        inflight, timeout=ready_in or None, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        task.result()
+            finally:
+                for task in inflight:
+                    task.cancel()
+                await asyncio.gather(*inflight, return_exceptions=True)
+                frontier.close()
+
+    waiting = list(profile_urls)
+    while waiting:
+        async with asyncio.TaskGroup() as group:
+            tasks = {profile_url: group.create_task(crawl_seed(profile_url)) for profile_url in waiting}
+        ready_in = {profile_url: task.result() for profile_url, task in tasks.items()}
+        waiting = [profile_url for profile_url, delay in ready_in.items() if delay is not None]
+        if waiting:
+            delay = min(ready_in[profile_url] for profile_url in waiting)
+            if delay > 0:
+                print(f"⏳ Esperando {delay:.0f}s a los reintentos pendientes de {len(waiting)} semillas")
+                await asyncio.sleep(delay)
+
+
+async def main() -> None:
+    parser = build_arg_parser("Concurrent Instagram following crawler")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Maximum number of profile visits running at once per session",
+    )
+    parser.add_argument(
+        "--seeds-in-flight",
+        dest="seeds_in_flight",
+        type=int,
+        default=DEFAULT_SEEDS_IN_FLIGHT,
+        help="Maximum number of seeds crawled at once",
+    )
+    args = parser.parse_args()
+    run = prepare_run(parser, args, max_leases=args.concurrency)
+
+    success = False
+    with run.metrics, DuckDBWriter(run_id=run.run_id, metrics=run.metrics) as writer:
+        cache = ProfileCache(writer, args.shard.path(args.cache_db), args.cache_ttl_hours)
+        priority = make_priority(run.frontier_config.priority, args.interactions_csv, cache.db_name)
+        for delay in (0,) + BROWSER_RESTART_DELAYS:
+            if delay:
+                print(f"🔄 Relanzando el navegador en {delay}s…")
+                await asyncio.sleep(delay)
+            async with AsyncCamoufox(window=(850, 5000), headless=True) as browser:
+                pool = AsyncContextPool(browser, **pool_options(args, run))
+                try:
+                    await process_profiles(
+                        run.profile_urls,
+                        priority,
+                        pool,
+                        writer,
+                        run.sessions,
+                        run.output_dir,
+                        args.concurrency,
+                        args.seeds_in_flight,
+                        run.options,
+                        run.governor,
+                        cache,
+                        run.frontier_config,
+                        run.metrics,
+                        run.visibility,
+                    )
+                    success = True
+                    break
+                except Exception:
+                    traceback.print_exc()
+                    await asyncio.to_thread(writer.flush)
+                finally:
+                    await pool.close()
+
+    if not success:
+        sys.exit(1)
+    report_run(run, cache)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
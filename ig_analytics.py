@@ -0,0 +1,267 @@
+import argparse
+import time
+from dataclasses import dataclass
+
+import duckdb
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from ig_storage import ensure_schema
+
+
+@dataclass
+class Graph:
+    """Follow graph in CSR form: row i holds the profiles node i follows.
+
+    Node ids are the `id` column of the graph_nodes table, so results can be written back as
+    integer tables and joined to URLs inside DuckDB. `crawled` marks nodes whose following list was
+    collected, even partly (a profile_doms or friendships row); edges out of the others are unknown
+    rather than absent.
+    """
+
+    adjacency: sparse.csr_array
+    crawled: np.ndarray
+
+    @property
+    def n_nodes(self) -> int:
+        return self.adjacency.shape[0]
+
+    @property
+    def n_edges(self) -> int:
+        return self.adjacency.nnz
+
+
+def load_graph(conn) -> Graph:
+    """Index every profile as an integer (table graph_nodes) and load friendships as a CSR matrix."""
+    # Ids are only stable within one run: every analytics table is rebuilt from them together.
+    conn.execute(
+        """
+        CREATE OR REPLACE TABLE graph_nodes AS
+        SELECT (row_number() OVER () - 1)::INTEGER AS id, url
+        FROM (
+            SELECT profile AS url FROM friendships
+            UNION SELECT friend FROM friendships
+            UNION SELECT profile FROM profile_doms
+        )
+        """
+    )
+    n_nodes = conn.execute("SELECT count(*) FROM graph_nodes").fetchone()[0]
+    edges = conn.execute(
+        """
+        SELECT s.id AS src, d.id AS dst
+        FROM friendships f
+        JOIN graph_nodes s ON s.url = f.profile
+        JOIN graph_nodes d ON d.url = f.friend
+        """
+    ).fetchnumpy()
+    src = np.asarray(edges['src'], dtype=np.int32)
+    dst = np.asarray(edges['dst'], dtype=np.int32)
+    adjacency = sparse.csr_array(
+        (np.ones(len(src), dtype=np.int32), (src, dst)), shape=(n_nodes, n_nodes)
+    )
+    adjacency.sum_duplicates()
+    crawled = np.diff(adjacency.indptr) > 0
+    visited = conn.execute(
+        "SELECT n.id FROM profile_doms p JOIN graph_nodes n ON n.url = p.profile"
+    ).fetchnumpy()['id']
+    crawled[np.asarray(visited, dtype=np.int64)] = True
+    return Graph(adjacency, crawled)
+
+
+def degrees(graph: Graph) -> pd.DataFrame:
+    """Out/in degree per node, and how many of its out-edges are reciprocated.
+
+    Reciprocity is measured only over edges towards crawled profiles: for the others we cannot
+    know whether they follow back.
+    """
+    adjacency = graph.adjacency
+    out_degree = np.diff(adjacency.indptr)
+    in_degree = np.bincount(adjacency.indices, minlength=graph.n_nodes)
+    mutual = adjacency.multiply(adjacency.T).tocsr()
+    mutual_degree = np.diff(mutual.indptr)
+    towards_crawled = sparse.csr_array(
+        (graph.crawled[adjacency.indices].astype(np.int32), adjacency.indices, adjacency.indptr),
+        shape=adjacency.shape,
+    )
+    observable = np.asarray(towards_crawled.sum(axis=1)).ravel()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reciprocity = np.where(observable > 0, mutual_degree / observable, np.nan)
+    return pd.DataFrame({
+        'id': np.arange(graph.n_nodes, dtype=np.int32),
+        'crawled': graph.crawled,
+        'out_degree': out_degree.astype(np.int32),
+        'in_degree': in_degree.astype(np.int32),
+        'mutual_degree': mutual_degree.astype(np.int32),
+        'observable_out': observable.astype(np.int32),
+        'reciprocity': reciprocity,
+    })
+
+
+def mutual_pairs(graph: Graph) -> pd.DataFrame:
+    """Every pair of profiles that follow each other, once (a < b)."""
+    mutual = sparse.triu(graph.adjacency.multiply(graph.adjacency.T), k=1).tocoo()
+    return pd.DataFrame({'a': mutual.row.astype(np.int32), 'b': mutual.col.astype(np.int32)})
+
+
+def ego_overlap(graph: Graph, seeds: np.ndarray) -> pd.DataFrame:
+    """Jaccard overlap of the following lists of every pair of crawled alters in each seed's ego network.
+
+    The alters of a seed are the profiles it follows. For alters a and b the overlap is
+    |N(a) ∩ N(b)| / |N(a) ∪ N(b)| over their out-neighbourhoods. Only pairs sharing at least one
+    followed profile are returned, since the intersection counts come from a sparse product.
+    """
+    adjacency = graph.adjacency
+    out_degree = np.diff(adjacency.indptr)
+    frames = []
+    for seed in seeds:
+        alters = adjacency.indices[adjacency.indptr[seed]:adjacency.indptr[seed + 1]]
+        alters = alters[graph.crawled[alters] & (out_degree[alters] > 0)]
+        if len(alters) < 2:
+            continue
+        rows = adjacency[alters]
+        shared = sparse.triu(rows @ rows.T, k=1).tocoo()
+        if not shared.nnz:
+            continue
+        a = alters[shared.row]
+        b = alters[shared.col]
+        union = out_degree[a] + out_degree[b] - shared.data
+        frames.append(pd.DataFrame({
+            'seed': np.full(shared.nnz, seed, dtype=np.int32),
+            'a': a.astype(np.int32),
+            'b': b.astype(np.int32),
+            'shared': shared.data.astype(np.int32),
+            'jaccard': shared.data / union,
+        }))
+    if not frames:
+        return pd.DataFrame({
+            'seed': np.array([], dtype=np.int32),
+            'a': np.array([], dtype=np.int32),
+            'b': np.array([], dtype=np.int32),
+            'shared': np.array([], dtype=np.int32),
+            'jaccard': np.array([], dtype=np.float64),
+        })
+    return pd.concat(frames, ignore_index=True)
+
+
+def seed_ids(conn) -> np.ndarray:
+    """Ids of the seeds recorded in the database (frontier of a seed file, seed_profiles of a merge)."""
+    sources = [
+        f"SELECT DISTINCT seed FROM {table}"
+        for table in ('frontier', 'seed_profiles')
+        if conn.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ? AND table_catalog = current_database()",
+            (table,),
+        ).fetchone()[0]
+    ]
+    if not sources:
+        return np.array([], dtype=np.int32)
+    rows = conn.execute(
+        f"SELECT n.id FROM graph_nodes n WHERE n.url IN ({' UNION '.join(sources)}) ORDER BY n.id"
+    ).fetchnumpy()
+    return np.asarray(rows['id'], dtype=np.int32)
+
+
+def _replace_table(conn, table: str, frame: pd.DataFrame, select: str) -> None:
+    conn.register('analytics_frame', frame)
+    try:
+        conn.execute(f"CREATE OR REPLACE TABLE {table} AS {select}")
+    finally:
+        conn.unregister('analytics_frame')
+
+
+def analyse(conn) -> dict[str, float]:
+    """Compute the graph metrics and (re)write the analytics tables; returns the summary values."""
+    timings = {}
+    started = time.perf_counter()
+    graph = load_graph(conn)
+    timings['load_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    node_degrees = degrees(graph)
+    pairs = mutual_pairs(graph)
+    seeds = seed_ids(conn)
+    overlap = ego_overlap(graph, seeds)
+    timings['compute_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        _replace_table(
+            conn,
+            'node_degrees',
+            node_degrees,
+            """
+            SELECT n.url AS profile, d.crawled, d.out_degree, d.in_degree, d.mutual_degree, d.observable_out,
+                   d.reciprocity
+            FROM analytics_frame d JOIN graph_nodes n ON n.id = d.id
+            """,
+        )
+        _replace_table(
+            conn,
+            'mutual_pairs',
+            pairs,
+            """
+            SELECT na.url AS profile_a, nb.url AS profile_b
+            FROM analytics_frame p JOIN graph_nodes na ON na.id = p.a JOIN graph_nodes nb ON nb.id = p.b
+            """,
+        )
+        _replace_table(
+            conn,
+            'ego_overlap',
+            overlap,
+            """
+            SELECT ns.url AS seed, na.url AS alter_a, nb.url AS alter_b, o.shared, o.jaccard
+            FROM analytics_frame o
+            JOIN graph_nodes ns ON ns.id = o.seed
+            JOIN graph_nodes na ON na.id = o.a
+            JOIN graph_nodes nb ON nb.id = o.b
+            """,
+        )
+        observable_edges = int(node_degrees['observable_out'].sum())
+        summary = {
+            'nodes': graph.n_nodes,
+            'edges': graph.n_edges,
+            'crawled': int(graph.crawled.sum()),
+            'seeds': len(seeds),
+            'mutual_pairs': len(pairs),
+            'reciprocity': 2 * len(pairs) / observable_edges if observable_edges else float('nan'),
+            'ego_pairs': len(overlap),
+            **timings,
+        }
+        _replace_table(
+            conn,
+            'graph_summary',
+            pd.DataFrame({'metric': list(summary), 'value': [float(value) for value in summary.values()]}),
+            "SELECT metric, value, now() AS computed_at FROM analytics_frame",
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    summary['write_seconds'] = time.perf_counter() - started
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Degree, reciprocity and ego-overlap analytics over crawl databases")
+    parser.add_argument("databases", nargs="+", help="DuckDB files to analyse (per-seed or merged)")
+    args = parser.parse_args()
+    for db_name in args.databases:
+        conn = duckdb.connect(db_name)
+        try:
+            ensure_schema(conn)
+            summary = analyse(conn)
+        finally:
+            conn.close()
+        print(
+            f"📈 {db_name}: {summary['nodes']:.0f} perfiles, {summary['edges']:.0f} seguimientos, "
+            f"{summary['mutual_pairs']:.0f} pares mutuos, reciprocidad {summary['reciprocity']:.3f}, "
+            f"{summary['ego_pairs']:.0f} pares de alters "
+            f"({summary['load_seconds']:.1f}s carga, {summary['compute_seconds']:.1f}s cálculo, "
+            f"{summary['write_seconds']:.1f}s escritura)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import duckdb
+
+from ig_storage import DuckDBWriter
+
+DEFAULT_CACHE_TTL_HOURS = 168.0
+DEFAULT_CACHE_DB = os.path.join("outputs", "profile_cache.duckdb")
+
+
+@dataclass
+class CachedProfile:
+    profile: str
+    following: list[dict]
+    n_following: int
+    crawled_at: datetime
+
+
+class ProfileCache:
+    """Following lists crawled from any seed, shared so an alter followed by several seeds is visited once.
+
+    The cache is a DuckDB file with the seed schema, written through the same DuckDBWriter. It keeps
+    no DOM snapshots; those stay in the seed database of the visit that produced them. `lookup` only
+    returns entries younger than `ttl_hours`. Entries stored during this run are served from memory,
+    so they are visible before the writer has flushed them.
+    """
+
+    def __init__(self, writer: DuckDBWriter, db_name: str = DEFAULT_CACHE_DB, ttl_hours: float = DEFAULT_CACHE_TTL_HOURS):
+        self.writer = writer
+        self.db_name = db_name
+        self.ttl = timedelta(hours=ttl_hours)
+        self.hits = 0
+        self._recent: dict[str, CachedProfile] = {}
+        self._lock = threading.Lock()
+        if self.enabled and os.path.dirname(db_name):
+            os.makedirs(os.path.dirname(db_name), exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl.total_seconds() > 0
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def _load(self, profile_url: str, oldest: datetime) -> CachedProfile | None:
+        if not os.path.exists(self.db_name):
+            return None
+        conn = duckdb.connect(self.db_name)
+        try:
+            row = conn.execute(
+                "SELECT n_friends, crawled_at FROM profile_doms WHERE profile = ? AND crawled_at >= ?",
+                (profile_url, oldest),
+            ).fetchone()
+            if row is None:
+                return None
+            friends = conn.execute(
+                "SELECT friend, name FROM friendships WHERE profile = ?",
+                (profile_url,),
+            ).fetchall()
+        except duckdb.Error:
+            return None
+        finally:
+            conn.close()
+        return CachedProfile(
+            profile=profile_url,
+            following=[{'url': friend, 'name': name} for friend, name in friends],
+            n_following=row[0] or 0,
+            crawled_at=row[1],
+        )
+
+    def lookup(self, profile_url: str) -> CachedProfile | None:
+        if not self.enabled:
+            return None
+        oldest = self._now() - self.ttl
+        with self._lock:
+            cached = self._recent.get(profile_url)
+        if cached is None or cached.crawled_at < oldest:
+            cached = self._load(profile_url, oldest)
+        if cached is not None:
+            self.hits += 1
+        return cached
+
+    def store(self, profile_url: str, following: list[dict], n_following: int) -> None:
+        if not self.enabled:
+            return
+        cached = CachedProfile(profile_url, list(following), n_following, self._now())
+        with self._lock:
+            self._recent[profile_url] = cached
+        self.writer.submit(self.db_name, profile_url, cached.following, n_following, '')
+
+    def copy_to(self, db_name: str, cached: CachedProfile) -> None:
+        """Write a cached visit into a seed database as if the profile had just been crawled for it."""
+        self.writer.submit(db_name, cached.profile, cached.following, cached.n_following, '')
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import shutil
+
+import duckdb
+
+from ig_merge import DEFAULT_INPUTS, SOURCE, resolve_inputs
+from ig_storage import catalog_tables, is_current_schema
+
+DEFAULT_EXPORT_DIR = os.path.join("outputs", "export")
+EXPORT_STATE = "_export_state.json"
+DATASETS = ("profiles", "friendships", "doms")
+PARTITION_BY = "(seed, crawl_date)"
+
+
+def load_state(export_dir: str) -> dict[str, str]:
+    """Watermarks of previous exports: database path -> last exported profile_doms.crawled_at."""
+    path = os.path.join(export_dir, EXPORT_STATE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_state(export_dir: str, state: dict[str, str]) -> None:
+    path = os.path.join(export_dir, EXPORT_STATE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _copy(conn, query: str, export_dir: str, dataset: str) -> None:
+    target = os.path.join(export_dir, dataset).replace("'", "''")
+    # APPEND with uuid file names: each export adds files to the partitions it touches.
+    conn.execute(
+        f"""
+        COPY ({query}) TO '{target}'
+        (FORMAT parquet, COMPRESSION zstd, PARTITION_BY {PARTITION_BY}, APPEND, FILENAME_PATTERN 'part-{{uuid}}')
+        """
+    )
+
+
+def export_database(conn, path: str, export_dir: str, watermark: str | None, doms: bool) -> tuple[int, str | None]:
+    """Stream the visits of one seed database newer than `watermark` into the Parquet datasets.
+
+    Returns (visits exported, new watermark). A visit is a profile_doms row; its friendships go to
+    the same seed=/crawl_date= partition. Visits without crawled_at (databases from before it was
+    recorded) are only exported by the first or a --full export. A profile crawled again later is
+    exported again: readers keep the row with the latest crawled_at. The database is attached
+    read-only and must be at SCHEMA_VERSION.
+    """
+    seed = os.path.splitext(os.path.basename(path))[0]
+    quoted = path.replace("'", "''")
+    conn.execute(f"ATTACH '{quoted}' AS {SOURCE} (READ_ONLY)")
+    try:
+        depth = (
+            f"(SELECT min(depth) FROM {SOURCE}.frontier fr WHERE fr.profile = p.profile)"
+            if 'frontier' in catalog_tables(conn, SOURCE)
+            else "NULL::INT"
+        )
+        conn.execute(
+            f"""
+            CREATE OR REPLACE TEMP TABLE visits AS
+            SELECT
+                p.profile, p.n_friends, p.dom_hash, p.crawled_at, p.run_id, {depth} AS depth,
+                ?::TEXT AS seed, CAST(p.crawled_at AS DATE) AS crawl_date
+            FROM {SOURCE}.profile_doms p
+            WHERE ?::TIMESTAMP IS NULL OR p.crawled_at > ?::TIMESTAMP
+            """,
+            (seed, watermark, watermark),
+        )
+        exported, latest = conn.execute("SELECT count(*), max(crawled_at) FROM visits").fetchone()
+        if exported:
+            _copy(conn, "SELECT * FROM visits", export_dir, "profiles")
+            _copy(
+                conn,
+                f"""
+                SELECT f.profile, f.friend, f.name, f.crawled_at, f.run_id, v.seed, v.crawl_date
+                FROM {SOURCE}.friendships f JOIN visits v USING (profile)
+                """,
+                export_dir,
+                "friendships",
+            )
+            if doms:
+                # Blobs stay compressed as stored (see ig_storage.decompress_dom for the codecs).
+                _copy(
+                    conn,
+                    f"""
+                    SELECT v.profile, v.dom_hash, b.codec, b.raw_size, b.dom, v.seed, v.crawl_date
+                    FROM visits v JOIN {SOURCE}.dom_blobs b ON b.hash = v.dom_hash
+                    """,
+                    export_dir,
+                    "doms",
+                )
+        conn.execute("DROP TABLE visits")
+    finally:
+        conn.execute(f"DETACH {SOURCE}")
+    return exported, latest.isoformat() if latest is not None else watermark
+
+
+def export(inputs: list[str], export_dir: str, full: bool, doms: bool) -> None:
+    if full:
+        for dataset in DATASETS:
+            shutil.rmtree(os.path.join(export_dir, dataset), ignore_errors=True)
+    os.makedirs(export_dir, exist_ok=True)
+    state = {} if full else load_state(export_dir)
+    conn = duckdb.connect()
+    try:
+        total = 0
+        for path in inputs:
+            key = os.path.abspath(path)
+            if not is_current_schema(path):
+                continue
+            exported, watermark = export_database(conn, path, export_dir, state.get(key), doms)
+            if watermark is not None:
+                state[key] = watermark
+            # Saved after each database so an interrupted export resumes where it stopped.
+            save_state(export_dir, state)
+            total += exported
+            if exported:
+                print(f"📦 {path}: {exported} visitas exportadas")
+    finally:
+        conn.close()
+    print(f"✅ {total} visitas nuevas exportadas a {export_dir}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Export seed databases to Parquet partitioned by seed and crawl date (incremental)"
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=[DEFAULT_INPUTS],
+        help=f"Seed databases, directories or glob patterns to export (default: {DEFAULT_INPUTS})",
+    )
+    parser.add_argument("-o", "--output", default=DEFAULT_EXPORT_DIR, help="Directory of the Parquet datasets")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rewrite the datasets from scratch instead of adding the visits since the last export",
+    )
+    parser.add_argument(
+        "--doms",
+        action="store_true",
+        help="Also export the compressed DOM snapshots (doms/ dataset)",
+    )
+    args = parser.parse_args()
+    inputs = resolve_inputs(args.inputs, args.output)
+    if not inputs:
+        parser.error("no databases matched " + ", ".join(args.inputs))
+    export(inputs, args.output, args.full, args.doms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import duckdb
+import pandas as pd
+
+from ig_shard import Shard
+from ig_storage import ensure_schema
+
+DEFAULT_PRIORITY = "interactions"
+DEFAULT_TOP_K = (50,)
+DEFAULT_MAX_DEPTH = 1
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_RETRY_BASE = 60.0
+DEFAULT_RETRY_MAX = 3600.0
+
+
+def parse_top_k(value: str) -> tuple[int, ...]:
+    """'50' or '50,10': alters kept per expanded profile at depth 1, 2, … (the last value repeats, 0 = all)."""
+    top_k = tuple(int(part) for part in value.split(',') if part.strip())
+    if not top_k or any(k < 0 for k in top_k):
+        raise ValueError(f"Invalid top-K: {value}")
+    return top_k
+
+
+@dataclass
+class FrontierConfig:
+    priority: str = DEFAULT_PRIORITY
+    top_k: tuple[int, ...] = DEFAULT_TOP_K
+    max_depth: int = DEFAULT_MAX_DEPTH
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    retry_base: float = DEFAULT_RETRY_BASE
+    retry_max: float = DEFAULT_RETRY_MAX
+    shard: Shard = Shard()
+
+    def k_for(self, depth: int) -> int | None:
+        """Top-K applied to the alters of a profile at `depth` (None when every alter is kept)."""
+        k = self.top_k[min(depth, len(self.top_k) - 1)]
+        return k or None
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds before retry number `attempts`: exponential, capped, with the upper half jittered."""
+        delay = min(self.retry_max, self.retry_base * 2 ** max(0, attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+@dataclass
+class FrontierEntry:
+    profile: str
+    parent: str | None
+    depth: int
+    priority: float
+    attempts: int
+
+
+def _indegree(conn, urls: list[str]) -> dict[str, int]:
+    rows = conn.execute(
+        """
+        SELECT friend, count(*)
+        FROM friendships
+        WHERE friend IN (SELECT unnest(?::TEXT[]))
+        GROUP BY friend
+        """,
+        (urls,),
+    ).fetchall()
+    return dict(rows)
+
+
+def _top(scores: dict[str, float], k: int | None) -> list[tuple[str, float]]:
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return ranked if k is None else ranked[:k]
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class InteractionsPriority:
+    """n_interactions of the alter in the interactions file (matched by name); unmatched alters are dropped.
+
+    The CSV or Parquet file is exposed as an `interactions` view and reduced once to one weight per
+    alter; each expansion then ranks the parent's friendships with a single join in the seed database.
+    Without an interactions file every alter is kept with priority 0, as the crawler always did.
+    """
+
+    name = "interactions"
+
+    def __init__(self, source: str | None = None):
+        self.source = source
+        self.weights = None
+        if source:
+            self.weights = self._load_weights(source)
+
+    @staticmethod
+    def _load_weights(source: str):
+        reader = "read_parquet" if source.lower().endswith(".parquet") else "read_csv_auto"
+        conn = duckdb.connect()
+        try:
+            conn.execute(f"CREATE VIEW interactions AS SELECT * FROM {reader}({_sql_literal(source)})")
+            columns = {row[0] for row in conn.execute("DESCRIBE interactions").fetchall()}
+            if not {'alter', 'n_interactions'} <= columns:
+                print(f"⚠️ {source} no tiene las columnas alter,n_interactions; no se prioriza por interacciones")
+                return None
+            return conn.execute(
+                """
+                SELECT "alter"::TEXT AS "alter", max(coalesce(try_cast(n_interactions AS DOUBLE), 0)) AS n_interactions
+                FROM interactions
+                WHERE "alter" IS NOT NULL
+                GROUP BY "alter"
+                """
+            ).df()
+        finally:
+            conn.close()
+
+    @property
+    def ranked(self) -> bool:
+        return self.weights is not None
+
+    def rank(self, conn, parent: str, candidates: list[dict], k: int | None) -> list[tuple[str, float]]:
+        if self.weights is None:
+            return _top({entry['url']: 0.0 for entry in candidates}, None)
+        conn.register('interaction_weights', self.weights)
+        try:
+            return conn.execute(
+                """
+                SELECT f.friend, w.n_interactions
+                FROM friendships f
+                JOIN interaction_weights w ON w."alter" = f.name
+                WHERE f.profile = ? AND f.friend IN (SELECT unnest(?::TEXT[]))
+                ORDER BY w.n_interactions DESC, f.friend
+                LIMIT ?
+                """,
+                (parent, [entry['url'] for entry in candidates], k),
+            ).fetchall()
+        finally:
+            conn.unregister('interaction_weights')
+
+
+class FollowersPriority:
+    """Followers observed by the crawl: how many crawled profiles follow the alter.
+
+    Counted over the shared profile cache when there is one (every seed), else over the seed database.
+    """
+
+    name = "followers"
+    ranked = True
+
+    def __init__(self, cache_db: str | None = None):
+        self.cache_db = cache_db
+
+    def rank(self, conn, parent: str, candidates: list[dict], k: int | None) -> list[tuple[str, float]]:
+        urls = [entry['url'] for entry in candidates]
+        counts = None
+        if self.cache_db and os.path.exists(self.cache_db):
+            cache_conn = duckdb.connect(self.cache_db)
+            try:
+                counts = _indegree(cache_conn, urls)
+            except duckdb.Error:
+                counts = None
+            finally:
+                cache_conn.close()
+        if counts is None:
+            counts = _indegree(conn, urls)
+        return _top({url: float(counts.get(url, 0)) for url in urls}, k)
+
+
+class OverlapPriority:
+    """Overlap with the ego networks already crawled for this seed: how many of them include the alter."""
+
+    name = "overlap"
+    ranked = True
+
+    def rank(self, conn, parent: str, candidates: list[dict], k: int | None) -> list[tuple[str, float]]:
+        urls = [entry['url'] for entry in candidates]
+        counts = _indegree(conn, urls)
+        return _top({url: float(counts.get(url, 0)) for url in urls}, k)
+
+
+Priority = InteractionsPriority | FollowersPriority | OverlapPriority
+PRIORITIES = (InteractionsPriority.name, FollowersPriority.name, OverlapPriority.name)
+
+
+def make_priority(name: str, interactions: str | None = None, cache_db: str | None = None) -> Priority:
+    """Build a priority function; `interactions` is the CSV/Parquet file with alter,n_interactions."""
+    if name == InteractionsPriority.name:
+        return InteractionsPriority(interactions)
+    if name == FollowersPriority.name:
+        return FollowersPriority(cache_db)
+    if name == OverlapPriority.name:
+        return OverlapPriority()
+    raise ValueError(f"Unknown priority: {name} (choose from {', '.join(PRIORITIES)})")
+
+
+class Frontier:
+    """Durable crawl queue and journal of one seed, kept in the `frontier` table of the seed database.
+
+    `pop` hands out the ready entry (pending, or throttled whose backoff has passed) with the lowest
+    depth, fewest attempts and highest priority and marks it in_progress. `complete` marks it done and,
+    below `max_depth`, enqueues the top-K of its alters scored once by the priority function. `retry`
+    schedules a failed visit again after an exponential backoff, until `max_attempts` marks it failed.
+    Entries left in_progress by an interrupted run go back to pending when the frontier is opened, so
+    a crawl resumes where it stopped.
+    """
+
+    def __init__(self, db_name: str, seed: str, config: FrontierConfig | None = None, priority: Priority | None = None):
+        self.seed = seed
+        self.config = config or FrontierConfig()
+        self.priority = priority or make_priority(self.config.priority)
+        self.conn = duckdb.connect(db_name)
+        ensure_schema(self.conn)
+        reclaimed = self.conn.execute(
+            """
+            UPDATE frontier SET state = 'pending', updated_at = ?
+            WHERE seed = ? AND state = 'in_progress'
+            RETURNING profile
+            """,
+            (self._now(), seed),
+        ).fetchall()
+        if reclaimed:
+            print(f"↩️ {len(reclaimed)} perfiles interrumpidos vuelven a la cola")
+        if not self.conn.execute("SELECT count(*) FROM frontier WHERE seed = ?", (seed,)).fetchone()[0]:
+            self._bootstrap()
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def _bootstrap(self) -> None:
+        """Start the queue at the seed, or rebuild it from a database crawled before the frontier existed."""
+        self._add([(self.seed, None, 0, 0.0)])
+        visited = self.conn.execute("SELECT 1 FROM profile_doms WHERE profile = ?", (self.seed,)).fetchone()
+        if visited is None:
+            return
+        entry = FrontierEntry(self.seed, None, 0, 0.0, 0)
+        self._set_state(entry, 'done')
+        following = [
+            {'url': friend, 'name': name}
+            for friend, name in self.conn.execute(
+                "SELECT friend, name FROM friendships WHERE profile = ?", (self.seed,)
+            ).fetchall()
+        ]
+        self.expand(entry, following)
+        self.conn.execute(
+            """
+            UPDATE frontier SET state = 'done', updated_at = ?
+            WHERE seed = ? AND state = 'pending' AND profile IN (SELECT profile FROM profile_doms)
+            """,
+            (self._now(), self.seed),
+        )
+
+    def _add(self, rows: list[tuple[str, str | None, int, float]], skip_visited: bool = False) -> None:
+        if not rows:
+            return
+        now = self._now()
+        frame = pd.DataFrame(rows, columns=['profile', 'parent', 'depth', 'priority'])
+        visited_filter = "WHERE profile NOT IN (SELECT profile FROM profile_doms)" if skip_visited else ""
+        self.conn.register('new_frontier', frame)
+        try:
+            self.conn.execute(
+                f"""
+                INSERT INTO frontier (seed, profile, parent, depth, priority, state, attempts, added_at, updated_at)
+                SELECT ?, profile, parent, depth, priority, 'pending', 0, ?, ? FROM new_frontier
+                {visited_filter}
+                ON CONFLICT (seed, profile) DO UPDATE
+                SET priority = greatest(frontier.priority, excluded.priority)
+                WHERE frontier.state = 'pending' AND frontier.depth = excluded.depth
+                """,
+                (self.seed, now, now),
+            )
+        finally:
+            self.conn.unregister('new_frontier')
+
+    def _set_state(self, entry: FrontierEntry, state: str) -> None:
+        self.conn.execute(
+            "UPDATE frontier SET state = ?, next_attempt_at = NULL, updated_at = ? WHERE seed = ? AND profile = ?",
+            (state, self._now(), self.seed, entry.profile),
+        )
+
+    def pop(self) -> FrontierEntry | None:
+        now = self._now()
+        row = self.conn.execute(
+            """
+            UPDATE frontier SET state = 'in_progress', attempts = attempts + 1, updated_at = ?
+            WHERE seed = ? AND profile = (
+                SELECT profile FROM frontier
+                WHERE seed = ? AND state IN ('pending', 'throttled')
+                    AND (next_attempt_at IS NULL OR next_attempt_at <= ?)
+                ORDER BY depth, attempts, priority DESC, profile
+                LIMIT 1
+            )
+            RETURNING profile, parent, depth, priority, attempts
+            """,
+            (now, self.seed, self.seed, now),
+        ).fetchone()
+        if row is None:
+            return None
+        return FrontierEntry(*row)
+
+    def expand(self, entry: FrontierEntry, following: list[dict]) -> int:
+        """Enqueue the top-K alters of a crawled profile one hop deeper; returns how many were offered.
+
+        The top-K is taken over all alters before dropping those another shard visits, so the shards
+        split one ranking instead of each keeping its own top-K.
+        """
+        if entry.depth >= self.config.max_depth:
+            return 0
+        candidates = {}
+        for record in following:
+            url = record.get('url')
+            if url and url != self.seed and url != entry.profile:
+                candidates.setdefault(url, record)
+        if not candidates:
+            return 0
+        k = self.config.k_for(entry.depth) if self.priority.ranked else None
+        ranked = self.priority.rank(self.conn, entry.profile, list(candidates.values()), k)
+        depth = entry.depth + 1
+        rows = [
+            (url, entry.profile, depth, score)
+            for url, score in ranked
+            if self.config.shard.crawls(url, depth, self.config.max_depth)
+        ]
+        self._add(rows, skip_visited=True)
+        return len(rows)
+
+    def complete(self, entry: FrontierEntry, following: list[dict]) -> None:
+        self._set_state(entry, 'done')
+        self.expand(entry, following)
+
+    def retry(self, entry: FrontierEntry, error: str, throttled: bool = False) -> float | None:
+        """Schedule another visit after a backoff; returns the delay, or None once the entry has failed."""
+        if entry.attempts >= self.config.max_attempts:
+            self.conn.execute(
+                """
+                UPDATE frontier SET state = 'failed', last_error = ?, next_attempt_at = NULL, updated_at = ?
+                WHERE seed = ? AND profile = ?
+                """,
+                (error, self._now(), self.seed, entry.profile),
+            )
+            return None
+        delay = self.config.backoff(entry.attempts)
+        now = self._now()
+        self.conn.execute(
+            """
+            UPDATE frontier SET state = ?, last_error = ?, next_attempt_at = ?, updated_at = ?
+            WHERE seed = ? AND profile = ?
+            """,
+            (
+                'throttled' if throttled else 'pending',
+                error,
+                now + timedelta(seconds=delay),
+                now,
+                self.seed,
+                entry.profile,
+            ),
+        )
+        return delay
+
+    def next_ready_in(self) -> float | None:
+        """Seconds until a waiting entry becomes ready (0 if one is ready now, None when none is left)."""
+        now = self._now()
+        row = self.conn.execute(
+            """
+            SELECT min(coalesce(next_attempt_at, ?))
+            FROM frontier
+            WHERE seed = ? AND state IN ('pending', 'throttled')
+            """,
+            (now, self.seed),
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return max(0.0, (row[0] - now).total_seconds())
+
+    def counts(self) -> dict[str, int]:
+        return dict(
+            self.conn.execute(
+                "SELECT state, count(*) FROM frontier WHERE seed = ? GROUP BY state", (self.seed,)
+            ).fetchall()
+        )
+
+    def close(self) -> None:
+        try:
+            self.conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,223 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+THROTTLE_STATUSES = (429,)
+
+
+@dataclass
+class GovernorConfig:
+    rate_per_hour: float = 240.0
+    min_rate_per_hour: float = 20.0
+    max_rate_per_hour: float = 900.0
+    burst: float = 2.0
+    decrease_factor: float = 0.5
+    increase_per_success: float = 4.0
+    mismatch_factor: float = 0.85
+    cooldown: float = 900.0
+    cooldown_growth: float = 2.0
+    max_cooldown: float = 4 * 3600.0
+    window: float = 3600.0
+    mismatches_per_throttle: int = 3
+    errors_per_cooldown: int = 3
+    error_cooldown: float = 60.0
+
+
+@dataclass
+class SessionBudget:
+    rate_per_hour: float
+    tokens: float
+    updated: float
+    cooldown_until: float = 0.0
+    events: deque = field(default_factory=deque)
+    visits: int = 0
+    last_throttle: float | None = None
+
+
+class ThrottleGovernor:
+    """Shared pacing for every visit: a token bucket per session whose rate is tuned from throttle signals.
+
+    Clean visits raise the rate additively and throttle events cut it multiplicatively (AIMD), so the
+    sustained rate settles just under the point where Instagram starts showing the feedback modal.
+    A throttle also starts a cooldown, which grows when throttles repeat inside `config.window`.
+    Count mismatches and error responses are weaker signals: they trim the rate and, when they pile up,
+    are escalated to a throttle or a short cooldown. `clock` and `sleep` are injectable for tests.
+    """
+
+    def __init__(self, config: GovernorConfig | None = None, clock=time.monotonic, sleep=time.sleep):
+        self.config = config or GovernorConfig()
+        self.clock = clock
+        self.sleep = sleep
+        self._sessions: dict[str, SessionBudget] = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, session: str) -> SessionBudget:
+        budget = self._sessions.get(session)
+        if budget is None:
+            budget = SessionBudget(
+                rate_per_hour=self.config.rate_per_hour,
+                tokens=self.config.burst,
+                updated=self.clock(),
+            )
+            self._sessions[session] = budget
+        return budget
+
+    def _refill(self, budget: SessionBudget, now: float) -> None:
+        elapsed = max(0.0, now - budget.updated)
+        budget.tokens = min(self.config.burst, budget.tokens + elapsed * budget.rate_per_hour / 3600.0)
+        budget.updated = now
+
+    def _recent(self, budget: SessionBudget, kind: str, now: float) -> int:
+        while budget.events and budget.events[0][0] < now - self.config.window:
+            budget.events.popleft()
+        return sum(1 for _, event_kind in budget.events if event_kind == kind)
+
+    def _cool_down(self, session: str, budget: SessionBudget, seconds: float, now: float) -> None:
+        until = now + seconds
+        if until > budget.cooldown_until:
+            budget.cooldown_until = until
+            print(f"⏸️ Sesión {session} en pausa {seconds:.0f}s (ritmo {budget.rate_per_hour:.0f} perfiles/h)")
+
+    def delay(self, session: str) -> float:
+        """Seconds to wait before the session may start another visit (0 when it may go now)."""
+        with self._lock:
+            budget = self._budget(session)
+            now = self.clock()
+            self._refill(budget, now)
+            if now < budget.cooldown_until:
+                return budget.cooldown_until - now
+            if budget.tokens >= 1.0:
+                return 0.0
+            return (1.0 - budget.tokens) * 3600.0 / budget.rate_per_hour
+
+    def try_acquire(self, session: str) -> bool:
+        with self._lock:
+            budget = self._budget(session)
+            now = self.clock()
+            self._refill(budget, now)
+            if now < budget.cooldown_until or budget.tokens < 1.0:
+                return False
+            budget.tokens -= 1.0
+            budget.visits += 1
+            return True
+
+    def acquire(self, session: str) -> None:
+        while not self.try_acquire(session):
+            self.sleep(max(self.delay(session), 0.05))
+
+    async def acquire_async(self, session: str) -> None:
+        while not self.try_acquire(session):
+            await asyncio.sleep(max(self.delay(session), 0.05))
+
+    def record_success(self, session: str) -> None:
+        with self._lock:
+            budget = self._budget(session)
+            budget.rate_per_hour = min(
+                self.config.max_rate_per_hour, budget.rate_per_hour + self.config.increase_per_success
+            )
+
+    def record_throttle(self, session: str) -> None:
+        with self._lock:
+            budget = self._budget(session)
+            now = self.clock()
+            if now < budget.cooldown_until:
+                return
+            repeats = self._recent(budget, 'throttle', now)
+            budget.events.append((now, 'throttle'))
+            budget.last_throttle = now
+            budget.rate_per_hour = max(
+                self.config.min_rate_per_hour, budget.rate_per_hour * self.config.decrease_factor
+            )
+            budget.tokens = 0.0
+            budget.updated = now
+            cooldown = min(self.config.max_cooldown, self.config.cooldown * self.config.cooldown_growth ** repeats)
+            self._cool_down(session, budget, cooldown, now)
+
+    def record_mismatch(self, session: str) -> None:
+        with self._lock:
+            budget = self._budget(session)
+            now = self.clock()
+            budget.events.append((now, 'mismatch'))
+            budget.rate_per_hour = max(
+                self.config.min_rate_per_hour, budget.rate_per_hour * self.config.mismatch_factor
+            )
+            escalate = self._recent(budget, 'mismatch', now) >= self.config.mismatches_per_throttle
+        if escalate:
+            self.record_throttle(session)
+
+    def record_error(self, session: str, status: int | None = None) -> None:
+        if status in THROTTLE_STATUSES:
+            self.record_throttle(session)
+            return
+        with self._lock:
+            budget = self._budget(session)
+            now = self.clock()
+            budget.events.append((now, 'error'))
+            if self._recent(budget, 'error', now) >= self.config.errors_per_cooldown:
+                self._cool_down(session, budget, self.config.error_cooldown, now)
+
+    def last_throttle(self, session: str) -> float | None:
+        """`clock` time of the session's last throttle, None if it was never throttled."""
+        with self._lock:
+            return self._budget(session).last_throttle
+
+    def snapshot(self, session: str) -> dict:
+        with self._lock:
+            budget = self._budget(session)
+            now = self.clock()
+            return {
+                'rate_per_hour': budget.rate_per_hour,
+                'cooldown_remaining': max(0.0, budget.cooldown_until - now),
+                'throttles': self._recent(budget, 'throttle', now),
+                'mismatches': self._recent(budget, 'mismatch', now),
+                'errors': self._recent(budget, 'error', now),
+                'visits': budget.visits,
+            }
+
+
+def max_plausible_count(declared: int) -> int | None:
+    """Most rows a list declaring `declared` follows can plausibly show (None when nothing is declared).
+
+    The 20% + 5 slack covers follows made while the list was being scrolled; more rows than this
+    mean the list is padded with suggestions.
+    """
+    if declared <= 0:
+        return None
+    return int(declared * 1.2) + 5
+
+
+def is_suspicious_count(scraped: int, declared: int) -> bool:
+    """True when the scraped list size is far from the declared following count.
+
+    An empty list is always suspicious when follows are declared: short lists are otherwise allowed
+    to come up short, but zero rows means the dialog never rendered.
+    """
+    if declared <= 0:
+        return False
+    if scraped == 0:
+        return True
+    return scraped > max_plausible_count(declared) or (declared >= 20 and scraped < declared * 0.5)
+
+
+class ErrorResponseWatcher:
+    """Reports throttling (429) and server error responses seen by a page to the governor."""
+
+    def __init__(self, governor: ThrottleGovernor, session: str):
+        self.governor = governor
+        self.session = session
+
+    def _on_response(self, response) -> None:
+        status = response.status
+        if status in THROTTLE_STATUSES or status >= 500:
+            self.governor.record_error(self.session, status)
+
+    def attach(self, page) -> None:
+        page.on("response", self._on_response)
+
+    def detach(self, page) -> None:
+        try:
+            page.remove_listener("response", self._on_response)
+        except Exception:
+            pass
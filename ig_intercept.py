@@ -0,0 +1,113 @@
+import asyncio
+import re
+
+FOLLOWING_API_RE = re.compile(r'/api/v1/friendships/\d+/following/?')
+GRAPHQL_RE = re.compile(r'/(api/)?graphql(/query)?/?')
+
+
+def parse_following_payload(payload) -> list[tuple[str, str]]:
+    """Return (username, full_name) pairs from a following-list API or GraphQL response."""
+    if not isinstance(payload, dict):
+        return []
+    users = payload.get('users')
+    if isinstance(users, list):
+        return [
+            (user.get('username', ''), user.get('full_name') or '')
+            for user in users
+            if isinstance(user, dict) and user.get('username')
+        ]
+    edge_follow = _find_key(payload, 'edge_follow')
+    if isinstance(edge_follow, dict):
+        pairs = []
+        for edge in edge_follow.get('edges') or []:
+            node = edge.get('node') if isinstance(edge, dict) else None
+            if isinstance(node, dict) and node.get('username'):
+                pairs.append((node['username'], node.get('full_name') or ''))
+        return pairs
+    return []
+
+
+def _find_key(value, key: str, depth: int = 6):
+    if depth < 0:
+        return None
+    if isinstance(value, dict):
+        if key in value:
+            return value[key]
+        children = value.values()
+    elif isinstance(value, list):
+        children = value
+    else:
+        return None
+    for child in children:
+        found = _find_key(child, key, depth - 1)
+        if found is not None:
+            return found
+    return None
+
+
+class FollowingInterceptor:
+    """Collects the following list from the JSON batches the dialog fetches while it is scrolled."""
+
+    def __init__(self):
+        self.users: list[tuple[str, str]] = []
+        self.responses = 0
+        self._seen: set[str] = set()
+
+    @staticmethod
+    def matches(url: str) -> bool:
+        return bool(FOLLOWING_API_RE.search(url) or GRAPHQL_RE.search(url))
+
+    def add_payload(self, payload) -> int:
+        pairs = parse_following_payload(payload)
+        if not pairs:
+            return 0
+        self.responses += 1
+        added = 0
+        for username, full_name in pairs:
+            key = username.lower()
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self.users.append((username, full_name))
+            added += 1
+        return added
+
+    def _on_response(self, response) -> None:
+        if not self.matches(response.url):
+            return
+        try:
+            payload = response.json()
+        except Exception:
+            return
+        self.add_payload(payload)
+
+    def attach(self, page) -> None:
+        page.on("response", self._on_response)
+
+    def detach(self, page) -> None:
+        try:
+            page.remove_listener("response", self._on_response)
+        except Exception:
+            pass
+
+
+class AsyncFollowingInterceptor(FollowingInterceptor):
+    def __init__(self):
+        super().__init__()
+        self._tasks: list[asyncio.Task] = []
+
+    def _on_response(self, response) -> None:
+        if self.matches(response.url):
+            self._tasks.append(asyncio.ensure_future(self._consume(response)))
+
+    async def _consume(self, response) -> None:
+        try:
+            payload = await response.json()
+        except Exception:
+            return
+        self.add_payload(payload)
+
+    async def drain(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
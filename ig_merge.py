@@ -0,0 +1,161 @@
+import argparse
+import glob
+import os
+
+import duckdb
+
+from ig_storage import catalog_tables, ensure_schema, is_current_schema, prune_dom_blobs
+
+DEFAULT_INPUTS = os.path.join("outputs", "*", "*.duckdb")
+DEFAULT_MERGED_DB = os.path.join("outputs", "merged.duckdb")
+SOURCE = "src"
+
+
+def _create_seed_profiles(conn) -> None:
+    # The merged friendships table is keyed by (profile, friend) like any seed database; which ego
+    # networks a profile belongs to is kept here, from each source's frontier.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS seed_profiles (
+            seed TEXT,
+            profile TEXT,
+            depth INT,
+            PRIMARY KEY (seed, profile)
+        )
+        """
+    )
+
+
+def resolve_inputs(patterns: list[str], exclude: str) -> list[str]:
+    """Database files matched by `patterns` (files, directories or globs), without `exclude`."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.duckdb")
+        files.extend(sorted(glob.glob(pattern)))
+    excluded = os.path.abspath(exclude)
+    return [path for path in dict.fromkeys(files) if os.path.abspath(path) != excluded]
+
+
+def merge_database(conn, path: str) -> int:
+    """Fold one crawl database into `conn` and return how many profiles it contributed.
+
+    A profile's row, its friendships and its DOM snapshot are taken from whichever database crawled
+    it last (by profile_doms.crawled_at), so lists from different visits are never mixed. The source
+    is attached read-only and must be at SCHEMA_VERSION.
+    """
+    quoted = path.replace("'", "''")
+    conn.execute(f"ATTACH '{quoted}' AS {SOURCE} (READ_ONLY)")
+    try:
+        tables = catalog_tables(conn, SOURCE)
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            conn.execute(
+                f"""
+                CREATE TEMP TABLE newer AS
+                SELECT s.profile
+                FROM {SOURCE}.profile_doms s LEFT JOIN profile_doms t ON t.profile = s.profile
+                WHERE t.profile IS NULL
+                   OR (s.crawled_at IS NOT NULL AND (t.crawled_at IS NULL OR s.crawled_at > t.crawled_at))
+                """
+            )
+            contributed = conn.execute("SELECT count(*) FROM newer").fetchone()[0]
+            conn.execute("DELETE FROM friendships WHERE profile IN (SELECT profile FROM newer)")
+            conn.execute(
+                f"""
+                INSERT INTO friendships (profile, friend, name, crawled_at, run_id)
+                SELECT f.profile, f.friend, f.name, f.crawled_at, f.run_id
+                FROM {SOURCE}.friendships f JOIN newer USING (profile)
+                """
+            )
+            # Rows of a visit that never finished (no profile_doms row anywhere) only fill gaps.
+            conn.execute(
+                f"""
+                INSERT INTO friendships (profile, friend, name, crawled_at, run_id)
+                SELECT profile, friend, name, crawled_at, run_id
+                FROM {SOURCE}.friendships
+                WHERE profile NOT IN (SELECT profile FROM {SOURCE}.profile_doms)
+                ON CONFLICT DO NOTHING
+                """
+            )
+            conn.execute(
+                f"""
+                INSERT INTO dom_blobs (hash, codec, raw_size, dom)
+                SELECT hash, codec, raw_size, dom
+                FROM {SOURCE}.dom_blobs
+                WHERE hash IN (
+                    SELECT s.dom_hash FROM {SOURCE}.profile_doms s JOIN newer USING (profile)
+                )
+                ON CONFLICT DO NOTHING
+                """
+            )
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO profile_doms (profile, n_friends, dom_hash, crawled_at, run_id)
+                SELECT s.profile, s.n_friends, s.dom_hash, s.crawled_at, s.run_id
+                FROM {SOURCE}.profile_doms s JOIN newer USING (profile)
+                """
+            )
+            if 'frontier' in tables:
+                conn.execute(
+                    f"""
+                    INSERT INTO seed_profiles (seed, profile, depth)
+                    SELECT seed, profile, depth FROM {SOURCE}.frontier WHERE state = 'done'
+                    ON CONFLICT DO NOTHING
+                    """
+                )
+            conn.execute("DROP TABLE newer")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.execute(f"DETACH {SOURCE}")
+    return contributed
+
+
+def merge(inputs: list[str], output: str) -> None:
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    conn = duckdb.connect(output)
+    try:
+        ensure_schema(conn)
+        _create_seed_profiles(conn)
+        for path in inputs:
+            if not is_current_schema(path):
+                continue
+            contributed = merge_database(conn, path)
+            print(f"🧩 {path}: {contributed} perfiles nuevos o más recientes")
+        prune_dom_blobs(conn)
+        conn.execute("CHECKPOINT")
+        profiles, friendships, seeds = conn.execute(
+            """
+            SELECT
+                (SELECT count(*) FROM profile_doms),
+                (SELECT count(*) FROM friendships),
+                (SELECT count(DISTINCT seed) FROM seed_profiles)
+            """
+        ).fetchone()
+    finally:
+        conn.close()
+    print(f"✅ {output}: {profiles} perfiles, {friendships} seguimientos, {seeds} semillas")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Merge per-seed / per-shard crawl databases into one")
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=[DEFAULT_INPUTS],
+        help=f"Databases, directories or glob patterns to merge (default: {DEFAULT_INPUTS})",
+    )
+    parser.add_argument("-o", "--output", default=DEFAULT_MERGED_DB, help="Merged DuckDB file (created or updated)")
+    args = parser.parse_args()
+    inputs = resolve_inputs(args.inputs, args.output)
+    if not inputs:
+        parser.error("no databases matched " + ", ".join(args.inputs))
+    merge(inputs, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+PHASES = ('governor', 'goto', 'count', 'modal_open', 'scroll', 'modal_dismiss', 'extract', 'save')
+OUTCOMES = ('ok', 'incomplete', 'no_modal', 'cached', 'hidden', 'contaminated', 'empty', 'error')
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+ROUNDS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+METRICS_JSONL = "metrics.jsonl"
+METRICS_PROM = "metrics.prom"
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def lines(self, name: str, labels: dict[str, str]) -> list[str]:
+        lines = [
+            f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {count}"
+            for bound, count in zip(self.buckets, self.counts)
+        ]
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {self.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(self.sum)}")
+        lines.append(f"{name}_count{_labels(labels)} {self.count}")
+        return lines
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+@dataclass
+class VisitRecord:
+    """Timings of one visit. `phase(name)` adds the time spent in its block to `phases[name]`."""
+
+    profile: str
+    session: str = ''
+    db_name: str = ''
+    started_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec='milliseconds'))
+    outcome: str = 'ok'
+    phases: dict[str, float] = field(default_factory=dict)
+    scroll_rounds: int = 0
+    modal_dismissals: int = 0
+    throttled: bool = False
+    n_following: int = 0
+    n_declared: int = 0
+    error: str = ''
+    started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add_scroll(self, stats) -> None:
+        """Split ScrollStats into scroll time and the time spent accepting feedback modals."""
+        self.scroll_rounds += stats.rounds
+        self.modal_dismissals += stats.modal_dismissals
+        self.throttled = self.throttled or stats.throttled
+        self.add('scroll', max(0.0, stats.seconds - stats.dismiss_seconds))
+        if stats.modal_dismissals:
+            self.add('modal_dismiss', stats.dismiss_seconds)
+
+    def as_dict(self, run_id: str) -> dict:
+        return {
+            'event': 'visit',
+            'run_id': run_id,
+            'profile': self.profile,
+            'session': self.session,
+            'db': self.db_name,
+            'started_at': self.started_at,
+            'outcome': self.outcome,
+            'seconds': round(time.perf_counter() - self.started, 4),
+            'phases': {phase: round(seconds, 4) for phase, seconds in self.phases.items()},
+            'scroll_rounds': self.scroll_rounds,
+            'modal_dismissals': self.modal_dismissals,
+            'throttled': self.throttled,
+            'n_following': self.n_following,
+            'n_declared': self.n_declared,
+            'error': self.error,
+        }
+
+
+class MetricsRecorder:
+    """Per-visit JSONL records plus aggregate counters and histograms in Prometheus text format.
+
+    Each finished visit appends one JSON line to `jsonl_path` and rewrites `prom_path` (through a
+    temporary file, as the node_exporter textfile collector expects). Database batches reported by
+    DuckDBWriter are recorded the same way. Either path may be None to skip that output.
+    """
+
+    def __init__(self, jsonl_path: str | None = None, prom_path: str | None = None, run_id: str = ''):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.run_id = run_id
+        self.visits = {outcome: 0 for outcome in OUTCOMES}
+        self.phase_seconds = {phase: Histogram(SECONDS_BUCKETS) for phase in PHASES}
+        self.visit_seconds = Histogram(SECONDS_BUCKETS)
+        self.scroll_rounds = Histogram(ROUNDS_BUCKETS)
+        self.modal_dismissals = 0
+        self.following_rows = 0
+        self.db_write_seconds = Histogram(SECONDS_BUCKETS)
+        self.db_write_visits = 0
+        self.db_write_failures = 0
+        self._lock = threading.Lock()
+        self._jsonl = None
+        for path in (jsonl_path, prom_path):
+            if path and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+        if jsonl_path:
+            self._jsonl = open(jsonl_path, "a", encoding="utf-8")
+
+    def _emit(self, record: dict) -> None:
+        if self._jsonl is not None:
+            self._jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._jsonl.flush()
+
+    def finish(self, visit: VisitRecord, outcome: str, error: Exception | None = None) -> None:
+        visit.outcome = outcome
+        if error is not None:
+            visit.error = str(error) or type(error).__name__
+        record = visit.as_dict(self.run_id)
+        with self._lock:
+            self.visits[outcome] = self.visits.get(outcome, 0) + 1
+            if outcome != 'cached':
+                self.visit_seconds.observe(record['seconds'])
+                for phase, seconds in visit.phases.items():
+                    self.phase_seconds.setdefault(phase, Histogram(SECONDS_BUCKETS)).observe(seconds)
+                if visit.scroll_rounds:
+                    self.scroll_rounds.observe(visit.scroll_rounds)
+            self.modal_dismissals += visit.modal_dismissals
+            self.following_rows += visit.n_following
+            self._emit(record)
+            self._write_prometheus()
+
+    def record_db_write(self, db_name: str, visits: int, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            self.db_write_seconds.observe(seconds)
+            self.db_write_visits += visits
+            if failed:
+                self.db_write_failures += 1
+            self._emit({
+                'event': 'db_write',
+                'run_id': self.run_id,
+                'db': db_name,
+                'at': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+                'visits': visits,
+                'seconds': round(seconds, 4),
+                'failed': failed,
+            })
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP ig_run_info Crawler run the metrics belong to.",
+            "# TYPE ig_run_info gauge",
+            f"ig_run_info{_labels({'run_id': self.run_id})} 1",
+            "# HELP ig_visits_total Profile visits by outcome.",
+            "# TYPE ig_visits_total counter",
+        ]
+        lines += [f"ig_visits_total{_labels({'outcome': outcome})} {count}" for outcome, count in self.visits.items()]
+        lines += [
+            "# HELP ig_visit_seconds Wall time of a profile visit (cache hits excluded).",
+            "# TYPE ig_visit_seconds histogram",
+        ]
+        lines += self.visit_seconds.lines("ig_visit_seconds", {})
+        lines += [
+            "# HELP ig_visit_phase_seconds Time spent in each phase of a profile visit.",
+            "# TYPE ig_visit_phase_seconds histogram",
+        ]
+        for phase, histogram in self.phase_seconds.items():
+            lines += histogram.lines("ig_visit_phase_seconds", {'phase': phase})
+        lines += [
+            "# HELP ig_scroll_rounds Scroll rounds needed to load a following list.",
+            "# TYPE ig_scroll_rounds histogram",
+        ]
+        lines += self.scroll_rounds.lines("ig_scroll_rounds", {})
+        lines += [
+            "# HELP ig_modal_dismissals_total Feedback/throttle modals accepted while scrolling.",
+            "# TYPE ig_modal_dismissals_total counter",
+            f"ig_modal_dismissals_total {self.modal_dismissals}",
+            "# HELP ig_following_rows_total Following rows extracted.",
+            "# TYPE ig_following_rows_total counter",
+            f"ig_following_rows_total {self.following_rows}",
+            "# HELP ig_db_write_seconds Time to write one batch to a DuckDB file.",
+            "# TYPE ig_db_write_seconds histogram",
+        ]
+        lines += self.db_write_seconds.lines("ig_db_write_seconds", {})
+        lines += [
+            "# HELP ig_db_write_visits_total Visits written to DuckDB.",
+            "# TYPE ig_db_write_visits_total counter",
+            f"ig_db_write_visits_total {self.db_write_visits}",
+            "# HELP ig_db_write_failures_total DuckDB batches that failed to write.",
+            "# TYPE ig_db_write_failures_total counter",
+            f"ig_db_write_failures_total {self.db_write_failures}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def _write_prometheus(self) -> None:
+        if not self.prom_path:
+            return
+        tmp_path = f"{self.prom_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(self.prometheus_text())
+        os.replace(tmp_path, self.prom_path)
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_prometheus()
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def finish_visit(metrics: MetricsRecorder | None, visit: VisitRecord, outcome: str, error: Exception | None = None) -> None:
+    if metrics is not None:
+        metrics.finish(visit, outcome, error)
@@ -0,0 +1,169 @@
+import re
+
+from bs4 import BeautifulSoup
+
+DEFAULT_PARSER = "bs4"
+
+
+def following_href_pattern(username: str) -> re.Pattern:
+    return re.compile(rf'/{re.escape(username)}/following/?', re.IGNORECASE)
+
+
+class HtmlParser:
+    """Backend interface: the DOM walking behind parse_following_html and parse_following_count.
+
+    `following_rows` yields (href, span_texts) for every a[role="link"] in document order, with the
+    stripped text of its first two span[dir="auto"] descendants. `following_link_texts` returns the
+    text candidates of the first link to /{username}/following/: the link text, then each span.
+    """
+
+    name = ""
+
+    def following_rows(self, html: str) -> list[tuple[str | None, list[str]]]:
+        raise NotImplementedError
+
+    def following_link_texts(self, html: str, username: str) -> list[str]:
+        raise NotImplementedError
+
+
+class BeautifulSoupParser(HtmlParser):
+    name = "bs4"
+
+    def following_rows(self, html: str) -> list[tuple[str | None, list[str]]]:
+        soup = BeautifulSoup(html, "html.parser")
+        return [
+            (
+                anchor.get('href'),
+                [span.get_text(strip=True) for span in anchor.select('span[dir="auto"]')[:2]],
+            )
+            for anchor in soup.select('a[role="link"]')
+        ]
+
+    def following_link_texts(self, html: str, username: str) -> list[str]:
+        soup = BeautifulSoup(html, "html.parser")
+        link = soup.find('a', href=following_href_pattern(username))
+        if not link:
+            return []
+        candidates = []
+        text = link.get_text(strip=True)
+        if text:
+            candidates.append(text)
+        for span in link.find_all('span'):
+            span_text = span.get_text(strip=True)
+            if span_text:
+                candidates.append(span_text)
+        return candidates
+
+
+class LxmlParser(HtmlParser):
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+
+        self._fromstring = lxml.html.fromstring
+
+    def _root(self, html: str):
+        if not html or not html.strip():
+            return None
+        try:
+            return self._fromstring(html)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _text(element) -> str:
+        return ''.join(part.strip() for part in element.itertext())
+
+    def following_rows(self, html: str) -> list[tuple[str | None, list[str]]]:
+        root = self._root(html)
+        if root is None:
+            return []
+        rows = []
+        for anchor in root.iter('a'):
+            if anchor.get('role') != 'link':
+                continue
+            spans = [span for span in anchor.iter('span') if span.get('dir') == 'auto'][:2]
+            rows.append((anchor.get('href'), [self._text(span) for span in spans]))
+        return rows
+
+    def following_link_texts(self, html: str, username: str) -> list[str]:
+        root = self._root(html)
+        if root is None:
+            return []
+        pattern = following_href_pattern(username)
+        for anchor in root.iter('a'):
+            href = anchor.get('href')
+            if href is None or not pattern.search(href):
+                continue
+            candidates = []
+            text = self._text(anchor)
+            if text:
+                candidates.append(text)
+            for span in anchor.iter('span'):
+                span_text = self._text(span)
+                if span_text:
+                    candidates.append(span_text)
+            return candidates
+        return []
+
+
+class SelectolaxParser(HtmlParser):
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self._parser_cls = LexborHTMLParser
+
+    @staticmethod
+    def _text(node) -> str:
+        return node.text(deep=True, separator='', strip=True)
+
+    def following_rows(self, html: str) -> list[tuple[str | None, list[str]]]:
+        tree = self._parser_cls(html or '')
+        return [
+            (
+                anchor.attributes.get('href'),
+                [self._text(span) for span in anchor.css('span[dir="auto"]')[:2]],
+            )
+            for anchor in tree.css('a[role="link"]')
+        ]
+
+    def following_link_texts(self, html: str, username: str) -> list[str]:
+        tree = self._parser_cls(html or '')
+        pattern = following_href_pattern(username)
+        for anchor in tree.css('a[href]'):
+            href = anchor.attributes.get('href')
+            if href is None or not pattern.search(href):
+                continue
+            candidates = []
+            text = self._text(anchor)
+            if text:
+                candidates.append(text)
+            for span in anchor.css('span'):
+                span_text = self._text(span)
+                if span_text:
+                    candidates.append(span_text)
+            return candidates
+        return []
+
+
+PARSERS = {
+    BeautifulSoupParser.name: BeautifulSoupParser,
+    LxmlParser.name: LxmlParser,
+    SelectolaxParser.name: SelectolaxParser,
+}
+_instances: dict[str, HtmlParser] = {}
+
+
+def get_parser(name: str | None = None) -> HtmlParser:
+    name = name or DEFAULT_PARSER
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser backend: {name} (choose from {', '.join(PARSERS)})")
+    if name not in _instances:
+        try:
+            _instances[name] = PARSERS[name]()
+        except ImportError as exc:
+            raise RuntimeError(f"Parser backend '{name}' is not installed: {exc}") from exc
+    return _instances[name]
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from ig_routing import ContextRouter, RoutePolicy
+
+try:
+    import psutil
+except ImportError:  # No memory-based recycling without it
+    psutil = None
+
+DEFAULT_MAX_USES = 25
+DEFAULT_MAX_MEMORY_MB = 3000
+DEFAULT_MEMORY_COOLDOWN = 60.0
+HEALTH_PROBE_JS = "() => document.readyState"
+
+
+def load_storage_state(session_storage_file: str) -> dict:
+    with open(session_storage_file) as handle:
+        return json.load(handle)
+
+
+def browser_tree_rss_mb() -> float:
+    """Resident memory of every process below this one: the browser and its content processes."""
+    if psutil is None:
+        return 0.0
+    total = 0
+    try:
+        for child in psutil.Process().children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+    except psutil.Error:
+        return 0.0
+    return total / (1024 * 1024)
+
+
+class PooledContext:
+    def __init__(self, context, session_storage_file: str):
+        self.context = context
+        self.session_storage_file = session_storage_file
+        self.idle_pages: list = []
+        self.uses = 0
+        self.leased = 0
+        self.retired = False
+
+
+class _BasePool:
+    """Bookkeeping shared by the sync and async pools: one warm context per session file.
+
+    Contexts are recycled after `max_uses` visits. `max_memory_mb` is a limit on the whole browser
+    (the RSS of its process tree, read with psutil): contexts share content processes, so memory
+    cannot be attributed to one of them. Past the limit the most-used context is retired, and no
+    other one for `memory_cooldown` seconds, which gives the browser time to release its memory.
+    """
+
+    def __init__(
+        self,
+        browser,
+        context_options: dict | None = None,
+        max_uses: int = DEFAULT_MAX_USES,
+        max_memory_mb: float = DEFAULT_MAX_MEMORY_MB,
+        route_policy: RoutePolicy | None = None,
+        memory_cooldown: float = DEFAULT_MEMORY_COOLDOWN,
+        clock=time.monotonic,
+    ):
+        self.browser = browser
+        self.context_options = dict(context_options or {})
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.memory_cooldown = memory_cooldown
+        self.clock = clock
+        self._memory_retired_at: float | None = None
+        self.router = ContextRouter(route_policy) if route_policy is not None and route_policy.enabled else None
+        if self.router is not None:
+            self.context_options.update(route_policy.context_options())
+        self._storage_states: dict[str, dict] = {}
+        self._active: dict[str, PooledContext] = {}
+        self._draining: list[PooledContext] = []
+
+    def storage_state(self, session_storage_file: str) -> dict:
+        if session_storage_file not in self._storage_states:
+            self._storage_states[session_storage_file] = load_storage_state(session_storage_file)
+        return self._storage_states[session_storage_file]
+
+    def connected(self) -> bool:
+        try:
+            return self.browser.is_connected()
+        except Exception:
+            return False
+
+    def _context_kwargs(self, session_storage_file: str) -> dict:
+        return {**self.context_options, "storage_state": self.storage_state(session_storage_file)}
+
+    def _usable(self, session_storage_file: str) -> PooledContext | None:
+        entry = self._active.get(session_storage_file)
+        if entry is None or entry.retired:
+            return None
+        return entry
+
+    def _retire(self, entry: PooledContext) -> None:
+        if entry.retired:
+            return
+        entry.retired = True
+        if self._active.get(entry.session_storage_file) is entry:
+            del self._active[entry.session_storage_file]
+        self._draining.append(entry)
+
+    def _relieve_memory(self) -> None:
+        if not self.max_memory_mb or psutil is None or not self._active:
+            return
+        now = self.clock()
+        if self._memory_retired_at is not None and now - self._memory_retired_at < self.memory_cooldown:
+            return
+        if browser_tree_rss_mb() <= self.max_memory_mb:
+            return
+        self._memory_retired_at = now
+        self._retire(max(self._active.values(), key=lambda entry: entry.uses))
+
+    def _after_use(self, entry: PooledContext) -> None:
+        if entry.uses >= self.max_uses:
+            self._retire(entry)
+        self._relieve_memory()
+
+    def _ready_to_close(self) -> list[PooledContext]:
+        finished = [entry for entry in self._draining if entry.leased == 0]
+        self._draining = [entry for entry in self._draining if entry.leased > 0]
+        return finished
+
+
+class ContextPool(_BasePool):
+    """Hands out warm pages from reusable browser contexts, recycling them after use or browser memory growth."""
+
+    def _healthy(self, page) -> bool:
+        try:
+            if page.is_closed():
+                return False
+            page.evaluate(HEALTH_PROBE_JS)
+            return True
+        except Exception:
+            return False
+
+    def _acquire(self, session_storage_file: str):
+        entry = self._usable(session_storage_file)
+        if entry is None:
+            context = self.browser.new_context(**self._context_kwargs(session_storage_file))
+            if self.router is not None:
+                self.router.install(context)
+            entry = PooledContext(context, session_storage_file)
+            self._active[session_storage_file] = entry
+        page = None
+        while entry.idle_pages:
+            candidate = entry.idle_pages.pop()
+            if self._healthy(candidate):
+                page = candidate
+                break
+            self._close_page(candidate)
+        if page is None:
+            page = entry.context.new_page()
+        entry.uses += 1
+        entry.leased += 1
+        return entry, page
+
+    def _release(self, entry: PooledContext, page, healthy: bool) -> None:
+        entry.leased -= 1
+        if healthy and self._healthy(page):
+            entry.idle_pages.append(page)
+        else:
+            self._close_page(page)
+        self._after_use(entry)
+        for finished in self._ready_to_close():
+            self._close_context(finished)
+
+    @contextmanager
+    def page(self, session_storage_file: str):
+        entry, page = self._acquire(session_storage_file)
+        healthy = True
+        try:
+            yield page
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            self._release(entry, page, healthy)
+
+    def _close_page(self, page) -> None:
+        try:
+            page.close()
+        except Exception:
+            pass
+
+    def _close_context(self, entry: PooledContext) -> None:
+        for page in entry.idle_pages:
+            self._close_page(page)
+        entry.idle_pages = []
+        try:
+            entry.context.close()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        for entry in list(self._active.values()) + self._draining:
+            self._close_context(entry)
+        self._active = {}
+        self._draining = []
+
+
+class AsyncContextPool(_BasePool):
+    """Async counterpart of ContextPool for the camoufox.async_api engine."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._creating: dict[str, asyncio.Lock] = {}
+
+    async def _healthy(self, page) -> bool:
+        try:
+            if page.is_closed():
+                return False
+            await page.evaluate(HEALTH_PROBE_JS)
+            return True
+        except Exception:
+            return False
+
+    async def _acquire(self, session_storage_file: str):
+        lock = self._creating.setdefault(session_storage_file, asyncio.Lock())
+        async with lock:
+            entry = self._usable(session_storage_file)
+            if entry is None:
+                context = await self.browser.new_context(**self._context_kwargs(session_storage_file))
+                if self.router is not None:
+                    await self.router.install_async(context)
+                entry = PooledContext(context, session_storage_file)
+                self._active[session_storage_file] = entry
+            entry.uses += 1
+            entry.leased += 1
+        page = None
+        while entry.idle_pages:
+            candidate = entry.idle_pages.pop()
+            if await self._healthy(candidate):
+                page = candidate
+                break
+            await self._close_page(candidate)
+        if page is None:
+            page = await entry.context.new_page()
+        return entry, page
+
+    async def _release(self, entry: PooledContext, page, healthy: bool) -> None:
+        entry.leased -= 1
+        if healthy and await self._healthy(page):
+            entry.idle_pages.append(page)
+        else:
+            await self._close_page(page)
+        self._after_use(entry)
+        for finished in self._ready_to_close():
+            await self._close_context(finished)
+
+    @asynccontextmanager
+    async def page(self, session_storage_file: str):
+        entry, page = await self._acquire(session_storage_file)
+        healthy = True
+        try:
+            yield page
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            await self._release(entry, page, healthy)
+
+    async def _close_page(self, page) -> None:
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    async def _close_context(self, entry: PooledContext) -> None:
+        for page in entry.idle_pages:
+            await self._close_page(page)
+        entry.idle_pages = []
+        try:
+            await entry.context.close()
+        except Exception:
+            pass
+
+    async def close(self) -> None:
+        for entry in list(self._active.values()) + self._draining:
+            await self._close_context(entry)
+        self._active = {}
+        self._draining = []
@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+DEFAULT_BLOCKED_TYPES = ('image', 'media', 'font')
+# Analytics and ad hosts the profile page pulls in; none of them serve the following list.
+DEFAULT_BLOCKED_HOSTS = (
+    'connect.facebook.net',
+    'doubleclick.net',
+    'google-analytics.com',
+    'googletagmanager.com',
+)
+ROUTE_PATTERN = "**/*"
+# Turns off CSS animations, transitions and smooth scrolling before the page's own styles apply.
+MINIMAL_RENDERING_JS = """
+(() => {
+    const css = '*, *::before, *::after { animation: none !important; transition: none !important; ' +
+        'scroll-behavior: auto !important; caret-color: transparent !important; }';
+    const apply = () => {
+        const style = document.createElement('style');
+        style.textContent = css;
+        (document.head || document.documentElement).appendChild(style);
+    };
+    if (document.documentElement) apply();
+    else document.addEventListener('DOMContentLoaded', apply, {once: true});
+})();
+"""
+
+
+def parse_csv_list(value: str) -> tuple[str, ...]:
+    """Parse a comma-separated CLI value ('' for an empty list)."""
+    return tuple(item.strip().lower() for item in value.split(',') if item.strip())
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    """Requests aborted on crawl contexts, by resource type or by host (subdomains included)."""
+
+    blocked_types: tuple[str, ...] = DEFAULT_BLOCKED_TYPES
+    blocked_hosts: tuple[str, ...] = DEFAULT_BLOCKED_HOSTS
+    minimal_rendering: bool = False
+
+    @property
+    def routes(self) -> bool:
+        return bool(self.blocked_types or self.blocked_hosts)
+
+    @property
+    def enabled(self) -> bool:
+        return self.routes or self.minimal_rendering
+
+    def blocks(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.blocked_types:
+            return True
+        host = (urlparse(url).hostname or '').lower()
+        return any(host == blocked or host.endswith('.' + blocked) for blocked in self.blocked_hosts)
+
+    def context_options(self) -> dict:
+        return {"reduced_motion": "reduce"} if self.minimal_rendering else {}
+
+
+class ContextRouter:
+    """Installs a RoutePolicy on browser contexts and counts what it let through or aborted."""
+
+    def __init__(self, policy: RoutePolicy):
+        self.policy = policy
+        self.allowed = 0
+        self.blocked = 0
+
+    def _blocks(self, request) -> bool:
+        if self.policy.blocks(request.resource_type, request.url):
+            self.blocked += 1
+            return True
+        self.allowed += 1
+        return False
+
+    def handle(self, route) -> None:
+        if self._blocks(route.request):
+            route.abort()
+        else:
+            route.continue_()
+
+    async def handle_async(self, route) -> None:
+        if self._blocks(route.request):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def install(self, context) -> None:
+        if self.policy.minimal_rendering:
+            context.add_init_script(MINIMAL_RENDERING_JS)
+        if self.policy.routes:
+            context.route(ROUTE_PATTERN, self.handle)
+
+    async def install_async(self, context) -> None:
+        if self.policy.minimal_rendering:
+            await context.add_init_script(MINIMAL_RENDERING_JS)
+        if self.policy.routes:
+            await context.route(ROUTE_PATTERN, self.handle_async)
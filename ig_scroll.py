@@ -0,0 +1,214 @@
+import time
+from dataclasses import dataclass
+
+from ig_governor import max_plausible_count
+from ig_intercept import FollowingInterceptor
+
+# Installs (once per dialog) a MutationObserver counting row links added to the following dialog and
+# returns the cumulative count together with the rendered link count and the dialog height.
+ROW_STATE_JS = """
+() => {
+    const dialog = document.querySelector('div[role="dialog"]');
+    if (!dialog) return {added: 0, count: 0, unique: 0, height: 0};
+    let state = window.__igRows;
+    if (!state || state.dialog !== dialog) {
+        if (state && state.observer) state.observer.disconnect();
+        state = {dialog, added: dialog.querySelectorAll('a[role="link"]').length};
+        state.observer = new MutationObserver((records) => {
+            for (const record of records) {
+                for (const node of record.addedNodes) {
+                    if (node.nodeType !== 1) continue;
+                    if (node.matches('a[role="link"]')) state.added += 1;
+                    state.added += node.querySelectorAll('a[role="link"]').length;
+                }
+            }
+        });
+        state.observer.observe(dialog, {childList: true, subtree: true});
+        window.__igRows = state;
+    }
+    const links = dialog.querySelectorAll('a[role="link"]');
+    return {
+        added: state.added,
+        count: links.length,
+        unique: new Set(Array.from(links, (link) => link.getAttribute('href') || '')).size,
+        height: dialog.scrollHeight || dialog.offsetHeight || 0,
+    };
+}
+"""
+ROWS_ADDED_JS = "(previous) => !!window.__igRows && window.__igRows.added > previous"
+RENDERED_HREFS_JS = """
+() => {
+    const dialog = document.querySelector('div[role="dialog"]');
+    if (!dialog) return [];
+    return Array.from(new Set(Array.from(dialog.querySelectorAll('a[role="link"]'), (link) => link.getAttribute('href') || '')));
+}
+"""
+
+
+@dataclass(frozen=True)
+class ScrollPolicy:
+    """How long a scroll round may wait for new rows and how that wait grows while the list stalls.
+
+    A round ends as soon as the dialog renders new rows; `wait` only bounds the rounds that do not.
+    Stalled rounds multiply the wait by `backoff` (up to `max_wait`). They count towards `max_idle`
+    only when no following-list request is still in flight, or after `max_busy_stalls` such rounds.
+    """
+
+    name: str
+    wait: float = 1.5
+    backoff: float = 1.5
+    max_wait: float = 6.0
+    max_idle: int = 2
+    max_busy_stalls: int = 3
+    max_rounds: int = 250
+    pause_every: int = 0
+    pause: float = 0.0
+
+
+NORMAL_POLICY = ScrollPolicy("normal")
+# Throttled sessions (feedback modal seen) scroll more slowly and give the list more time to settle.
+SLOW_POLICY = ScrollPolicy("slow", wait=3.0, backoff=2.0, max_wait=15.0, max_idle=4, pause_every=10, pause=5.0)
+POLICIES = {policy.name: policy for policy in (NORMAL_POLICY, SLOW_POLICY)}
+DEFAULT_SCROLL_POLICY = NORMAL_POLICY.name
+DEFAULT_THROTTLED_SCROLL_POLICY = SLOW_POLICY.name
+
+
+@dataclass
+class ScrollStats:
+    policy: str
+    rounds: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    stalled_rounds: int = 0
+    throttled: bool = False
+    modal_dismissals: int = 0
+    dismiss_seconds: float = 0.0
+
+
+class ContaminatedListError(Exception):
+    """The following dialog is showing suggestions instead of the real list (see tareas.md)."""
+
+
+class EmptyListError(Exception):
+    """The following dialog opened but never rendered a row although the profile follows someone."""
+
+
+class ContaminationDetector:
+    """Spots a following list polluted by suggestions after the throttle modal was accepted.
+
+    Two signals: the live row count running past the declared following count (42 rows for 12
+    declared), and the rows rendered right after the modal sharing nothing with the rows seen before it.
+    """
+
+    def __init__(self, expected_total: int | None):
+        self.expected_total = expected_total or 0
+        self.before_modal: set[str] = set()
+        self.awaiting_post_modal = False
+
+    def row_limit(self) -> int | None:
+        return max_plausible_count(self.expected_total)
+
+    def record_modal(self, seen_urls: set[str]) -> None:
+        self.before_modal |= seen_urls
+        self.awaiting_post_modal = bool(self.before_modal)
+
+    def check(self, live_count: int, rendered_urls: set[str] | None = None) -> str | None:
+        limit = self.row_limit()
+        if limit is not None and live_count > limit:
+            return f"{live_count} filas para {self.expected_total} declarados"
+        if self.awaiting_post_modal and rendered_urls is not None:
+            self.awaiting_post_modal = False
+            if rendered_urls and not (rendered_urls & self.before_modal):
+                return "tras el modal la lista no conserva ninguna de las filas anteriores"
+        return None
+
+
+class ScrollScheduler:
+    def __init__(self, policy: ScrollPolicy, clock=time.monotonic):
+        self.policy = policy
+        self.clock = clock
+        self.started = clock()
+        self.current_wait = policy.wait
+        self.idle_rounds = 0
+        self.busy_stalls = 0
+        self.stats = ScrollStats(policy=policy.name)
+
+    def switch(self, policy: ScrollPolicy) -> None:
+        if policy is self.policy:
+            return
+        self.policy = policy
+        self.current_wait = max(self.current_wait, policy.wait)
+        self.stats.policy = policy.name
+
+    def mark_throttled(self, policy: ScrollPolicy) -> None:
+        self.stats.throttled = True
+        self.switch(policy)
+
+    def record_dismissal(self, started: float, policy: ScrollPolicy) -> None:
+        """Count a feedback modal accepted since `started` (a `clock` reading) and slow down."""
+        self.stats.modal_dismissals += 1
+        self.stats.dismiss_seconds += self.clock() - started
+        self.mark_throttled(policy)
+
+    def done(self) -> bool:
+        return self.idle_rounds >= self.policy.max_idle or self.stats.rounds >= self.policy.max_rounds
+
+    def start_round(self) -> None:
+        self.stats.rounds += 1
+
+    def wait_ms(self) -> int:
+        return int(self.current_wait * 1000)
+
+    def record(self, progressed: bool, busy: bool = False) -> None:
+        if progressed:
+            self.idle_rounds = 0
+            self.busy_stalls = 0
+            self.current_wait = self.policy.wait
+            return
+        self.stats.stalled_rounds += 1
+        if busy and self.busy_stalls < self.policy.max_busy_stalls:
+            self.busy_stalls += 1
+        else:
+            self.idle_rounds += 1
+        self.current_wait = min(self.current_wait * self.policy.backoff, self.policy.max_wait)
+
+    def pause_ms(self) -> int:
+        if self.policy.pause_every and self.stats.rounds % self.policy.pause_every == 0:
+            return int(self.policy.pause * 1000)
+        return 0
+
+    def finish(self, rows: int) -> ScrollStats:
+        self.stats.rows = rows
+        self.stats.seconds = self.clock() - self.started
+        return self.stats
+
+
+class RequestTracker:
+    """Counts following-list requests in flight so a stalled round is not mistaken for the list end."""
+
+    def __init__(self):
+        self.inflight = 0
+
+    def _on_request(self, request) -> None:
+        if FollowingInterceptor.matches(request.url):
+            self.inflight += 1
+
+    def _on_finished(self, request) -> None:
+        if FollowingInterceptor.matches(request.url):
+            self.inflight = max(0, self.inflight - 1)
+
+    def attach(self, page) -> None:
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_finished)
+        page.on("requestfailed", self._on_finished)
+
+    def detach(self, page) -> None:
+        for event, handler in (
+            ("request", self._on_request),
+            ("requestfinished", self._on_finished),
+            ("requestfailed", self._on_finished),
+        ):
+            try:
+                page.remove_listener(event, handler)
+            except Exception:
+                pass
@@ -0,0 +1,194 @@
+import asyncio
+import glob
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from ig_governor import ThrottleGovernor
+from ig_scroll import ContaminatedListError
+
+DEFAULT_SESSIONS_DIR = "sessions"
+DEFAULT_FAILURES_TO_QUARANTINE = 3
+DEFAULT_QUARANTINE = 1800.0
+MAX_QUARANTINE = 6 * 3600.0
+# Paths Instagram redirects a logged-out or challenged session to.
+CHECKPOINT_PATHS = ('/accounts/login', '/challenge/', '/accounts/suspended', '/checkpoint/')
+
+
+class SessionCheckpointError(Exception):
+    """The session was sent to a login or challenge page: its cookies are no longer usable."""
+
+
+def check_session(page_url: str) -> None:
+    for path in CHECKPOINT_PATHS:
+        if path in page_url:
+            raise SessionCheckpointError(f"redirigido a {page_url}")
+
+
+def session_name(session_storage_file: str) -> str:
+    return os.path.splitext(os.path.basename(session_storage_file))[0]
+
+
+def resolve_session_files(paths: list[str]) -> list[str]:
+    """Storage-state files named on the command line; a directory stands for every *.json inside it."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.json"))))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(files))
+
+
+@dataclass
+class SessionHealth:
+    path: str
+    leased: int = 0
+    visits: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    quarantines: int = 0
+    quarantined_until: float = 0.0
+    last_error: str = ''
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class SessionPool:
+    """Spreads visits over several storage-state sessions and benches the ones that start failing.
+
+    `acquire` leases the usable session throttled least recently (ties go to the one with fewer
+    leases, then fewer visits). A session is usable when it is not quarantined, has fewer than
+    `max_leases` visits in flight and its governor budget lets it start a visit now. Rate budgets
+    and cooldowns stay in the ThrottleGovernor, keyed by session file as before. `release` reports
+    how the visit went. `failures_to_quarantine` consecutive errors, or one checkpoint redirect,
+    quarantine the session; each new quarantine of the same session lasts twice as long.
+    """
+
+    def __init__(
+        self,
+        paths: list[str],
+        governor: ThrottleGovernor | None = None,
+        max_leases: int = 1,
+        failures_to_quarantine: int = DEFAULT_FAILURES_TO_QUARANTINE,
+        quarantine: float = DEFAULT_QUARANTINE,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        if not paths:
+            raise ValueError("SessionPool needs at least one storage-state file")
+        self.governor = governor
+        self.max_leases = max(1, max_leases)
+        self.failures_to_quarantine = max(1, failures_to_quarantine)
+        self.quarantine_seconds = quarantine
+        self.clock = clock
+        self.sleep = sleep
+        self.sessions = {path: SessionHealth(path) for path in paths}
+        self._lock = threading.Lock()
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def _wait(self, health: SessionHealth, now: float) -> float:
+        if now < health.quarantined_until:
+            return health.quarantined_until - now
+        if self.governor is None:
+            return 0.0
+        return self.governor.delay(health.path)
+
+    def _order(self, health: SessionHealth) -> tuple:
+        last_throttle = self.governor.last_throttle(health.path) if self.governor is not None else None
+        return (last_throttle is not None, last_throttle or 0.0, health.leased, health.visits)
+
+    def _lease(self, now: float) -> str | None:
+        ready = [
+            health
+            for health in self.sessions.values()
+            if health.leased < self.max_leases and self._wait(health, now) <= 0
+        ]
+        if not ready:
+            return None
+        health = min(ready, key=self._order)
+        health.leased += 1
+        health.visits += 1
+        return health.path
+
+    def _next_free(self, now: float) -> float | None:
+        waits = [self._wait(health, now) for health in self.sessions.values() if health.leased < self.max_leases]
+        return max(0.0, min(waits)) if waits else None
+
+    def try_acquire(self) -> str | None:
+        with self._lock:
+            return self._lease(self.clock())
+
+    def ready_in(self) -> float:
+        """Seconds until some session may start a visit, ignoring sessions with no free lease."""
+        with self._lock:
+            wait = self._next_free(self.clock())
+        return wait if wait is not None else 0.0
+
+    def acquire(self) -> str:
+        while (session := self.try_acquire()) is None:
+            self.sleep(max(self.ready_in(), 0.05))
+        return session
+
+    async def acquire_async(self) -> str:
+        """Lease a session, waiting until a quarantine or governor delay ends or `release` frees a lease."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                now = self.clock()
+                session = self._lease(now)
+                if session is not None:
+                    return session
+                timeout = self._next_free(now)
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await asyncio.wait({waiter}, timeout=None if timeout is None else max(timeout, 0.01))
+            finally:
+                with self._lock:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+                waiter.cancel()
+
+    def release(self, session: str, error: Exception | None = None) -> None:
+        """Return a leased session. Contaminated lists are throttle signals the governor already has."""
+        with self._lock:
+            health = self.sessions[session]
+            health.leased = max(0, health.leased - 1)
+            if error is None or isinstance(error, ContaminatedListError):
+                health.consecutive_failures = 0
+            else:
+                health.failures += 1
+                health.consecutive_failures += 1
+                health.last_error = str(error) or type(error).__name__
+                if isinstance(error, SessionCheckpointError) or health.consecutive_failures >= self.failures_to_quarantine:
+                    self._quarantine(health)
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def _quarantine(self, health: SessionHealth) -> None:
+        seconds = min(MAX_QUARANTINE, self.quarantine_seconds * 2 ** health.quarantines)
+        health.quarantines += 1
+        health.consecutive_failures = 0
+        health.quarantined_until = self.clock() + seconds
+        print(f"🚧 Sesión {session_name(health.path)} en cuarentena {seconds:.0f}s ({health.last_error})")
+
+    def summary(self) -> list[str]:
+        with self._lock:
+            now = self.clock()
+            lines = []
+            for health in self.sessions.values():
+                state = 'en cuarentena' if now < health.quarantined_until else 'activa'
+                lines.append(
+                    f"{session_name(health.path)}: {health.visits} visitas, {health.failures} fallos, "
+                    f"{health.quarantines} cuarentenas ({state})"
+                )
+            return lines
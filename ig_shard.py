@@ -0,0 +1,54 @@
+import argparse
+import hashlib
+import os
+from dataclasses import dataclass
+
+
+def shard_of(profile_url: str, count: int) -> int:
+    """Stable shard of a profile URL: the same on every process, machine and Python run."""
+    digest = hashlib.blake2b(profile_url.lower().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % count
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Slice `index` of `count` (0 <= index < count) of the crawl, by profile URL hash.
+
+    Every profile has one owner shard. Alters that are only visited for their own list (those at
+    the frontier's max depth) are visited by their owner alone, so all the seeds that reach an alter
+    send it to the same shard, whose profile cache visits it once. Profiles that get expanded (the
+    seeds, and deeper alters when max depth > 1) are visited by every shard, since each shard needs
+    their list to find the alters it owns. Files several processes would otherwise share (seed
+    databases, cache database, metrics) get a per-shard name through `path`; ig_merge.py joins them.
+    """
+
+    index: int = 0
+    count: int = 1
+
+    def owns(self, profile_url: str) -> bool:
+        return self.count <= 1 or shard_of(profile_url, self.count) == self.index
+
+    def crawls(self, profile_url: str, depth: int, max_depth: int) -> bool:
+        """Whether this shard visits `profile_url` when the frontier reaches it at `depth`."""
+        return depth < max_depth or self.owns(profile_url)
+
+    @property
+    def suffix(self) -> str:
+        return f".shard-{self.index}-of-{self.count}" if self.count > 1 else ""
+
+    def path(self, path: str) -> str:
+        base, extension = os.path.splitext(path)
+        return f"{base}{self.suffix}{extension}"
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def parse_shard(value: str) -> Shard:
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must satisfy 0 <= i < N, got {value!r}")
+    return Shard(index, count)
@@ -0,0 +1,522 @@
+import hashlib
+import queue
+import threading
+import time
+import traceback
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+import duckdb
+import pandas as pd
+
+from ig_metrics import MetricsRecorder
+
+try:
+    import zstandard
+except ImportError:  # DOM snapshots fall back to zlib
+    zstandard = None
+
+MAX_BATCH_VISITS = 64
+ZSTD_LEVEL = 6
+ZLIB_LEVEL = 6
+_STOP = object()
+
+
+def dom_hash(dom_html: str) -> str:
+    return hashlib.blake2b(dom_html.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def compress_dom(dom_html: str) -> tuple[str, bytes]:
+    """Return (codec, blob) for a DOM snapshot: zstd when available, zlib otherwise."""
+    data = dom_html.encode('utf-8')
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return 'zlib', zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress_dom(codec: str, blob: bytes) -> str:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("DOM snapshot is zstd-compressed but the zstandard package is not installed")
+        data = zstandard.ZstdDecompressor().decompress(blob)
+    elif codec == 'zlib':
+        data = zlib.decompress(blob)
+    elif codec == 'raw':
+        data = blob
+    else:
+        raise ValueError(f"Unknown DOM codec: {codec}")
+    return bytes(data).decode('utf-8')
+
+
+def _create_tables(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS friendships (
+            profile TEXT,
+            friend TEXT,
+            name TEXT,
+            crawled_at TIMESTAMP,
+            run_id TEXT,
+            PRIMARY KEY (profile, friend)
+        )
+        """
+    )
+    # profile_doms only keeps the hash of the snapshot; the compressed bytes live in dom_blobs,
+    # once per distinct DOM, and are only read by load_dom.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS profile_doms (
+            profile TEXT PRIMARY KEY,
+            n_friends INT,
+            dom_hash TEXT,
+            crawled_at TIMESTAMP,
+            run_id TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS dom_blobs (
+            hash TEXT PRIMARY KEY,
+            codec TEXT,
+            raw_size INT,
+            dom BLOB
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS friendships_friend_idx ON friendships (friend)")
+    _create_frontier(conn)
+
+
+def _create_frontier(conn) -> None:
+    # Crawl queue of a seed database, see ig_frontier.Frontier.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS frontier (
+            seed TEXT,
+            profile TEXT,
+            parent TEXT,
+            depth INT,
+            priority DOUBLE,
+            state TEXT,
+            attempts INT,
+            added_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            next_attempt_at TIMESTAMP,
+            last_error TEXT,
+            PRIMARY KEY (seed, profile)
+        )
+        """
+    )
+
+
+def _add_frontier_retries(conn) -> None:
+    """v4: per-entry retry schedule and last error for the frontier journal."""
+    columns = _columns(conn, 'frontier')
+    if 'next_attempt_at' not in columns:
+        conn.execute("ALTER TABLE frontier ADD COLUMN next_attempt_at TIMESTAMP")
+    if 'last_error' not in columns:
+        conn.execute("ALTER TABLE frontier ADD COLUMN last_error TEXT")
+
+
+def _table_exists(conn, table: str) -> bool:
+    return bool(
+        conn.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", (table,)
+        ).fetchone()[0]
+    )
+
+
+def catalog_tables(conn, catalog: str) -> set[str]:
+    """Tables of an attached database, e.g. a seed database ATTACHed read-only by ig_merge/ig_export."""
+    return {
+        row[0]
+        for row in conn.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_catalog = ?", (catalog,)
+        ).fetchall()
+    }
+
+
+def _columns(conn, table: str) -> set[str]:
+    return {
+        row[0]
+        for row in conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ?", (table,)
+        ).fetchall()
+    }
+
+
+def schema_version(conn) -> int:
+    if not _table_exists(conn, 'schema_meta'):
+        return 0
+    row = conn.execute("SELECT value FROM schema_meta WHERE key = 'schema_version'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def stored_schema_version(db_name: str) -> int:
+    """Schema version of a database file, read through a read-only connection (nothing is migrated)."""
+    conn = duckdb.connect(db_name, read_only=True)
+    try:
+        return schema_version(conn)
+    finally:
+        conn.close()
+
+
+def is_current_schema(db_name: str, conn=None) -> bool:
+    """True when `db_name` is at SCHEMA_VERSION; otherwise warn that it is skipped.
+
+    Readers (ig_merge, ig_export, bench_parsers) never migrate: the version is read through `conn`
+    when given, or a read-only connection of its own.
+    """
+    version = schema_version(conn) if conn is not None else stored_schema_version(db_name)
+    if version < SCHEMA_VERSION:
+        print(f"⚠️ {db_name}: esquema v{version} anterior a v{SCHEMA_VERSION}, se omite (el crawler lo migra)")
+        return False
+    return True
+
+
+def _set_schema_version(conn, version: int) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO schema_meta VALUES ('schema_version', ?)", (str(version),)
+    )
+
+
+def _migrate_inline_doms(conn) -> None:
+    """v1: move DOMs stored inline as TEXT by older runs into dom_blobs."""
+    conn.execute("CREATE TABLE IF NOT EXISTS friendships (profile TEXT, friend TEXT, name TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS profile_doms (profile TEXT, n_friends INT, dom_hash TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS dom_blobs (hash TEXT PRIMARY KEY, codec TEXT, raw_size INT, dom BLOB)")
+    if 'dom' not in _columns(conn, 'profile_doms'):
+        return
+    print("🗜️ Migrando profile_doms a DOMs comprimidos…")
+    conn.execute("CREATE TABLE profile_doms_hashed (profile TEXT, n_friends INT, dom_hash TEXT)")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT profile, n_friends, dom FROM profile_doms")
+        while True:
+            rows = cursor.fetchmany(MAX_BATCH_VISITS)
+            if not rows:
+                break
+            profile_doms, blobs = _hash_doms(rows)
+            _insert_blobs(conn, blobs)
+            conn.register('new_profile_doms', pd.DataFrame(profile_doms, columns=['profile', 'n_friends', 'dom_hash']))
+            conn.execute("INSERT INTO profile_doms_hashed SELECT profile, n_friends, dom_hash FROM new_profile_doms")
+            conn.unregister('new_profile_doms')
+    finally:
+        cursor.close()
+    conn.execute("DROP TABLE profile_doms")
+    conn.execute("ALTER TABLE profile_doms_hashed RENAME TO profile_doms")
+
+
+def _migrate_keyed(conn) -> None:
+    """v2: key both tables, keeping the last row written for each (profile, friend) and profile."""
+    print("🔑 Migrando a esquema con claves (deduplicando filas repetidas)…")
+    conn.execute("ALTER TABLE friendships RENAME TO friendships_unkeyed")
+    conn.execute("ALTER TABLE profile_doms RENAME TO profile_doms_unkeyed")
+    _create_tables(conn)
+    conn.execute(
+        """
+        INSERT INTO friendships
+        SELECT profile, friend, name, NULL, NULL
+        FROM friendships_unkeyed
+        WHERE profile IS NOT NULL AND friend IS NOT NULL
+        QUALIFY row_number() OVER (PARTITION BY profile, friend ORDER BY rowid DESC) = 1
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO profile_doms
+        SELECT profile, n_friends, dom_hash, NULL, NULL
+        FROM profile_doms_unkeyed
+        WHERE profile IS NOT NULL
+        QUALIFY row_number() OVER (PARTITION BY profile ORDER BY rowid DESC) = 1
+        """
+    )
+    conn.execute("DROP TABLE friendships_unkeyed")
+    conn.execute("DROP TABLE profile_doms_unkeyed")
+    prune_dom_blobs(conn)
+
+
+SCHEMA_MIGRATIONS = [
+    (1, _migrate_inline_doms),
+    (2, _migrate_keyed),
+    (3, _create_frontier),
+    (4, _add_frontier_retries),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def ensure_schema(conn) -> None:
+    """Create the tables of a new database, or migrate an older one in place to SCHEMA_VERSION."""
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_meta (key TEXT PRIMARY KEY, value TEXT)")
+    version = schema_version(conn)
+    if version == 0 and not _table_exists(conn, 'friendships') and not _table_exists(conn, 'profile_doms'):
+        _create_tables(conn)
+        _set_schema_version(conn, SCHEMA_VERSION)
+        return
+    migrated = False
+    for target, migrate in SCHEMA_MIGRATIONS:
+        if version >= target:
+            continue
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            migrate(conn)
+            _set_schema_version(conn, target)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        version = target
+        migrated = True
+    if migrated:
+        conn.execute("CHECKPOINT")
+
+
+def prune_dom_blobs(conn) -> None:
+    """Drop snapshots no profile_doms row points at any more (replaced by a later visit)."""
+    conn.execute(
+        """
+        DELETE FROM dom_blobs
+        WHERE hash NOT IN (SELECT dom_hash FROM profile_doms WHERE dom_hash IS NOT NULL)
+        """
+    )
+
+
+def load_dom(conn, profile_url: str) -> str | None:
+    """Decompress the DOM snapshot stored for a profile (None when there is none)."""
+    row = conn.execute(
+        """
+        SELECT b.codec, b.dom
+        FROM profile_doms p JOIN dom_blobs b ON b.hash = p.dom_hash
+        WHERE p.profile = ?
+        """,
+        (profile_url,),
+    ).fetchone()
+    if row is None:
+        return None
+    return decompress_dom(row[0], row[1])
+
+
+def iter_doms(conn, limit: int | None = None):
+    """Yield (profile, dom_html) for stored snapshots, decompressing one at a time."""
+    sql = """
+        SELECT p.profile, b.codec, b.dom
+        FROM profile_doms p JOIN dom_blobs b ON b.hash = p.dom_hash
+    """
+    params: tuple = ()
+    if limit is not None:
+        sql += " LIMIT ?"
+        params = (limit,)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(MAX_BATCH_VISITS)
+            if not rows:
+                return
+            for profile, codec, blob in rows:
+                yield profile, decompress_dom(codec, blob)
+    finally:
+        cursor.close()
+
+
+def new_run_id() -> str:
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+
+
+def _hash_doms(visits: list[tuple[str, int, str]]) -> tuple[list[tuple], dict[str, tuple]]:
+    profile_doms = []
+    blobs: dict[str, tuple] = {}
+    for profile_url, n_friends, dom_html in visits:
+        if not dom_html:
+            profile_doms.append((profile_url, n_friends, None))
+            continue
+        digest = dom_hash(dom_html)
+        if digest not in blobs:
+            codec, blob = compress_dom(dom_html)
+            blobs[digest] = (digest, codec, len(dom_html), blob)
+        profile_doms.append((profile_url, n_friends, digest))
+    return profile_doms, blobs
+
+
+def _insert_blobs(conn, blobs: dict[str, tuple]) -> None:
+    if not blobs:
+        return
+    conn.register('new_dom_blobs', pd.DataFrame(list(blobs.values()), columns=['hash', 'codec', 'raw_size', 'dom']))
+    conn.execute(
+        """
+        INSERT INTO dom_blobs
+        SELECT hash, codec, raw_size, dom FROM new_dom_blobs
+        WHERE hash NOT IN (SELECT hash FROM dom_blobs)
+        """
+    )
+    conn.unregister('new_dom_blobs')
+
+
+def _upsert_rows(conn, friendships: dict[tuple, tuple], profile_doms: dict[str, tuple], stamp: tuple) -> None:
+    if profile_doms:
+        # A visit replaces the whole list, so friends the profile no longer follows go away.
+        conn.register('visited_profiles', pd.DataFrame({'profile': list(profile_doms)}))
+        conn.execute("DELETE FROM friendships WHERE profile IN (SELECT profile FROM visited_profiles)")
+        conn.unregister('visited_profiles')
+    # Rows are keyed in Python first: INSERT OR REPLACE rejects a key repeated inside one statement.
+    if friendships:
+        conn.register('new_friendships', pd.DataFrame(list(friendships.values()), columns=['profile', 'friend', 'name']))
+        conn.execute("INSERT OR REPLACE INTO friendships SELECT profile, friend, name, ?, ? FROM new_friendships", stamp)
+        conn.unregister('new_friendships')
+    if profile_doms:
+        hashed, blobs = _hash_doms(list(profile_doms.values()))
+        _insert_blobs(conn, blobs)
+        conn.register('new_profile_doms', pd.DataFrame(hashed, columns=['profile', 'n_friends', 'dom_hash']))
+        conn.execute(
+            "INSERT OR REPLACE INTO profile_doms SELECT profile, n_friends, dom_hash, ?, ? FROM new_profile_doms", stamp
+        )
+        conn.unregister('new_profile_doms')
+
+
+def write_visits(conn, visits: list[tuple[str, list[dict], int, str]], run_id: str | None = None) -> None:
+    """Upsert several (profile_url, following, n_following, dom_html) visits in one transaction."""
+    write_ops(conn, [('visit', visit) for visit in visits], run_id)
+
+
+def write_ops(conn, ops: list[tuple[str, tuple]], run_id: str | None = None) -> None:
+    """Apply queued writer operations for one database, in order, inside a single transaction.
+
+    'visit' replaces the profile's stored following list and its profile_doms row; when a profile
+    is visited twice, its last visit wins. 'partial' upserts rows streamed while a visit is still
+    scrolling: they stay in friendships without a profile_doms row, which ig_merge only uses to fill
+    gaps, until the profile's visit is written and supersedes them. Rows are stamped with the write
+    time and `run_id`.
+    """
+    stamp = (datetime.now(timezone.utc).replace(tzinfo=None), run_id)
+    friendships: dict[tuple, tuple] = {}
+    profile_doms: dict[str, tuple] = {}
+    for kind, payload in ops:
+        profile_url, following = payload[0], payload[1]
+        if kind == 'visit':
+            friendships = {key: row for key, row in friendships.items() if key[0] != profile_url}
+            profile_doms[profile_url] = (profile_url, payload[2], payload[3])
+        for entry in following:
+            if entry['url']:
+                friendships[(profile_url, entry['url'])] = (profile_url, entry['url'], entry['name'])
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        _upsert_rows(conn, friendships, profile_doms, stamp)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+class DuckDBWriter:
+    """Long-lived writer: one connection per database, bulk upserts done on a background thread.
+
+    Visits queued with `submit` and rows streamed with `submit_partial` are grouped per database and
+    applied in order in a single transaction, stamped with this writer's `run_id`.
+    `flush` blocks until everything queued so far has been written and returns the (db_name,
+    profile_url) visits whose write failed since the previous flush; `close` writes what is left and
+    stops the thread.
+    Each database write is timed into `metrics` when one is given.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = MAX_BATCH_VISITS,
+        run_id: str | None = None,
+        metrics: MetricsRecorder | None = None,
+    ):
+        self.max_batch = max_batch
+        self.run_id = run_id or new_run_id()
+        self.metrics = metrics
+        self._failed: list[tuple[str, str]] = []
+        self._failed_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._connections: dict[str, duckdb.DuckDBPyConnection] = {}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="duckdb-writer", daemon=True)
+        self._thread.start()
+
+    def _put(self, db_name: str, kind: str, payload: tuple) -> None:
+        if self._closed:
+            raise RuntimeError("DuckDBWriter is closed")
+        self._queue.put((db_name, (kind, payload)))
+
+    def submit(self, db_name: str, profile_url: str, following: list[dict], n_following: int, dom_html: str) -> None:
+        self._put(db_name, 'visit', (profile_url, list(following), n_following, dom_html))
+
+    def submit_partial(self, db_name: str, profile_url: str, following: list[dict]) -> None:
+        self._put(db_name, 'partial', (profile_url, list(following)))
+
+    def flush(self) -> list[tuple[str, str]]:
+        self._queue.join()
+        with self._failed_lock:
+            failed, self._failed = self._failed, []
+        return failed
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        for conn in self._connections.values():
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._connections = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _connection(self, db_name: str):
+        conn = self._connections.get(db_name)
+        if conn is None:
+            conn = duckdb.connect(db_name)
+            ensure_schema(conn)
+            self._connections[db_name] = conn
+        return conn
+
+    def _next_batch(self) -> tuple[list, bool, int]:
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = any(item is _STOP for item in batch)
+        return [item for item in batch if item is not _STOP], stop, len(batch)
+
+    def _write_batch(self, batch: list) -> None:
+        by_db: dict[str, list] = {}
+        for db_name, op in batch:
+            by_db.setdefault(db_name, []).append(op)
+        for db_name, ops in by_db.items():
+            visits = [payload[0] for kind, payload in ops if kind == 'visit']
+            started = time.perf_counter()
+            failed = False
+            try:
+                write_ops(self._connection(db_name), ops, self.run_id)
+            except Exception:
+                failed = True
+                traceback.print_exc()
+                with self._failed_lock:
+                    self._failed.extend((db_name, profile_url) for profile_url in visits)
+            if self.metrics is not None:
+                self.metrics.record_db_write(db_name, len(visits), time.perf_counter() - started, failed)
+
+    def _run(self) -> None:
+        while True:
+            batch, stop, taken = self._next_batch()
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+            if stop:
+                return
@@ -0,0 +1,133 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import duckdb
+
+DEFAULT_VISIBILITY_DB = os.path.join("outputs", "visibility_cache.duckdb")
+DEFAULT_VISIBILITY_TTL_HOURS = 72.0
+LISTS = ('followers', 'following')
+
+
+@dataclass
+class Visibility:
+    username: str
+    list_name: str
+    visible: bool
+    reason: str
+    checked_at: datetime
+    profile: str = ''
+
+
+class VisibilityCache:
+    """Whether a profile's followers/following lists could be opened, as last checked by prueba.py.
+
+    Only definite answers are stored (the list link is missing or its dialog does not open on a
+    profile page that loaded); errors and timeouts are not, so the profile is checked again. `load`
+    reads every entry younger than `ttl_hours` into memory with a short-lived connection, so the
+    crawler never holds the file open while a checker writes to it. `store` writes through a
+    connection opened on first use.
+    """
+
+    def __init__(self, db_name: str = DEFAULT_VISIBILITY_DB, ttl_hours: float = DEFAULT_VISIBILITY_TTL_HOURS):
+        self.db_name = db_name
+        self.ttl = timedelta(hours=ttl_hours)
+        self.hits = 0
+        self._entries: dict[tuple[str, str], Visibility] = {}
+        self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl.total_seconds() > 0
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    @staticmethod
+    def _create_table(conn) -> None:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS visibility (
+                username TEXT,
+                list_name TEXT,
+                profile TEXT,
+                visible BOOLEAN,
+                reason TEXT,
+                checked_at TIMESTAMP,
+                PRIMARY KEY (username, list_name)
+            )
+            """
+        )
+
+    def load(self) -> int:
+        """Read the fresh entries of the cache file; returns how many there are."""
+        if not self.enabled or not os.path.exists(self.db_name):
+            return 0
+        try:
+            conn = duckdb.connect(self.db_name, read_only=True)
+        except duckdb.Error as exc:
+            print(f"⚠️ No se pudo abrir la caché de visibilidad {self.db_name}: {exc}")
+            return 0
+        try:
+            rows = conn.execute(
+                """
+                SELECT username, list_name, visible, reason, checked_at, profile
+                FROM visibility WHERE checked_at >= ?
+                """,
+                (self._now() - self.ttl,),
+            ).fetchall()
+        except duckdb.Error:
+            rows = []
+        finally:
+            conn.close()
+        for row in rows:
+            entry = Visibility(*row)
+            self._entries[(entry.username, entry.list_name)] = entry
+        return len(rows)
+
+    def lookup(self, username: str, list_name: str) -> Visibility | None:
+        if not self.enabled:
+            return None
+        entry = self._entries.get((username.lower(), list_name))
+        if entry is None or entry.checked_at < self._now() - self.ttl:
+            return None
+        return entry
+
+    def hidden(self, username: str, list_name: str = 'following') -> Visibility | None:
+        """The cached entry when the list is known to be hidden or private, else None."""
+        entry = self.lookup(username, list_name)
+        if entry is None or entry.visible:
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, entries: list[Visibility]) -> None:
+        if not self.enabled or not entries:
+            return
+        if self._conn is None:
+            if os.path.dirname(self.db_name):
+                os.makedirs(os.path.dirname(self.db_name), exist_ok=True)
+            self._conn = duckdb.connect(self.db_name)
+            self._create_table(self._conn)
+        for entry in entries:
+            entry.username = entry.username.lower()
+            self._entries[(entry.username, entry.list_name)] = entry
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO visibility VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (entry.username, entry.list_name, entry.profile, entry.visible, entry.reason, entry.checked_at)
+                for entry in entries
+            ],
+        )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
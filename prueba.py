@@ -1,12 +1,20 @@
 import argparse
+import asyncio
 import csv
-import time
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 
-from camoufox.sync_api import Camoufox
+from camoufox.async_api import AsyncCamoufox
+
+from crawler_ig import PROFILE_READY_JS, ReadinessBudget
+from crawler_ig_async import wait_until_ready
+from ig_pool import AsyncContextPool
+from ig_routing import DEFAULT_BLOCKED_HOSTS, DEFAULT_BLOCKED_TYPES, RoutePolicy, parse_csv_list
+from ig_sessions import SessionCheckpointError, check_session
+from ig_visibility import DEFAULT_VISIBILITY_DB, DEFAULT_VISIBILITY_TTL_HOURS, LISTS, Visibility, VisibilityCache
 
 try:
-    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 except ImportError:  # Fallback if playwright cannot be imported directly
     PlaywrightTimeoutError = Exception  # type: ignore
 
@@ -37,62 +45,137 @@ def extract_username(profile_url: str) -> str:
     return username
 
 
-def followers_are_visible(page, username: str) -> tuple[bool, str]:
-    followers_selectors = [
-        f'a[href="/{username}/followers/"]',
-        f'a[href="/{username}/followers"]',
-    ]
-
-    target_selector = None
-    for selector in followers_selectors:
-        try:
-            page.wait_for_selector(selector, timeout=600)
-            target_selector = selector
-            break
-        except PlaywrightTimeoutError:
-            continue
+async def load_profile(page, username: str, budget: ReadinessBudget) -> bool:
+    await page.goto(f"https://www.instagram.com/{username}/", wait_until="domcontentloaded")
+    check_session(page.url)
+    return await wait_until_ready(page, PROFILE_READY_JS, username, budget.profile_ms)
 
-    if not target_selector:
-        return False, "followers link not found"
 
+async def close_dialog(page, dialog_ms: int) -> bool:
+    """Dismiss the open dialog; True once no dialog is attached to the page."""
     try:
-        page.click(target_selector)
-    except Exception as exc:  # pragma: no cover
-        return False, f"failed to click followers link: {exc}"  # noqa: TRY401
-
+        await page.keyboard.press("Escape")
+        await page.wait_for_selector('div[role="dialog"]', state="detached", timeout=dialog_ms)
+        return True
+    except Exception:
+        return False
+
+
+async def list_visible(page, username: str, list_name: str, dialog_ms: int) -> tuple[bool, str]:
+    """Open the followers/following dialog of a loaded profile page (the caller closes it)."""
+    selector = f'a[href="/{username}/{list_name}/"], a[href="/{username}/{list_name}"]'
+    link = page.locator(selector).first
+    if not await link.count():
+        return False, f"{list_name} link not found"
+
+    # A failed click is an error, not an answer: it propagates and the profile is not cached.
+    await link.click()
     try:
-        page.wait_for_selector('div[role="dialog"]', timeout=600)
+        await page.wait_for_selector('div[role="dialog"]', timeout=dialog_ms)
         return True, ""
     except PlaywrightTimeoutError:
-        return False, "followers dialog not visible"
-    finally:
-        try:
-            page.keyboard.press("Escape")
-            page.wait_for_timeout(250)
-        except Exception:
-            pass
-
-
-def process_profile(context, profile_url: str) -> dict[str, object]:
+        return False, f"{list_name} dialog not visible"
+
+
+async def process_profile(
+    pool: AsyncContextPool,
+    storage_state: str,
+    profile_url: str,
+    lists: list[str],
+    cache: VisibilityCache,
+    budget: ReadinessBudget,
+) -> dict[str, object]:
+    """Check the lists of one profile that the cache has no fresh answer for."""
     username = extract_username(profile_url)
-    page = context.new_page()
+    known = {list_name: cache.lookup(username, list_name) for list_name in lists}
+    missing = [list_name for list_name, entry in known.items() if entry is None]
+    checked: list[Visibility] = []
+    error = ""
+    if missing:
+        try:
+            async with pool.page(storage_state) as page:
+                if not await load_profile(page, username, budget):
+                    error = "profile load timeout"
+                else:
+                    checked_at = datetime.now(timezone.utc).replace(tzinfo=None)
+                    for index, list_name in enumerate(missing):
+                        # Each dialog is opened from a bare profile page: when the previous one does
+                        # not go away, the profile is loaded again.
+                        if index and not await close_dialog(page, budget.dialog_ms):
+                            if not await load_profile(page, username, budget):
+                                error = "profile load timeout"
+                                break
+                        visible, reason = await list_visible(page, username, list_name, budget.dialog_ms)
+                        checked.append(Visibility(username, list_name, visible, reason, checked_at, profile_url))
+        except SessionCheckpointError:
+            raise
+        except PlaywrightTimeoutError:
+            error = "profile load timeout"
+        except Exception as exc:  # pragma: no cover
+            error = f"unexpected error: {exc}"  # noqa: TRY401
+        # Only answers from a page that loaded are cached; errors are checked again next run.
+        cache.store(checked)
+        known.update({entry.list_name: entry for entry in checked})
+
+    result: dict[str, object] = {"profile": profile_url, "username": username}
+    for list_name in lists:
+        entry = known[list_name]
+        result[f"{list_name}_visible"] = entry is not None and entry.visible
+    reasons = [entry.reason for entry in known.values() if entry is not None and entry.reason]
+    result["details"] = error or "; ".join(reasons)
+    result["cached"] = not missing
+    return result
+
+
+def report(result: dict[str, object], lists: list[str]) -> None:
+    source = " (caché)" if result["cached"] else ""
+    print(f"🔍 {result['profile']}{source}")
+    for list_name in lists:
+        if result[f"{list_name}_visible"]:
+            print(f"   ✅ {list_name.capitalize()} visible")
+        else:
+            details = result["details"]
+            extra = f" ({details})" if details else ""
+            print(f"   ❌ {list_name.capitalize()} not visible{extra}")
+
+
+async def run(args: argparse.Namespace, profiles: list[str], lists: list[str]) -> None:
+    cache = VisibilityCache(args.visibility_db, args.ttl_hours)
+    print(f"🗂️ {cache.load()} perfiles-lista recientes en la caché de visibilidad")
+    fieldnames = ["profile", "username", *[f"{list_name}_visible" for list_name in lists], "details", "cached"]
+    # Rows are written as soon as each check finishes, so an interrupted run keeps what it did;
+    # the cache lets the next run skip those profiles.
+    outfile = open(args.output_csv, "w", newline="") if args.output_csv else None
     try:
-        page.goto(f"https://www.instagram.com/{username}/", wait_until="domcontentloaded")
-        time.sleep(2)
-        visible, reason = followers_are_visible(page, username)
-    except PlaywrightTimeoutError:
-        visible, reason = False, "profile load timeout"
-    except Exception as exc:  # pragma: no cover
-        visible, reason = False, f"unexpected error: {exc}"  # noqa: TRY401
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames) if outfile is not None else None
+        if writer is not None:
+            writer.writeheader()
+        async with AsyncCamoufox(window=DEFAULT_WINDOW, headless=args.headless) as browser:
+            pool = AsyncContextPool(
+                browser,
+                context_options={"viewport": DEFAULT_VIEWPORT, "device_scale_factor": 3, "has_touch": True},
+                route_policy=RoutePolicy(DEFAULT_BLOCKED_TYPES, DEFAULT_BLOCKED_HOSTS),
+            )
+            slots = asyncio.Semaphore(args.concurrency)
+            budget = ReadinessBudget()
+
+            async def check(profile_url: str) -> dict[str, object]:
+                async with slots:
+                    return await process_profile(pool, args.storage_state, profile_url, lists, cache, budget)
+
+            try:
+                for finished in asyncio.as_completed([check(profile_url) for profile_url in profiles]):
+                    result = await finished
+                    report(result, lists)
+                    if writer is not None:
+                        writer.writerow(result)
+                        outfile.flush()
+            finally:
+                await pool.close()
     finally:
-        page.close()
-
-    return {
-        "profile": profile_url,
-        "username": username,
-        "followers_visible": visible,
-        "details": reason,
-    }
+        cache.close()
+        if outfile is not None:
+            outfile.close()
 
 
 def main() -> None:
@@ -101,42 +184,43 @@ def main() -> None:
     parser.add_argument("--output-csv", default="output-prueba.csv", help="Path to write results CSV")
     parser.add_argument("--storage-state", default="ig_session.json", help="Camoufox storage state file")
     parser.add_argument("--headless", action="store_true", help="Run the browser in headless mode")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of profiles checked at the same time (pages of one browser context)",
+    )
+    parser.add_argument(
+        "--lists",
+        default=",".join(LISTS),
+        help="Comma-separated lists to check: followers, following",
+    )
+    parser.add_argument(
+        "--visibility-db",
+        dest="visibility_db",
+        default=DEFAULT_VISIBILITY_DB,
+        help="DuckDB file caching the results; crawler_ig.py reads it to skip hidden lists",
+    )
+    parser.add_argument(
+        "--ttl-hours",
+        dest="ttl_hours",
+        type=float,
+        default=DEFAULT_VISIBILITY_TTL_HOURS,
+        help="Reuse cached results younger than this instead of checking the profile again (0 disables)",
+    )
     args = parser.parse_args()
+    lists = parse_csv_list(args.lists)
+    unknown = [list_name for list_name in lists if list_name not in LISTS]
+    if unknown or not lists:
+        parser.error(f"--lists must name followers and/or following, got {args.lists!r}")
 
     profiles = read_profiles(args.input_csv)
     if not profiles:
         print("No profiles found in the input CSV.")
         return
 
-    results: list[dict[str, object]] = []
-
-    with Camoufox(window=DEFAULT_WINDOW, headless=args.headless) as browser:
-        context = browser.new_context(
-            viewport=DEFAULT_VIEWPORT,
-            device_scale_factor=3,
-            storage_state=args.storage_state,
-            has_touch=True,
-        )
-
-        for profile_url in profiles:
-            print(f"🔍 Checking followers visibility for {profile_url}")
-            result = process_profile(context, profile_url)
-            if result["followers_visible"]:
-                print("   ✅ Followers visible")
-            else:
-                details = result["details"]
-                extra = f" ({details})" if details else ""
-                print(f"   ❌ Followers not visible{extra}")
-            results.append(result)
-
-    if args.output_csv:
-        with open(args.output_csv, "w", newline="") as outfile:
-            fieldnames = ["profile", "username", "followers_visible", "details"]
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(results)
+    asyncio.run(run(args, profiles, lists))
 
 
 if __name__ == "__main__":
     main()
-
@@ -1,23 +1,111 @@
+import argparse
+import json
+import os
+
 from camoufox.sync_api import Camoufox
 
+from ig_sessions import CHECKPOINT_PATHS, DEFAULT_SESSIONS_DIR, resolve_session_files, session_name
+
 # User-Agent de un móvil Android con Chrome
 MOBILE_USER_AGENT = (
     "Mozilla/5.0 (Linux; Android 10; SM-G970F) "
     "AppleWebKit/537.36 (KHTML, like Gecko) "
     "Chrome/122.0.0.0 Mobile Safari/537.36"
 )
+LOGIN_URL = "https://www.instagram.com/accounts/login/"
+HOME_URL = "https://www.instagram.com/"
+LEGACY_SESSION = "ig_session.json"
+# Estado vacío: sirve para probar el pool de sesiones contra el servidor simulado (bench_mock_server.py)
+DUMMY_STORAGE_STATE = {"cookies": [], "origins": []}
+
+
+def has_session_cookie(context) -> bool:
+    return any(cookie['name'] == 'sessionid' and cookie['value'] for cookie in context.cookies())
+
+
+def save_session(browser, path: str, refresh: bool) -> None:
+    """Log in (or renew an existing login) and write the storage state to `path`."""
+    options = {
+        "user_agent": MOBILE_USER_AGENT,
+        "viewport": {"width": 375, "height": 812},  # Tamaño típico de pantalla móvil
+        "device_scale_factor": 3,
+        "has_touch": True,
+    }
+    reuse = refresh and os.path.exists(path)
+    if reuse:
+        options["storage_state"] = path
+    context = browser.new_context(**options)
+    try:
+        page = context.new_page()
+        if reuse:
+            # Visitar la portada renueva las cookies de una sesión que sigue válida
+            page.goto(HOME_URL, wait_until="domcontentloaded")
+            if has_session_cookie(context) and not any(marker in page.url for marker in CHECKPOINT_PATHS):
+                context.storage_state(path=path)
+                print(f"♻️ Sesión {session_name(path)} renovada en {path}")
+                return
+            print(f"⚠️ La sesión {session_name(path)} ha caducado o pide verificación")
+        page.goto(LOGIN_URL)
+        input(f"🔐 Please log in manually as '{session_name(path)}', then press ENTER...")
+        # Guarda el estado de sesión
+        context.storage_state(path=path)
+        print(f"💾 Sesión guardada en {path}")
+    finally:
+        context.close()
+
 
-with Camoufox() as browser:
-    context = browser.new_context(
-        user_agent=MOBILE_USER_AGENT,
-        viewport={"width": 375, "height": 812},  # Tamaño típico de pantalla móvil
-        device_scale_factor=3,
-        has_touch=True,
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create or refresh Instagram storage states for the crawlers")
+    parser.add_argument(
+        "names",
+        nargs="*",
+        help=f"Session names, saved as <dir>/<name>.json (none: {LEGACY_SESSION}, or every session with --refresh)",
     )
+    parser.add_argument("--dir", default=DEFAULT_SESSIONS_DIR, help="Directory holding the named sessions")
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Renew existing sessions, asking for a manual login only when one has expired",
+    )
+    parser.add_argument(
+        "--dummy",
+        action="store_true",
+        help="Write empty storage states for the given names, without opening a browser (for runs against "
+        "the mock server)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="With --dummy, overwrite storage states that already exist",
+    )
+    args = parser.parse_args()
+    if args.dummy and not args.names:
+        parser.error("--dummy needs the names of the sessions to write")
+
+    if args.names:
+        paths = [os.path.join(args.dir, f"{name}.json") for name in args.names]
+    elif args.refresh and os.path.isdir(args.dir):
+        paths = resolve_session_files([args.dir])
+    else:
+        paths = [LEGACY_SESSION]
+    for path in paths:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if args.dummy:
+        existing = [path for path in paths if os.path.exists(path)]
+        if existing and not args.force:
+            parser.error("refusing to overwrite " + ", ".join(existing) + " (use --force)")
+        for path in paths:
+            with open(path, "w") as handle:
+                json.dump(DUMMY_STORAGE_STATE, handle)
+            print(f"🧪 Sesión vacía escrita en {path}")
+        return
+
+    with Camoufox() as browser:
+        for path in paths:
+            save_session(browser, path, args.refresh)
 
-    page = context.new_page()
-    page.goto("https://www.instagram.com/accounts/login/")
-    input("🔐 Please log in manually, then press ENTER...")
 
-    # Guarda el estado de sesión
-    context.storage_state(path="ig_session.json")
+if __name__ == "__main__":
+    main()
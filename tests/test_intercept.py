@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from crawler_ig import extract_following, records_from_users
+from ig_intercept import FollowingInterceptor, parse_following_payload
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Paths the dialog requests on the live site, mapped to the recorded response served for each.
+ROUTES = {
+    '/api/v1/friendships/1812345600/following/?count=12': "following_rest.json",
+    '/graphql/query/?query_hash=d04b0a864b4b54837c0d870b0e77e076': "following_graphql.json",
+    '/api/graphql': "graphql_unrelated.json",
+}
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as handle:
+        return handle.read()
+
+
+class FixtureResponse:
+    """Stands in for a Playwright response: the served URL plus its JSON body."""
+
+    def __init__(self, url: str):
+        self.url = url
+        with urllib.request.urlopen(url) as response:
+            self._body = response.read()
+
+    def json(self):
+        return json.loads(self._body)
+
+
+class FakePage:
+    def __init__(self, dialog_html: str):
+        self.dialog_html = dialog_html
+
+    def inner_html(self, selector: str) -> str:
+        return self.dialog_html
+
+    def content(self) -> str:
+        return f"<html><body>{self.dialog_html}</body></html>"
+
+
+@pytest.fixture(scope="module")
+def fixture_server():
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            name = ROUTES.get(self.path)
+            if name is None:
+                self.send_error(404)
+                return
+            payload = load_fixture(name).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    yield f"http://{host}:{port}"
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def test_parses_rest_users():
+    pairs = parse_following_payload(json.loads(load_fixture("following_rest.json")))
+    assert pairs == [
+        ('ana.martinez', 'Ana Martínez'),
+        ('cafe_del_puerto', ''),
+        ('jorge.r', 'Jorge Ruiz'),
+    ]
+
+
+def test_parses_graphql_edge_follow():
+    pairs = parse_following_payload(json.loads(load_fixture("following_graphql.json")))
+    assert pairs == [('lucia.gomez', 'Lucía Gómez'), ('ana.martinez', 'Ana Martínez')]
+
+
+def test_ignores_unrelated_payloads():
+    assert parse_following_payload(json.loads(load_fixture("graphql_unrelated.json"))) == []
+    assert parse_following_payload([]) == []
+
+
+def test_interceptor_collects_served_batches(fixture_server):
+    interceptor = FollowingInterceptor()
+    for path in ROUTES:
+        interceptor._on_response(FixtureResponse(fixture_server + path))
+
+    # The unrelated GraphQL call matches the URL filter but carries no following list.
+    assert interceptor.responses == 2
+    assert [username for username, _ in interceptor.users] == [
+        'ana.martinez', 'cafe_del_puerto', 'jorge.r', 'lucia.gomez',
+    ]
+
+    page = FakePage(load_fixture("following_dialog.html"))
+    following, modal_html = extract_following(page, interceptor)
+    assert modal_html == page.dialog_html
+    assert following == records_from_users(interceptor.users)
+    assert [record['url'].rstrip('/').rsplit('/', 1)[-1] for record in following] == [
+        'ana.martinez', 'cafe_del_puerto', 'jorge.r', 'lucia.gomez',
+    ]
+    assert following[1]['name'] == 'cafe_del_puerto'
+
+
+def test_falls_back_to_dom_without_responses(fixture_server):
+    interceptor = FollowingInterceptor()
+    interceptor._on_response(FixtureResponse(fixture_server + '/api/graphql'))
+    assert interceptor.responses == 0
+
+    page = FakePage(load_fixture("following_dialog.html"))
+    for parser in ("bs4", "lxml"):
+        following, _ = extract_following(page, interceptor, parser)
+        assert [record['url'].rstrip('/').rsplit('/', 1)[-1] for record in following] == [
+            'ana.martinez', 'cafe_del_puerto', 'jorge.r',
+        ]
+        assert following[0]['name'] == 'Ana Martínez'
+        assert following[1]['name'] == 'cafe_del_puerto'